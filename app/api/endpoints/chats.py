@@ -1,15 +1,18 @@
-from typing import Any, List, Dict, Optional
-from datetime import date
+from typing import Any, List, Dict, Optional, Tuple
+from datetime import date, datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import object_mapper
 
 from app.api.deps import get_db_dependency, get_current_active_user_dependency
+from app.config import settings
 from app.models.user import User
 from app.schemas.chat import Chat, ChatCreate, ChatUpdate, ChatWithRelations, ChatListItem, DashboardStatistics
 from app.crud.chat import chat as crud_chat
 from app.crud.message import message as crud_message
+from app.core.pubsub import publish_chat_read
+from app.core.notifications import notification_scheduler
 
 
 router = APIRouter()
@@ -32,6 +35,41 @@ def orm_to_dict(orm_object) -> Dict:
     return result
 
 
+def to_list_item(chat, last_message) -> ChatListItem:
+    """Преобразование чата и его последнего сообщения в элемент списка чатов"""
+    # Преобразуем ORM объекты в словари для Pydantic V2
+    chat_dict = {
+        "id": chat.id,
+        "title": chat.title,
+        "telegram_user_id": chat.telegram_user_id,
+        "telegram_user": orm_to_dict(chat.telegram_user) if chat.telegram_user else None,
+        "unread_count": chat.unread_count,
+        "last_message": orm_to_dict(last_message) if last_message else None,
+        "updated_at": chat.updated_at
+    }
+    
+    # Создаем объект Pydantic из словаря
+    return ChatListItem.model_validate(chat_dict)
+
+
+def encode_cursor(cursor: Tuple[datetime, int]) -> str:
+    """Курсор страницы списка чатов для заголовка X-Next-Cursor: <ключ сортировки>_<id>"""
+    sort_key, chat_id = cursor
+    return f"{sort_key.isoformat()}_{chat_id}"
+
+
+def decode_cursor(value: str) -> Tuple[datetime, int]:
+    """Разбор курсора из encode_cursor"""
+    try:
+        sort_key, chat_id = value.rsplit("_", 1)
+        return datetime.fromisoformat(sort_key), int(chat_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор",
+        )
+
+
 @router.get("/search/", response_model=List[ChatListItem])
 async def search_chats(
     query: str = Query(..., min_length=1),
@@ -41,32 +79,10 @@ async def search_chats(
     """
     Поиск чатов
     """
-    chats = await crud_chat.search_chats(db=db, query=query)
-    
-    # Фильтруем чаты по доступу текущего пользователя
-    filtered_chats = [chat for chat in chats if chat.manager_id == current_user.id]
+    # Чаты текущего пользователя вместе с последними сообщениями - одним запросом
+    rows = await crud_chat.search_chats(db=db, query=query, manager_id=current_user.id)
     
-    # Получаем последние сообщения для каждого чата
-    result = []
-    for chat in filtered_chats:
-        last_message = await crud_message.get_last_message(db=db, chat_id=chat.id)
-        
-        # Преобразуем ORM объекты в словари для Pydantic V2
-        chat_dict = {
-            "id": chat.id,
-            "title": chat.title,
-            "telegram_user_id": chat.telegram_user_id,
-            "telegram_user": orm_to_dict(chat.telegram_user) if chat.telegram_user else None,
-            "unread_count": chat.unread_count,
-            "last_message": orm_to_dict(last_message) if last_message else None,
-            "updated_at": chat.updated_at
-        }
-        
-        # Создаем объект Pydantic из словаря
-        chat_item = ChatListItem.model_validate(chat_dict)
-        result.append(chat_item)
-    
-    return result
+    return [to_list_item(chat, last_message) for chat, last_message in rows]
 
 
 @router.get("/apartments", response_model=List[str])
@@ -83,8 +99,9 @@ async def get_available_apartments(
 
 @router.get("/", response_model=List[ChatListItem])
 async def get_chats(
-    skip: int = 0,
-    limit: int = 10000,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+    limit: int = Query(settings.CHATS_PAGE_SIZE, ge=1, le=settings.CHATS_PAGE_MAX, description="Размер страницы"),
     date_filter: Optional[str] = Query(None, description="Фильтр по дате: today, yesterday"),
     custom_date: Optional[date] = Query(None, description="Пользовательская дата для фильтра"),
     apartments_filter: Optional[str] = Query(None, description="Фильтр по аппартаментам"),
@@ -94,12 +111,17 @@ async def get_chats(
     current_user: User = Depends(get_current_active_user_dependency),
 ) -> Any:
     """
-    Получение списка чатов для текущего пользователя с фильтрацией и сортировкой
+    Получение списка чатов для текущего пользователя с фильтрацией и сортировкой.
+
+    Возвращает одну страницу; курсор следующей передается в заголовке
+    X-Next-Cursor (нет заголовка - страница последняя). Курсор действителен
+    только с теми же параметрами сортировки.
     """
-    chats = await crud_chat.get_chats_by_manager(
+    # Чаты вместе с последними сообщениями загружаются одним запросом
+    rows, next_cursor = await crud_chat.get_chats_by_manager(
         db=db, 
         manager_id=current_user.id, 
-        skip=skip, 
+        cursor=decode_cursor(cursor) if cursor else None, 
         limit=limit,
         date_filter=date_filter,
         custom_date=custom_date,
@@ -107,38 +129,21 @@ async def get_chats(
         sort_by=sort_by,
         sort_order=sort_order
     )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(next_cursor)
     
-    # Получаем последние сообщения для каждого чата
-    result = []
-    for chat in chats:
-        last_message = await crud_message.get_last_message(db=db, chat_id=chat.id)
-        
-        # Преобразуем ORM объекты в словари для Pydantic V2
-        chat_dict = {
-            "id": chat.id,
-            "title": chat.title,
-            "telegram_user_id": chat.telegram_user_id,
-            "telegram_user": orm_to_dict(chat.telegram_user) if chat.telegram_user else None,
-            "unread_count": chat.unread_count,
-            "last_message": orm_to_dict(last_message) if last_message else None,
-            "updated_at": chat.updated_at
-        }
-        
-        # Создаем объект Pydantic из словаря
-        chat_item = ChatListItem.model_validate(chat_dict)
-        result.append(chat_item)
-    
-    return result
+    return [to_list_item(chat, last_message) for chat, last_message in rows]
 
 
 @router.get("/{chat_id}", response_model=ChatWithRelations)
 async def get_chat(
     chat_id: int,
+    response: Response,
     db: AsyncSession = Depends(get_db_dependency),
     current_user: User = Depends(get_current_active_user_dependency),
 ) -> Any:
     """
-    Получение информации о чате по ID
+    Получение информации о чате по ID с последней страницей сообщений
     """
     chat = await crud_chat.get_chat_with_relations(db=db, chat_id=chat_id)
     if not chat:
@@ -154,14 +159,21 @@ async def get_chat(
             detail="Нет доступа к этому чату",
         )
     
-    # Получаем сообщения
-    messages = await crud_message.get_messages_by_chat(db=db, chat_id=chat.id)
+    # Последняя страница истории; более старые сообщения догружаются через
+    # /api/messages/{chat_id}?before_id=<X-Next-Cursor>
+    messages, next_before_id = await crud_message.get_messages_by_chat(
+        db=db, chat_id=chat.id, limit=settings.MESSAGES_PAGE_SIZE
+    )
+    if next_before_id is not None:
+        response.headers["X-Next-Cursor"] = str(next_before_id)
     
     # Сбрасываем счетчик непрочитанных сообщений
-    await crud_chat.reset_unread_count(db=db, chat_id=chat.id)
+    if await crud_chat.reset_unread_count(db=db, chat_id=chat.id):
+        await publish_chat_read(chat)
     
-    # Отмечаем все сообщения как прочитанные
-    await crud_message.mark_all_as_read(db=db, chat_id=chat.id)
+    # Отмечаем все сообщения как прочитанные и снимаем ожидающие уведомления
+    if await crud_message.mark_all_as_read(db=db, chat_id=chat.id):
+        await notification_scheduler.cancel(db, chat_id=chat.id)
     
     # Преобразуем ORM объекты в словари для Pydantic V2
     chat_dict = {
@@ -240,23 +252,9 @@ async def get_dashboard_statistics(
     """
     Получение статистики для дашборда
     """
-    # Получаем статистику сообщений
-    messages_stats = await crud_chat.get_messages_statistics(
-        db=db, manager_id=current_user.id
-    )
-    
-    # Получаем статистику диалогов
-    chats_stats = await crud_chat.get_chats_statistics(
-        db=db, manager_id=current_user.id
-    )
-    
-    # Получаем статистику запросов инструкций
-    instruction_requests_stats = await crud_chat.get_instruction_requests_statistics(
+    # Вся статистика считается тремя агрегирующими запросами и кешируется
+    statistics = await crud_chat.get_dashboard_statistics(
         db=db, manager_id=current_user.id
     )
     
-    return DashboardStatistics(
-        messages=messages_stats,
-        chats=chats_stats,
-        instruction_requests=instruction_requests_stats
-    ) 
\ No newline at end of file
+    return DashboardStatistics(**statistics)
@@ -7,6 +7,7 @@ from app.api.deps import get_db_dependency, get_current_active_user_dependency
 from app.models.user import User
 from app.schemas.event import Event, EventCreate, EventUpdate
 from app.crud.event import event as crud_event
+from app.core.bus import event_bus
 
 
 router = APIRouter()
@@ -74,6 +75,9 @@ async def create_event(
     await db.commit()
     await db.refresh(db_obj)
     
+    # Перестраиваем скомпилированные правила
+    await event_bus.invalidate_cache("event_rules")
+    
     return db_obj
 
 
@@ -102,6 +106,7 @@ async def update_event(
         )
     
     event = await crud_event.update_event(db=db, db_obj=event, obj_in=event_in)
+    await event_bus.invalidate_cache("event_rules")
     return event
 
 
@@ -129,6 +134,7 @@ async def delete_event(
         )
     
     await crud_event.remove(db=db, id=event_id)
+    await event_bus.invalidate_cache("event_rules")
 
 
 @router.post("/{event_id}/activate", response_model=Event)
@@ -155,6 +161,7 @@ async def activate_event(
         )
     
     event = await crud_event.activate_event(db=db, event_id=event_id)
+    await event_bus.invalidate_cache("event_rules")
     return event
 
 
@@ -182,4 +189,5 @@ async def deactivate_event(
         )
     
     event = await crud_event.deactivate_event(db=db, event_id=event_id)
+    await event_bus.invalidate_cache("event_rules")
     return event 
\ No newline at end of file
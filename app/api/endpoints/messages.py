@@ -1,21 +1,20 @@
-from typing import Any, List
-import base64
-import os
-from pathlib import Path
-from uuid import uuid4
+from typing import Any, List, Optional
+from datetime import datetime
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query, Form, File, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db_dependency, get_current_active_user_dependency
+from app.config import settings
 from app.models.user import User
 from app.schemas.message import Message, MessageCreate, MessageUpdate, MessageOut
 from app.crud.message import message as crud_message
 from app.crud.chat import chat as crud_chat
-from app.bot.bot import send_message as bot_send_message
-from app.bot.bot import send_document as bot_send_document
-from app.api.endpoints.workBitrix import mark_message_as_read as bitrix_mark_read
+from app.core.notifications import notification_scheduler
+from app.core.outbox import outbox_worker
+from app.utils.files import save_file_from_base64, save_upload_file
+from app.core.pubsub import publish_new_message, publish_chat_read
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -26,13 +25,22 @@ router = APIRouter()
 @router.get("/{chat_id}", response_model=List[Message])
 async def get_messages(
     chat_id: int,
-    skip: int = 0,
-    limit: int = 10000,
+    response: Response,
+    before_id: Optional[int] = Query(None, description="Вернуть страницу сообщений с ID меньше указанного (прокрутка истории)"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MESSAGES_PAGE_MAX, description="Размер страницы"),
+    after_id: Optional[int] = Query(None, description="Вернуть только сообщения с ID больше указанного"),
+    since: Optional[datetime] = Query(None, description="Вернуть также сообщения, измененные после указанного времени"),
     db: AsyncSession = Depends(get_db_dependency),
     current_user: User = Depends(get_current_active_user_dependency),
 ) -> Any:
     """
     Получение сообщений чата
+    
+    Без курсора возвращает последнюю страницу истории чата, с before_id -
+    страницу более старых сообщений. Курсор следующей страницы передается
+    в заголовке X-Next-Cursor (нет заголовка - история загружена полностью).
+    С параметрами after_id и/или since возвращает только новые и измененные
+    сообщения (инкрементальное обновление).
     """
     # Проверяем доступ к чату
     chat = await crud_chat.get(db=db, id=chat_id)
@@ -48,66 +56,64 @@ async def get_messages(
             detail="Нет доступа к этому чату",
         )
     
+    is_delta = after_id is not None or since is not None
+    
     # Получаем сообщения
-    messages = await crud_message.get_messages_by_chat(
-        db=db, chat_id=chat_id, skip=skip, limit=limit
-    )
+    if is_delta:
+        messages = await crud_message.get_messages_since(
+            db=db, chat_id=chat_id, after_id=after_id, since=since, limit=limit or 1000
+        )
+    else:
+        messages, next_before_id = await crud_message.get_messages_by_chat(
+            db=db,
+            chat_id=chat_id,
+            before_id=before_id,
+            limit=limit or settings.MESSAGES_PAGE_SIZE,
+        )
+        if next_before_id is not None:
+            response.headers["X-Next-Cursor"] = str(next_before_id)
+        
+        # Более старые страницы догружаются после первой, которая уже
+        # отметила чат прочитанным
+        if before_id is not None:
+            return messages
     
-    # Отмечаем сообщения как прочитанные в базе данных
-    await crud_message.mark_all_as_read(db=db, chat_id=chat_id)
+    # Непрочитанные сообщения клиента запоминаем до отметки о прочтении
+    unread_ids = [
+        message.id for message in messages
+        if not message.is_read and not message.is_from_manager
+    ]
     
-    # Отмечаем все сообщения как прочитанные в системе уведомлений Bitrix
-    marked_count = 0
-    for message in messages:
-        if not message.is_read and not message.is_from_manager:
-            result = bitrix_mark_read(message.id)
-            if result:
-                marked_count += 1
+    # При инкрементальном обновлении без новых входящих сообщений
+    # отмечать нечего - не трогаем базу данных
+    if is_delta and not unread_ids:
+        return messages
     
-    logger.info(f"Отмечено {marked_count} непрочитанных сообщений при загрузке чата {chat_id}")
+    # Отмечаем сообщения как прочитанные в базе данных; возвращаются ID всех
+    # отмеченных сообщений клиента, а не только попавших в текущую выборку
+    read_ids = await crud_message.mark_all_as_read(db=db, chat_id=chat_id)
     
-    # Сбрасываем счетчик непрочитанных сообщений
-    await crud_chat.reset_unread_count(db=db, chat_id=chat_id)
+    # Чат прочитан - отменяем ожидающее уведомление в Bitrix
+    if read_ids:
+        await notification_scheduler.cancel(db, chat_id=chat_id)
     
-    return messages
-
-
-async def save_file_from_base64(file_data: dict) -> str:
-    """Сохраняет файл из base64 данных и возвращает имя файла"""
-    if not file_data or 'name' not in file_data or 'data' not in file_data:
-        return None
+    logger.info(f"Отмечено {len(read_ids)} непрочитанных сообщений при загрузке чата {chat_id}")
     
-    # Создаем директорию uploads, если она не существует
-    upload_dir = Path("uploads")
-    upload_dir.mkdir(exist_ok=True)
+    # Сбрасываем счетчик непрочитанных сообщений
+    was_reset = await crud_chat.reset_unread_count(db=db, chat_id=chat_id)
     
-    # Генерируем уникальное имя файла
-    filename = f"{uuid4()}_{file_data['name']}"
-    file_path = upload_dir / filename
+    # Обновляем счетчики в других открытых вкладках менеджера
+    if was_reset or read_ids:
+        await publish_chat_read(chat)
     
-    # Декодируем и сохраняем файл
-    try:
-        file_content = base64.b64decode(file_data['data'])
-        with open(file_path, 'wb') as f:
-            f.write(file_content)
-        return str(file_path)
-    except Exception as e:
-        print(f"Ошибка при сохранении файла: {e}")
-        return None
+    return messages
 
 
-@router.post("/", response_model=Message)
-async def create_message(
-    message_in: MessageCreate,
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db_dependency),
-    current_user: User = Depends(get_current_active_user_dependency),
-) -> Any:
+async def _get_manager_chat(db: AsyncSession, chat_id: int, current_user: User):
     """
-    Создание нового сообщения
+    Загрузить чат с telegram_user и проверить доступ менеджера
     """
-    # Проверяем доступ к чату и загружаем связанные данные с telegram_user
-    chat = await crud_chat.get_chat_with_relations(db=db, chat_id=message_in.chat_id)
+    chat = await crud_chat.get_chat_with_relations(db=db, chat_id=chat_id)
     if not chat:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -119,42 +125,93 @@ async def create_message(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Нет доступа к этому чату",
         )
-    
+    return chat
+
+
+async def _create_manager_message(
+    db: AsyncSession,
+    chat: Any,
+    current_user: User,
+    message_data: dict,
+    file_path: Optional[str],
+) -> Any:
+    """
+    Сохранить сообщение менеджера и поставить его в очередь доставки в Telegram
+    """
     # Добавляем информацию о менеджере
-    message_data = message_in.model_dump(exclude={"file"})
     message_data["manager_id"] = current_user.id
     message_data["is_from_manager"] = True
+    if file_path:
+        message_data["message_type"] = "document"
+        message_data["file_path"] = file_path
+    
+    # Создаем сообщение; запись очереди доставки сохраняется в той же
+    # транзакции, отправку в Telegram выполняет фоновый обработчик
+    telegram_user = chat.telegram_user
+    message = await crud_message.create_message(
+        db=db,
+        obj_in=message_data,
+        deliver_to=telegram_user.telegram_id if telegram_user else None,
+    )
+    if telegram_user:
+        outbox_worker.wake()
+    
+    # Уведомляем другие вкладки менеджера о новом сообщении
+    await publish_new_message(chat=chat, message=message)
+    
+    return message
+
+
+@router.post("/", response_model=Message)
+async def create_message(
+    message_in: MessageCreate,
+    db: AsyncSession = Depends(get_db_dependency),
+    current_user: User = Depends(get_current_active_user_dependency),
+) -> Any:
+    """
+    Создание нового сообщения. Файл можно передать в поле file в base64
+    (для больших файлов используйте /api/messages/upload)
+    """
+    # Проверяем доступ к чату и загружаем связанные данные с telegram_user
+    chat = await _get_manager_chat(db, message_in.chat_id, current_user)
     
     # Обрабатываем файл, если он есть
     file_path = None
     if message_in.file:
         file_path = await save_file_from_base64(message_in.file)
-        if file_path:
-            message_data["message_type"] = "document"
-            message_data["file_path"] = file_path
     
-    # Создаем сообщение
-    message = await crud_message.create_message(db=db, obj_in=message_data)
+    return await _create_manager_message(
+        db, chat, current_user,
+        message_in.model_dump(exclude={"file"}), file_path,
+    )
+
+
+@router.post("/upload", response_model=Message)
+async def upload_message(
+    chat_id: int = Form(...),
+    text: str = Form(""),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db_dependency),
+    current_user: User = Depends(get_current_active_user_dependency),
+) -> Any:
+    """
+    Создание сообщения с файлом через multipart/form-data.
+    Файл записывается в uploads порциями вне event loop
+    """
+    chat = await _get_manager_chat(db, chat_id, current_user)
     
-    # Отправляем сообщение в Telegram
-    telegram_user = chat.telegram_user
-    if telegram_user:
-        # Если есть файл, отправляем его, иначе обычное сообщение
-        if file_path and message_data["message_type"] == "document":
-            background_tasks.add_task(
-                bot_send_document,
-                chat_id=telegram_user.telegram_id, 
-                document=file_path, 
-                caption=message.text if message.text else None
-            )
-        else:
-            background_tasks.add_task(
-                bot_send_message,
-                chat_id=telegram_user.telegram_id,
-                text=message.text
-            )
+    file_path = await save_upload_file(file)
+    if not file_path:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Не удалось сохранить файл",
+        )
     
-    return message
+    return await _create_manager_message(
+        db, chat, current_user,
+        {"chat_id": chat_id, "text": text, "message_type": "document"},
+        file_path,
+    )
 
 
 @router.put("/{message_id}", response_model=Message)
@@ -214,12 +271,9 @@ async def mark_message_as_read(
             detail="Нет доступа к этому сообщению",
         )
     
-    # Отмечаем сообщение как прочитанное в системе уведомлений Bitrix
-    if not message.is_read and not message.is_from_manager:
-        result = bitrix_mark_read(message_id)
-        logger.info(f"Сообщение {message_id} отмечено как прочитанное в Bitrix: {result}")
-    
-    # Отмечаем сообщение как прочитанное в базе данных
+    # Отмечаем сообщение как прочитанное в базе данных. Ожидающее уведомление
+    # не отменяем: планировщик перед отправкой сам проверит, остались ли
+    # в чате непрочитанные сообщения
     message = await crud_message.mark_as_read(db=db, message_id=message_id)
     
     return message 
\ No newline at end of file
@@ -0,0 +1,71 @@
+from typing import Any
+import asyncio
+import json
+import logging
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_current_active_user_dependency
+from app.config import settings
+from app.core.pubsub import hub
+from app.database import get_db
+from app.models.user import User
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user_dependency),
+) -> Any:
+    """
+    Поток push-событий (Server-Sent Events) для текущего менеджера.
+    Авторизация по JWT из куки token, как и у остальных API.
+
+    События:
+    - new_message: новое сообщение в чате менеджера
+    - chat_read: чат прочитан, счетчик непрочитанных сброшен
+    - message_status: изменился статус доставки сообщения менеджера в Telegram
+    """
+    manager_id = current_user.id
+
+    # Сессия нужна только для авторизации - не держим соединение с БД
+    # открытым на все время жизни потока
+    await db.close()
+
+    queue = hub.subscribe(manager_id)
+
+    async def event_generator():
+        try:
+            # Интервал переподключения для EventSource
+            yield "retry: 5000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # Комментарий SSE, чтобы прокси не закрывали соединение
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            hub.unsubscribe(manager_id, queue)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
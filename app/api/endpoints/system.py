@@ -6,6 +6,14 @@ from app.api.deps import get_db_dependency, get_current_active_user_dependency
 from app.models.user import User
 from app.utils.timezone import get_timezone_info
 from app.config import settings
+from app.api.endpoints.workBitrix import bitrix_notifier
+from app.core.actions import action_executor
+from app.core.webhooks import webhook_client
+from app.bot.sender import telegram_sender
+from app.bot.intake import update_intake
+from app.core.bus import event_bus
+from app.core.outbox import outbox_worker
+from app.crud.notification import notification as crud_notification
 
 router = APIRouter()
 
@@ -38,4 +46,27 @@ async def get_current_time(
         "local_time": local_now.strftime("%Y-%m-%d %H:%M:%S %Z"),
         "formatted_local": format_local_time(utc_now),
         "timezone": settings.TIMEZONE
-    } 
\ No newline at end of file
+    } 
+
+
+@router.get("/queues")
+async def get_queues_information(
+    db: AsyncSession = Depends(get_db_dependency),
+    current_user: User = Depends(get_current_active_user_dependency),
+) -> Any:
+    """
+    Состояние фоновых очередей: счетчики отправленных, неудачных и ожидающих задач
+    """
+    return {
+        # Ожидающие уведомления Bitrix хранятся в БД и общие для всех процессов
+        "bitrix_notifications": {
+            **bitrix_notifier.stats(),
+            "queued": await crud_notification.count_stored(db),
+        },
+        "event_actions": action_executor.stats(),
+        "webhook_actions": webhook_client.stats(),
+        "telegram_outbound": telegram_sender.stats(),
+        "manager_messages": outbox_worker.stats(),
+        "telegram_updates": update_intake.stats(),
+        "event_bus": event_bus.stats(),
+    }
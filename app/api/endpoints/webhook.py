@@ -1,9 +1,4 @@
 from typing import Any
-import os
-import base64
-from pathlib import Path
-from uuid import uuid4
-import asyncio
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -11,12 +6,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db_dependency
 from app.config import settings
-from app.schemas.webhook import SendMessageRequest, WebhookResponse, ClientMessageRequest
-from app.bot.bot import send_message, send_document
-from app.crud.user import telegram_user as crud_telegram_user, user as crud_user
-from app.crud.chat import chat as crud_chat
+from app.schemas.webhook import SendMessageRequest, WebhookResponse, ClientMessageRequest, ClientMessageBatchRequest, BroadcastRequest
 from app.crud.message import message as crud_message
-from app.api.endpoints.workBitrix import schedule_notification
+from app.core.outbox import outbox_worker
+from app.core.broadcast import start_broadcast, get_broadcast_progress
+from app.core.ingest import (
+    PROFILE_FIELDS,
+    ensure_chat,
+    get_default_manager_id,
+    ingest_client_message,
+    ingest_client_messages,
+    merge_profile,
+)
+from app.api.endpoints.workBitrix import invalidate_deal_cache
+from app.utils.files import save_file_from_base64
+from app.core.pubsub import publish_new_message
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -24,30 +28,6 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-async def save_file_from_base64(file_data: dict) -> str:
-    """Сохраняет файл из base64 данных и возвращает путь к файлу"""
-    if not file_data or 'name' not in file_data or 'data' not in file_data:
-        return None
-    
-    # Создаем директорию uploads, если она не существует
-    upload_dir = Path("uploads")
-    upload_dir.mkdir(exist_ok=True)
-    
-    # Генерируем уникальное имя файла
-    filename = f"{uuid4()}_{file_data['name']}"
-    file_path = upload_dir / filename
-    
-    # Декодируем и сохраняем файл
-    try:
-        file_content = base64.b64decode(file_data['data'])
-        with open(file_path, 'wb') as f:
-            f.write(file_content)
-        return str(file_path)
-    except Exception as e:
-        print(f"Ошибка при сохранении файла: {e}")
-        return None
-
-
 @router.post("/send-message", response_model=WebhookResponse)
 async def send_message_webhook(
     request: SendMessageRequest,
@@ -75,41 +55,16 @@ async def send_message_webhook(
         )
     
     try:
-        # Проверяем существование пользователя Telegram или создаем нового
-        telegram_user = await crud_telegram_user.get_by_telegram_id(db, telegram_id=request.telegram_id)
-        
-        if not telegram_user:
-            # Создаем нового пользователя Telegram
-            telegram_user_data = {
-                "telegram_id": request.telegram_id,
-                "username": f"user_{request.telegram_id}",  # Временное имя пользователя
-                "first_name": f"User {request.telegram_id}",  # Временное имя
-                "last_name": None,
-                "language_code": "ru"
-            }
-            telegram_user = await crud_telegram_user.create_or_update(db, telegram_user=telegram_user_data)
-        
-        # Ищем менеджера-администратора для чата
         # Берем первого доступного менеджера (в реальном проекте нужна логика выбора)
-        from sqlalchemy.future import select
-        from app.models.user import User
-        result = await db.execute(select(User).where(User.is_active == True).limit(1))
-        manager = result.scalars().first()
+        manager_id = await get_default_manager_id(db)
         
-        if not manager:
+        if manager_id is None:
             return WebhookResponse(
                 success=False,
                 message="Нет доступных менеджеров в системе",
             )
         
-        # Проверяем существование чата с пользователем или создаем новый
-        chat = await crud_chat.get_or_create_chat(
-            db, 
-            telegram_user_id=telegram_user.id, 
-            manager_id=manager.id
-        )
-        
-        # Обрабатываем файл, если он есть
+        # Обрабатываем файл, если он есть (до начала транзакции)
         file_path = None
         message_type = "text"
         
@@ -118,34 +73,50 @@ async def send_message_webhook(
             if file_path:
                 message_type = "document"
         
+        # Пользователь Telegram (новому - временные имена, существующий не
+        # меняется) и чат создаются в одной транзакции с сообщением
+        telegram_user, chat = await ensure_chat(
+            db,
+            profile={
+                "telegram_id": request.telegram_id,
+                "username": f"user_{request.telegram_id}",  # Временное имя пользователя
+                "first_name": f"User {request.telegram_id}",  # Временное имя
+                "last_name": None,
+                "language_code": "ru"
+            },
+            update_fields=(),
+            manager_id=manager_id,
+            commit=False,
+        )
+        
         # Создаем запись о сообщении в базе данных
         message_data = {
             "chat_id": chat.id,
             "text": request.text,
             "is_from_manager": True,  # Сообщение от менеджера
-            "manager_id": manager.id,
+            "manager_id": manager_id,
             "telegram_user_id": telegram_user.id,
             "message_type": message_type,
             "file_path": file_path
         }
-        await crud_message.create_message(db, obj_in=message_data)
+        # Сообщение ставится в очередь доставки в той же транзакции;
+        # отправку в Telegram выполняет фоновый обработчик
+        message = await crud_message.create_message(
+            db, obj_in=message_data, deliver_to=request.telegram_id
+        )
+        outbox_worker.wake()
         
-        # Отправляем сообщение или файл через Telegram бота
-        if file_path and message_type == "document":
-            await send_document(
-                chat_id=request.telegram_id, 
-                document=file_path, 
-                caption=request.text if request.text else None
-            )
-        else:
-            await send_message(chat_id=request.telegram_id, text=request.text)
+        # Уведомляем веб-интерфейс менеджера о новом сообщении
+        await publish_new_message(chat=chat, message=message)
         
         return WebhookResponse(
             success=True,
-            message="Сообщение успешно отправлено",
+            message="Сообщение поставлено в очередь отправки",
             data={
                 "telegram_id": request.telegram_id,
                 "chat_id": chat.id,
+                "message_id": message.id,
+                "delivery_status": message.delivery_status,
                 "file_path": file_path
             }
         )
@@ -157,6 +128,100 @@ async def send_message_webhook(
         )
 
 
+@router.post("/broadcast", response_model=WebhookResponse, status_code=status.HTTP_202_ACCEPTED)
+async def broadcast_webhook(
+    request: BroadcastRequest,
+    db: AsyncSession = Depends(get_db_dependency),
+) -> Any:
+    """
+    Рассылка одного сообщения списку клиентов через webhook API.
+    
+    Пользователи и чаты находятся или создаются пачкой, сообщения ставятся
+    в очередь доставки одной транзакцией. Ответ возвращается сразу с job_id,
+    прогресс доставки - GET /api/webhook/broadcast/{job_id}?token=...
+    ```
+    curl -X POST "http://localhost:8000/api/webhook/broadcast" \
+      -H "Content-Type: application/json" \
+      -d '{"telegram_ids": [123456789, 987654321], "text": "Инструкция по заселению", "token": "your-webhook-api-token"}'
+    ```
+    """
+    # Проверяем токен для авторизации запроса
+    if request.token != settings.WEBHOOK_API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверный токен авторизации",
+        )
+    
+    try:
+        # Берем первого доступного менеджера, как и при отправке одного сообщения
+        manager_id = await get_default_manager_id(db)
+        
+        if manager_id is None:
+            return WebhookResponse(
+                success=False,
+                message="Нет доступных менеджеров в системе",
+            )
+        
+        # Файл сохраняется один раз для всех получателей
+        file_path = None
+        if request.file:
+            file_path = await save_file_from_base64(request.file)
+        
+        job = await start_broadcast(
+            db,
+            manager_id=manager_id,
+            telegram_ids=request.telegram_ids,
+            text=request.text,
+            file_path=file_path,
+        )
+        
+        return WebhookResponse(
+            success=True,
+            message="Рассылка поставлена в очередь отправки",
+            data={
+                "job_id": job.id,
+                "total": len(job.recipients),
+                "file_path": file_path,
+            }
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при создании рассылки: {str(e)}")
+        return WebhookResponse(
+            success=False,
+            message=f"Ошибка при создании рассылки: {str(e)}",
+        )
+
+
+@router.get("/broadcast/{job_id}", response_model=WebhookResponse)
+async def broadcast_status_webhook(
+    job_id: str,
+    token: str,
+    db: AsyncSession = Depends(get_db_dependency),
+) -> Any:
+    """
+    Прогресс рассылки: количество сообщений по статусам доставки
+    (queued, sent, failed) и статус по каждому получателю
+    """
+    if token != settings.WEBHOOK_API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверный токен авторизации",
+        )
+    
+    progress = await get_broadcast_progress(db, job_id)
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Рассылка не найдена",
+        )
+    
+    return WebhookResponse(
+        success=True,
+        message="Прогресс рассылки",
+        data=progress,
+    )
+
+
 @router.post("/client-message", response_model=WebhookResponse)
 async def client_message_webhook(
     request: ClientMessageRequest,
@@ -201,51 +266,16 @@ async def client_message_webhook(
         )
     
     try:
-        # Проверяем существование пользователя Telegram или создаем/обновляем
-        telegram_user = await crud_telegram_user.get_by_telegram_id(db, telegram_id=request.telegram_id)
-        
-        # Подготавливаем данные пользователя из запроса
-        telegram_user_data = {
-            "telegram_id": request.telegram_id,
-            "username": request.username or (f"user_{request.telegram_id}" if not telegram_user else telegram_user.username),
-            "first_name": request.first_name or (f"User {request.telegram_id}" if not telegram_user else telegram_user.first_name),
-            "last_name": request.last_name if request.last_name is not None else (telegram_user.last_name if telegram_user else None),
-            "additional_info": request.additional_info if request.additional_info is not None else (telegram_user.additional_info if telegram_user else None),
-            "deal_link": request.deal_link if request.deal_link is not None else (telegram_user.deal_link if telegram_user else None),
-            "apartments": request.apartments if request.apartments is not None else (telegram_user.apartments if telegram_user else None),
-            "language_code": telegram_user.language_code if telegram_user else "ru"
-        }
-        
-        if not telegram_user:
-            # Создаем нового пользователя
-            logger.info(f"Создаем нового пользователя с данными: {telegram_user_data}")
-            telegram_user = await crud_telegram_user.create_or_update(db, telegram_user=telegram_user_data)
-        else:
-            # Обновляем существующего пользователя с новыми данными из запроса
-            logger.info(f"Обновляем пользователя {telegram_user.id} с данными: {telegram_user_data}")
-            telegram_user = await crud_telegram_user.create_or_update(db, telegram_user=telegram_user_data)
-        
-        # Ищем менеджера-администратора для чата
         # Берем первого доступного менеджера
-        from sqlalchemy.future import select
-        from app.models.user import User
-        result = await db.execute(select(User).where(User.is_active == True).limit(1))
-        manager = result.scalars().first()
+        manager_id = await get_default_manager_id(db)
         
-        if not manager:
+        if manager_id is None:
             return WebhookResponse(
                 success=False,
                 message="Нет доступных менеджеров в системе",
             )
         
-        # Получаем или создаем чат
-        chat = await crud_chat.get_or_create_chat(
-            db, 
-            telegram_user_id=telegram_user.id, 
-            manager_id=manager.id
-        )
-        
-        # Обрабатываем файл, если он есть
+        # Обрабатываем файл, если он есть (до начала транзакции)
         file_path = None
         message_type = "text"
         
@@ -254,27 +284,32 @@ async def client_message_webhook(
             if file_path:
                 message_type = "document"
         
-        # Создаем запись о сообщении в базе данных
-        message_data = {
-            "chat_id": chat.id,
-            "text": request.text,
-            "is_from_manager": False,  # Сообщение от клиента
-            "telegram_user_id": telegram_user.id,
-            "message_type": message_type,
-            "file_path": file_path
-        }
-        message = await crud_message.create_message(db, obj_in=message_data)
+        # Новому пользователю - переданные данные или временные имена;
+        # у существующего перезаписываются только переданные поля
+        profile = merge_profile(request.telegram_id, None, request)
+        update_fields = [field for field in ("username", "first_name") if getattr(request, field)]
+        update_fields += [field for field in PROFILE_FIELDS if getattr(request, field) is not None]
+        
+        # Пользователь, чат, сообщение, счетчик непрочитанных и уведомление
+        # менеджера сохраняются одной транзакцией
+        ingested = await ingest_client_message(
+            db,
+            profile=profile,
+            update_fields=update_fields,
+            manager_id=manager_id,
+            message_in={
+                "text": request.text,
+                "message_type": message_type,
+                "file_path": file_path
+            },
+        )
+        chat, message = ingested.chat, ingested.message
         
-        # Увеличиваем счетчик непрочитанных сообщений
-        await crud_chat.increment_unread_count(db, chat_id=chat.id)
+        # Сделка клиента могла смениться - сбрасываем закешированную сделку из Bitrix
+        if request.deal_link is not None or request.apartments is not None:
+            await invalidate_deal_cache(request.telegram_id)
         
-        # Планируем отправку уведомления, если сообщение не будет прочитано через 10 секунд
-        logger.info(f"Планирование уведомления из webhook для telegram_id: {request.telegram_id}, message_id: {message.id}")
-        asyncio.create_task(schedule_notification(
-            telegram_id=request.telegram_id,
-            message_id=message.id,
-            chat_id=chat.id
-        ))
+        logger.info(f"Сообщение {message.id} из webhook для telegram_id {request.telegram_id} сохранено, уведомление запланировано")
         
         return WebhookResponse(
             success=True,
@@ -292,4 +327,56 @@ async def client_message_webhook(
         return WebhookResponse(
             success=False,
             message=f"Ошибка при обработке сообщения: {str(e)}",
-        ) 
\ No newline at end of file
+        ) 
+
+
+@router.post("/client-message/batch", response_model=WebhookResponse)
+async def client_message_batch_webhook(
+    request: ClientMessageBatchRequest,
+    db: AsyncSession = Depends(get_db_dependency),
+) -> Any:
+    """
+    Пакетная загрузка сообщений от клиентов (например, перенос накопившихся
+    сообщений из других каналов).
+    
+    Каждый элемент обрабатывается так же, как /api/webhook/client-message:
+    профиль клиента обновляется переданными полями, недостающие пользователи
+    и чаты создаются. Весь пакет сохраняется одной транзакцией, уведомление
+    менеджеру планируется одно на чат. Результаты возвращаются в data.results
+    в порядке сообщений.
+    
+    Пакет принимается целиком или не принимается: при любой ошибке ни одно
+    сообщение не сохраняется (success=false, results нет), переданные файлы
+    удаляются, и пакет можно отправить повторно.
+    ```
+    curl -X POST "http://localhost:8000/api/webhook/client-message/batch" \
+      -H "Content-Type: application/json" \
+      -d '{"token": "your-webhook-api-token", "messages": [{"telegram_id": 123456789, "text": "Здравствуйте"}, {"telegram_id": 987654321, "text": "Добрый день", "first_name": "Иван"}]}'
+    ```
+    """
+    # Проверяем токен для авторизации запроса
+    if request.token != settings.WEBHOOK_API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверный токен авторизации",
+        )
+    
+    try:
+        results = await ingest_client_messages(db, request.messages)
+    except LookupError as e:
+        return WebhookResponse(
+            success=False,
+            message=str(e),
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при обработке пакета сообщений от клиентов: {str(e)}")
+        return WebhookResponse(
+            success=False,
+            message=f"Ошибка при обработке пакета сообщений: {str(e)}",
+        )
+    
+    return WebhookResponse(
+        success=True,
+        message=f"Принято сообщений от клиентов: {len(results)}",
+        data={"results": results},
+    )
@@ -4,12 +4,16 @@ from dotenv import load_dotenv
 from dataclasses import dataclass
 from app.config import settings
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.database import get_db
 from app.models.message import Message as MessageModel
+from app.utils.cache import AsyncTTLCache
+from app.utils.ratelimit import TokenBucket
+from app.core.bitrix_notifier import BitrixNotifier
+from app.core.bus import event_bus
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -34,10 +38,24 @@ class Deal:
 bit = BitrixAsync(settings.BITRIX_WEBHOOK, ssl=False)
 domain=settings.DOMAIN_BITRIX
 
-# Словарь для отслеживания сообщений, ожидающих проверки
-pending_notifications: Dict[int, Dict[str, Any]] = {}
+# Кеш сделок по telegram_id: ответственный, название апартаментов, ссылка на чат
+deal_cache = AsyncTTLCache(ttl=settings.DEAL_CACHE_TTL, maxsize=settings.DEAL_CACHE_SIZE)
+event_bus.register_cache("deal", deal_cache)
 
-async def send_notification_to_bitrix(telegram_id:int):
+# Очередь уведомлений менеджерам: отправка пачками через batch
+bitrix_notifier = BitrixNotifier(
+    client=bit,
+    rate_limiter=TokenBucket(rate=settings.BITRIX_BATCH_RATE, capacity=settings.BITRIX_BATCH_BURST),
+)
+
+async def send_notification_to_bitrix(telegram_id:int, notification_id:Optional[int]=None) -> bool:
+    """
+    Поставить уведомление ответственному по сделке клиента в очередь отправки.
+    Запись notification_id удаляется после отправки пачки в Bitrix
+
+    Returns:
+        False если уведомление не удалось подготовить или поставить в очередь
+    """
     try:
         deal=await get_deal_by_telegram_id(telegram_id)
         
@@ -46,101 +64,16 @@ async def send_notification_to_bitrix(telegram_id:int):
             'USER_ID':deal['ASSIGNED_BY_ID'],
             'MESSAGE':message,
         }
-        await bit.call('im.notify.personal.add',items=items)
-        logger.info(f"Отправлено уведомление в Bitrix для telegram_id: {telegram_id}")
+        # Уведомление уходит в Bitrix в составе ближайшей пачки batch
+        if not bitrix_notifier.enqueue(items['USER_ID'], items['MESSAGE'], notification_id=notification_id):
+            return False
+        logger.info(f"Уведомление в Bitrix для telegram_id: {telegram_id} поставлено в очередь")
+        return True
     except Exception as e:
         logger.error(f"Ошибка при отправке уведомления: {str(e)}")
-
-async def check_message_read_status(message_id: int) -> bool:
-    """
-    Проверяет статус сообщения в базе данных
-    
-    Args:
-        message_id: ID сообщения
-    
-    Returns:
-        bool: True если сообщение прочитано, False если не прочитано
-    """
-    try:
-        # Получаем соединение с базой данных
-        db_generator = get_db()
-        db = await anext(db_generator)
-        try:
-            # Запрос статуса сообщения
-            query = select(MessageModel).where(MessageModel.id == message_id)
-            result = await db.execute(query)
-            message = result.scalars().first()
-            
-            if message:
-                logger.info(f"Проверка статуса сообщения {message_id} в БД: is_read={message.is_read}")
-                return message.is_read
-            else:
-                logger.warning(f"Сообщение {message_id} не найдено в базе данных")
-                return False
-        finally:
-            await db.close()
-    except Exception as e:
-        logger.error(f"Ошибка при проверке статуса сообщения {message_id}: {str(e)}")
-        return False
-
-async def schedule_notification(telegram_id: int, message_id: int, chat_id: int):
-    """
-    Планирует отправку уведомления через 10 секунд, если сообщение не прочитано
-    
-    Args:
-        telegram_id: ID пользователя в телеграм
-        message_id: ID сообщения
-        chat_id: ID чата
-    """
-    logger.info(f"Планирование уведомления для message_id: {message_id}, telegram_id: {telegram_id}")
-    
-    # Сохраняем информацию о сообщении
-    pending_notifications[message_id] = {
-        "telegram_id": telegram_id,
-        "chat_id": chat_id,
-        "is_read": False
-    }
-    
-    # Ждем 10 секунд
-    await asyncio.sleep(10)
-    
-    # Проверяем, было ли сообщение прочитано в локальном словаре
-    if message_id in pending_notifications:
-        # Если в локальном словаре отмечено как прочитанное, то не отправляем
-        if pending_notifications[message_id]["is_read"]:
-            logger.info(f"Сообщение {message_id} уже отмечено как прочитанное, уведомление не отправляется")
-        else:
-            # Дополнительно проверяем статус в базе данных
-            is_read_in_db = await check_message_read_status(message_id)
-            
-            if is_read_in_db:
-                logger.info(f"Сообщение {message_id} прочитано согласно БД, уведомление не отправляется")
-            else:
-                # Если не прочитано ни в локальном словаре, ни в БД, отправляем уведомление
-                logger.info(f"Сообщение {message_id} не прочитано, отправляем уведомление")
-                await send_notification_to_bitrix(telegram_id)
-        
-        # Удаляем из словаря в любом случае
-        del pending_notifications[message_id]
-
-def mark_message_as_read(message_id: int):
-    """
-    Отмечает сообщение как прочитанное, чтобы не отправлять уведомление
-    
-    Args:
-        message_id: ID сообщения
-    """
-    logger.info(f"Отметка сообщения {message_id} как прочитанного")
-    
-    if message_id in pending_notifications:
-        logger.info(f"Сообщение {message_id} найдено в ожидающих, отмечаем как прочитанное")
-        pending_notifications[message_id]["is_read"] = True
-        return True
-    else:
-        logger.warning(f"Сообщение {message_id} не найдено в ожидающих уведомлениях")
         return False
 
-async def get_deal_by_telegram_id(telegram_id:int):
+async def fetch_deal_by_telegram_id(telegram_id:int):
     items={
         'filter':{
             Deal.telegram_id:telegram_id,
@@ -154,6 +87,21 @@ async def get_deal_by_telegram_id(telegram_id:int):
     # pprint(result)
     return result[0]
 
+async def get_deal_by_telegram_id(telegram_id:int):
+    """
+    Получить сделку клиента с кешированием. Одновременные запросы по одному
+    telegram_id выполняют один вызов Bitrix
+    """
+    return await deal_cache.get_or_load(telegram_id, lambda: fetch_deal_by_telegram_id(telegram_id))
+
+async def invalidate_deal_cache(*telegram_ids:int):
+    """
+    Сбросить закешированные сделки клиентов во всех процессах (например, при
+    смене сделки или апартаментов)
+    """
+    if telegram_ids:
+        await event_bus.invalidate_cache("deal", list(telegram_ids))
+
 async def main():
     # a=await is_deal_status(dealID=22215,status=Deal.Status.check_payment)
     # pprint(a)
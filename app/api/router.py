@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, chats, messages, events, webhook, system
+from app.api.endpoints import auth, chats, messages, events, webhook, system, stream
 
 api_router = APIRouter()
 
@@ -11,4 +11,5 @@ api_router.include_router(chats.stats_router, prefix="/stats", tags=["statistics
 api_router.include_router(messages.router, prefix="/messages", tags=["messages"])
 api_router.include_router(events.router, prefix="/events", tags=["events"])
 api_router.include_router(webhook.router, prefix="/webhook", tags=["webhook"])
-api_router.include_router(system.router, prefix="/system", tags=["system"]) 
\ No newline at end of file
+api_router.include_router(system.router, prefix="/system", tags=["system"])
+api_router.include_router(stream.router, prefix="/stream", tags=["stream"]) 
\ No newline at end of file
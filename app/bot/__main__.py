@@ -0,0 +1,9 @@
+"""
+Запуск бота отдельным процессом: python -m app.bot
+"""
+
+from .runner import main
+
+
+if __name__ == "__main__":
+    main()
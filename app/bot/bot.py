@@ -6,10 +6,12 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.types import FSInputFile
+from aiogram.types import FSInputFile, Message
 
 from app.config import settings
 from .middleware import register_middlewares
+from .sender import telegram_sender
+from .storage import DatabaseStorage
 from .handlers import register_handlers
 
 
@@ -18,7 +20,8 @@ bot = Bot(
     token=settings.TELEGRAM_BOT_TOKEN,
     default=DefaultBotProperties(parse_mode=ParseMode.HTML)
 )
-storage = MemoryStorage()
+# Состояния FSM в БД нужны, когда бот обслуживается несколькими процессами
+storage = DatabaseStorage() if settings.FSM_STORAGE == "database" else MemoryStorage()
 dp = Dispatcher(storage=storage)
 
 
@@ -61,6 +64,7 @@ async def stop_bot() -> None:
     """
     Остановка бота
     """
+    await telegram_sender.stop()
     await bot.session.close()
     await storage.close()
 
@@ -69,27 +73,39 @@ async def process_webhook_update(update_data: dict) -> None:
     """
     Обработка обновления через webhook
     """
-    await dp.feed_update(bot, update_data)
+    await dp.feed_raw_update(bot, update_data)
 
 
-# Функции для отправки сообщений
-async def send_message(chat_id: int, text: str, **kwargs) -> None:
+# Функции для отправки сообщений. Все запросы идут через общую очередь
+# отправки, которая соблюдает лимиты Telegram и повторяет неудачные запросы
+async def send_message(chat_id: int, text: str, **kwargs) -> Message:
     """
     Отправка сообщения пользователю
+    
+    Returns:
+        отправленное сообщение Telegram
     """
-    await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+    return await telegram_sender.submit(
+        chat_id,
+        lambda: bot.send_message(chat_id=chat_id, text=text, **kwargs),
+        label="send_message",
+    )
 
 
 async def edit_message(chat_id: int, message_id: int, text: str, **kwargs) -> None:
     """
     Редактирование сообщения
     """
-    await bot.edit_message_text(
-        chat_id=chat_id, message_id=message_id, text=text, **kwargs
+    await telegram_sender.submit(
+        chat_id,
+        lambda: bot.edit_message_text(
+            chat_id=chat_id, message_id=message_id, text=text, **kwargs
+        ),
+        label="edit_message",
     )
 
 
-async def send_document(chat_id: int, document: Union[str, BinaryIO], caption: Optional[str] = None, **kwargs) -> None:
+async def send_document(chat_id: int, document: Union[str, BinaryIO], caption: Optional[str] = None, **kwargs) -> Message:
     """
     Отправка файла пользователю
     
@@ -97,6 +113,9 @@ async def send_document(chat_id: int, document: Union[str, BinaryIO], caption: O
         chat_id: ID чата
         document: Путь к файлу или файловый объект
         caption: Подпись к файлу (опционально)
+    
+    Returns:
+        отправленное сообщение Telegram
     """
     # Проверяем, является ли document строкой с путем к файлу
     if isinstance(document, str):
@@ -105,9 +124,13 @@ async def send_document(chat_id: int, document: Union[str, BinaryIO], caption: O
     elif hasattr(document, 'name'):
         document = FSInputFile(document.name)
         
-    await bot.send_document(
-        chat_id=chat_id,
-        document=document,
-        caption=caption,
-        **kwargs
-    ) 
\ No newline at end of file
+    return await telegram_sender.submit(
+        chat_id,
+        lambda: bot.send_document(
+            chat_id=chat_id,
+            document=document,
+            caption=caption,
+            **kwargs
+        ),
+        label="send_document",
+    )
@@ -1,22 +1,23 @@
+from typing import Any, Dict
+
 from aiogram import Dispatcher, F
 from aiogram.types import Message
 from aiogram.filters import CommandStart, Command
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.user import TelegramUser
-from app.crud.chat import chat as crud_chat
+from app.bot.sender import answer_queued
+from app.core.ingest import ensure_chat
 
 
-async def cmd_start(message: Message, db: AsyncSession, db_user: TelegramUser) -> None:
+async def cmd_start(message: Message, db: AsyncSession, tg_profile: Dict[str, Any], db_user_id: int) -> None:
     """
     Обработчик команды /start
     """
-    # Создаем или получаем чат
-    chat = await crud_chat.get_or_create_chat(
-        db=db, telegram_user_id=db_user.id
-    )
+    # Профиль уже сохранен middleware - получаем или создаем чат
+    await ensure_chat(db, profile=tg_profile, telegram_user_id=db_user_id)
     
-    await message.answer(
+    await answer_queued(
+        message,
         f"Привет, {message.from_user.first_name}! 👋\n\n"
         f"Это чат для связи с менеджером. Напишите ваш вопрос, и менеджер ответит вам в ближайшее время."
     )
@@ -26,7 +27,8 @@ async def cmd_help(message: Message) -> None:
     """
     Обработчик команды /help
     """
-    await message.answer(
+    await answer_queued(
+        message,
         "Доступные команды:\n"
         "/start - Начать общение\n"
         "/help - Показать эту справку"
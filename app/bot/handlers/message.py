@@ -1,156 +1,102 @@
+from typing import Any, Dict
+
 from aiogram import Dispatcher, F
 from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
-import asyncio
 import logging
+from functools import partial
 
-from app.models.user import TelegramUser
-from app.crud.chat import chat as crud_chat
-from app.crud.message import message as crud_message
-from app.core.events import process_events, execute_action
-from app.api.endpoints.workBitrix import schedule_notification
+from app.core.actions import action_executor
+from app.bot.sender import answer_queued
+from app.core.ingest import ingest_client_message
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
 
-async def handle_text_message(message: Message, db: AsyncSession, db_user: TelegramUser) -> None:
+async def handle_text_message(message: Message, db: AsyncSession, tg_profile: Dict[str, Any], db_user_id: int) -> None:
     """
     Обработчик текстовых сообщений
     """
-    # Получаем или создаем чат
-    chat = await crud_chat.get_or_create_chat(
-        db=db, telegram_user_id=db_user.id
-    )
-    
-    # Создаем сообщение в базе
-    db_message = await crud_message.create_message(
-        db=db,
-        obj_in={
-            "chat_id": chat.id,
-            "telegram_user_id": db_user.id,
+    # Пользователь, чат, сообщение, счетчик непрочитанных и уведомление
+    # менеджера сохраняются одной транзакцией
+    ingested = await ingest_client_message(
+        db,
+        profile=tg_profile,
+        telegram_user_id=db_user_id,
+        message_in={
             "text": message.text,
             "message_type": "text",
-            "is_from_manager": False,
             "telegram_message_id": message.message_id
-        }
+        },
     )
+    logger.info(f"Сообщение {ingested.message.id} от telegram_id {tg_profile['telegram_id']} сохранено, уведомление запланировано")
     
-    # Увеличиваем счетчик непрочитанных сообщений
-    await crud_chat.increment_unread_count(db=db, chat_id=chat.id)
-    
-    # Планируем отправку уведомления, если сообщение не будет прочитано через 10 секунд
-    logger.info(f"Планирование уведомления из обработчика бота для telegram_id: {db_user.telegram_id}, message_id: {db_message.id}")
-    asyncio.create_task(schedule_notification(
-        telegram_id=db_user.telegram_id,
-        message_id=db_message.id,
-        chat_id=chat.id
-    ))
-    
-    # Обрабатываем события
+    # Обрабатываем события в фоне: сообщение сохранено, обработчик завершается сразу
     context = {
-        "message": db_message,
-        "telegram_user": db_user,
-        "chat_id": chat.id
+        "message": ingested.message,
+        "telegram_user": ingested.telegram_user,
+        "chat_id": ingested.chat.id
     }
     
-    actions = await process_events(
-        db=db,
+    action_executor.submit_events(
         event_type="new_message",
-        telegram_user_id=db_user.telegram_id,
-        context=context
+        telegram_user_id=ingested.telegram_user.telegram_id,
+        context=context,
+        reply=partial(answer_queued, message),
     )
-    
-    # Выполняем действия
-    for action in actions:
-        result = await execute_action(db=db, action=action, context=context)
-        
-        if result and result["type"] == "send_message":
-            await message.answer(result["text"])
 
 
-async def handle_photo_message(message: Message, db: AsyncSession, db_user: TelegramUser) -> None:
+async def handle_photo_message(message: Message, db: AsyncSession, tg_profile: Dict[str, Any], db_user_id: int) -> None:
     """
     Обработчик сообщений с фото
     """
-    # Получаем или создаем чат
-    chat = await crud_chat.get_or_create_chat(
-        db=db, telegram_user_id=db_user.id
-    )
-    
     # Получаем информацию о фото
     photo = message.photo[-1]  # Берем самое большое фото
     caption = message.caption or ""
     
-    # Создаем сообщение в базе
-    db_message = await crud_message.create_message(
-        db=db,
-        obj_in={
-            "chat_id": chat.id,
-            "telegram_user_id": db_user.id,
+    # Сохраняем сообщение вместе с пользователем и чатом одной транзакцией
+    ingested = await ingest_client_message(
+        db,
+        profile=tg_profile,
+        telegram_user_id=db_user_id,
+        message_in={
             "text": caption,
             "message_type": "photo",
             "file_id": photo.file_id,
-            "is_from_manager": False,
             "telegram_message_id": message.message_id
-        }
+        },
     )
-    
-    # Увеличиваем счетчик непрочитанных сообщений
-    await crud_chat.increment_unread_count(db=db, chat_id=chat.id)
-    
-    # Планируем отправку уведомления, если сообщение не будет прочитано через 10 секунд
-    logger.info(f"Планирование уведомления из обработчика фото для telegram_id: {db_user.telegram_id}, message_id: {db_message.id}")
-    asyncio.create_task(schedule_notification(
-        telegram_id=db_user.telegram_id,
-        message_id=db_message.id,
-        chat_id=chat.id
-    ))
+    logger.info(f"Фото {ingested.message.id} от telegram_id {tg_profile['telegram_id']} сохранено, уведомление запланировано")
     
     # Отправляем подтверждение
-    await message.answer("Фото получено и будет передано менеджеру.")
+    await answer_queued(message, "Фото получено и будет передано менеджеру.")
 
 
-async def handle_document_message(message: Message, db: AsyncSession, db_user: TelegramUser) -> None:
+async def handle_document_message(message: Message, db: AsyncSession, tg_profile: Dict[str, Any], db_user_id: int) -> None:
     """
     Обработчик сообщений с документами
     """
-    # Получаем или создаем чат
-    chat = await crud_chat.get_or_create_chat(
-        db=db, telegram_user_id=db_user.id
-    )
-    
     # Получаем информацию о документе
     document = message.document
     caption = message.caption or ""
     
-    # Создаем сообщение в базе
-    db_message = await crud_message.create_message(
-        db=db,
-        obj_in={
-            "chat_id": chat.id,
-            "telegram_user_id": db_user.id,
+    # Сохраняем сообщение вместе с пользователем и чатом одной транзакцией
+    ingested = await ingest_client_message(
+        db,
+        profile=tg_profile,
+        telegram_user_id=db_user_id,
+        message_in={
             "text": caption,
             "message_type": "document",
             "file_id": document.file_id,
-            "is_from_manager": False,
             "telegram_message_id": message.message_id
-        }
+        },
     )
-    
-    # Увеличиваем счетчик непрочитанных сообщений
-    await crud_chat.increment_unread_count(db=db, chat_id=chat.id)
-    
-    # Планируем отправку уведомления, если сообщение не будет прочитано через 10 секунд
-    logger.info(f"Планирование уведомления из обработчика документов для telegram_id: {db_user.telegram_id}, message_id: {db_message.id}")
-    asyncio.create_task(schedule_notification(
-        telegram_id=db_user.telegram_id,
-        message_id=db_message.id,
-        chat_id=chat.id
-    ))
+    logger.info(f"Документ {ingested.message.id} от telegram_id {tg_profile['telegram_id']} сохранен, уведомление запланировано")
     
     # Отправляем подтверждение
-    await message.answer("Документ получен и будет передан менеджеру.")
+    await answer_queued(message, "Документ получен и будет передан менеджеру.")
 
 
 def register_message_handlers(dp: Dispatcher) -> None:
@@ -159,4 +105,4 @@ def register_message_handlers(dp: Dispatcher) -> None:
     """
     dp.message.register(handle_text_message, F.text)
     dp.message.register(handle_photo_message, F.photo)
-    dp.message.register(handle_document_message, F.document) 
\ No newline at end of file
+    dp.message.register(handle_document_message, F.document)
@@ -0,0 +1,138 @@
+"""
+Прием обновлений Telegram: обновление (из webhook или long polling) ставится
+в очередь, а источник получает ответ сразу, не дожидаясь обработки
+"""
+
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from aiogram.types import Update
+
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.workers import KeyedWorkerPool
+from .bot import bot, dp
+
+logger = logging.getLogger(__name__)
+
+# Задача обработки одного обновления
+Job = Callable[[], Awaitable[Any]]
+
+
+def get_update_key(update: Union[Dict[str, Any], Update]) -> Hashable:
+    """
+    Ключ упорядочивания обновления: ID отправителя (from.id), при его
+    отсутствии - ID чата, иначе ID самого обновления
+    """
+    if isinstance(update, Update):
+        event = update.event
+        sender = getattr(event, "from_user", None)
+        if sender is not None:
+            return sender.id
+        chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+        return chat.id if chat is not None else update.update_id
+
+    for field, payload in update.items():
+        if field == "update_id" or not isinstance(payload, dict):
+            continue
+        sender = payload.get("from")
+        if isinstance(sender, dict) and sender.get("id") is not None:
+            return sender["id"]
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and chat.get("id") is not None:
+            return chat["id"]
+    return update.get("update_id")
+
+
+class UpdateIntake:
+    """
+    Очередь входящих обновлений Telegram. Обновления одного пользователя
+    обрабатываются по порядку, разных пользователей - параллельно.
+    Повторные доставки с уже принятым update_id отбрасываются
+
+    Args:
+        workers: максимальное количество одновременно обрабатываемых обновлений
+        queue_size: максимальное количество необработанных обновлений
+        dedupe_ttl: сколько помнить принятые update_id (сек.)
+        dedupe_size: сколько update_id помнить
+    """
+    def __init__(self, workers: int, queue_size: int, dedupe_ttl: float, dedupe_size: int):
+        self.pool = KeyedWorkerPool("telegram-updates", workers=workers, queue_size=queue_size)
+        self._seen = TTLCache(ttl=dedupe_ttl, maxsize=dedupe_size)
+        self.duplicates = 0
+
+    def submit(self, update: Union[Dict[str, Any], Update]) -> bool:
+        """
+        Поставить обновление в очередь
+
+        Args:
+            update: тело запроса webhook или обновление из getUpdates
+
+        Returns:
+            False если очередь переполнена: обновление нужно передать повторно позже
+        """
+        update_id, job = self._prepare(update)
+        if job is None:
+            return True
+
+        accepted = self.pool.submit(get_update_key(update), job, label="update")
+        if accepted and update_id is not None:
+            self._seen.set(update_id, True)
+        return accepted
+
+    async def put(self, update: Union[Dict[str, Any], Update]) -> None:
+        """
+        Поставить обновление в очередь, при переполнении дождаться места.
+        Используется при long polling: следующий getUpdates не запрашивается,
+        пока обновление не принято
+        """
+        update_id, job = self._prepare(update)
+        if job is None:
+            return
+
+        await self.pool.put(get_update_key(update), job, label="update")
+        if update_id is not None:
+            self._seen.set(update_id, True)
+
+    def _prepare(self, update: Union[Dict[str, Any], Update]) -> Tuple[Optional[int], Optional[Job]]:
+        """
+        Получить update_id и задачу обработки; задача None - обновление уже принято
+        """
+        if isinstance(update, Update):
+            update_id = update.update_id
+            job = lambda: dp.feed_update(bot, update)
+        else:
+            update_id = update.get("update_id")
+            job = lambda: dp.feed_raw_update(bot, update)
+
+        if update_id is not None and self._seen.get(update_id):
+            self.duplicates += 1
+            logger.info(f"Повторная доставка обновления {update_id} пропущена")
+            return update_id, None
+        return update_id, job
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Состояние очереди и статистика обработки обновлений
+        """
+        return {**self.pool.stats(), "duplicates": self.duplicates}
+
+    def start(self) -> None:
+        """
+        Запустить обработчики
+        """
+        self.pool.start()
+
+    async def stop(self) -> None:
+        """
+        Дождаться обработки принятых обновлений и остановить обработчики
+        """
+        await self.pool.stop()
+
+
+update_intake = UpdateIntake(
+    workers=settings.TELEGRAM_UPDATE_WORKERS,
+    queue_size=settings.TELEGRAM_UPDATE_QUEUE_SIZE,
+    dedupe_ttl=settings.TELEGRAM_UPDATE_DEDUPE_TTL,
+    dedupe_size=settings.TELEGRAM_UPDATE_DEDUPE_SIZE,
+)
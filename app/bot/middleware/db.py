@@ -23,24 +23,19 @@ class DatabaseMiddleware(BaseMiddleware):
             # Добавляем сессию в данные
             data["db"] = db
             
-            # Если есть пользователь, сохраняем его в базу
+            # Профиль пользователя из обновления записывается в базу, только
+            # если он изменился (известные профили хранятся в кеше)
             if "event_from_user" in data:
                 tg_user: TgUser = data["event_from_user"]
-                
-                # Создаем или обновляем пользователя в базе
-                db_user = await crud_telegram_user.create_or_update(
-                    db=db,
-                    telegram_user={
-                        "telegram_id": tg_user.id,
-                        "username": tg_user.username,
-                        "first_name": tg_user.first_name,
-                        "last_name": tg_user.last_name,
-                        "language_code": tg_user.language_code
-                    }
-                )
-                
-                # Добавляем пользователя из базы в данные
-                data["db_user"] = db_user
+                profile = {
+                    "telegram_id": tg_user.id,
+                    "username": tg_user.username,
+                    "first_name": tg_user.first_name,
+                    "last_name": tg_user.last_name,
+                    "language_code": tg_user.language_code
+                }
+                data["tg_profile"] = profile
+                data["db_user_id"] = await crud_telegram_user.save_profile(db, profile=profile)
             
             # Вызываем следующий обработчик
-            return await handler(event, data) 
\ No newline at end of file
+            return await handler(event, data)
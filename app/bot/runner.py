@@ -0,0 +1,161 @@
+"""
+Отдельный процесс бота: прием обновлений Telegram (long polling или webhook)
+независимо от веб-приложения. Запуск: python -m app.bot
+"""
+
+import asyncio
+import logging
+import signal
+from typing import Optional
+
+from aiohttp import web
+
+from app.config import settings
+from app.core.actions import action_executor
+from app.core.bus import event_bus
+from app.core.webhooks import webhook_client
+from .bot import bot, dp, setup_bot, stop_bot
+from .intake import update_intake
+
+logger = logging.getLogger(__name__)
+
+
+class UpdatePoller:
+    """
+    Long polling: обновления из getUpdates передаются в очередь приема,
+    где обрабатываются параллельно с сохранением порядка для пользователя.
+    Следующий getUpdates запрашивается только после того, как очередь
+    приняла все полученные обновления
+
+    Args:
+        timeout: таймаут long polling в секундах
+        max_backoff: максимальная пауза после ошибки запроса в секундах
+    """
+    def __init__(self, timeout: int = 30, max_backoff: float = 60.0):
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.offset: Optional[int] = None
+
+    async def run(self) -> None:
+        """
+        Получать обновления до отмены задачи
+        """
+        allowed_updates = dp.resolve_used_update_types()
+        backoff = 1.0
+        logger.info(f"Long polling запущен, типы обновлений: {allowed_updates}")
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=self.offset,
+                    timeout=self.timeout,
+                    allowed_updates=allowed_updates,
+                    request_timeout=self.timeout + 10,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка получения обновлений: {str(e)}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = 1.0
+            for update in updates:
+                await update_intake.put(update)
+                self.offset = update.update_id + 1
+
+    async def confirm(self) -> None:
+        """
+        Подтвердить Telegram принятые обновления, чтобы после перезапуска
+        они не пришли повторно
+        """
+        if self.offset is None:
+            return
+        try:
+            await bot.get_updates(offset=self.offset, timeout=0, limit=1)
+        except Exception as e:
+            logger.error(f"Не удалось подтвердить обновления: {str(e)}")
+
+
+async def handle_webhook(request: web.Request) -> web.Response:
+    """
+    Прием webhook от Telegram: обновление ставится в очередь, ответ сразу
+    """
+    if settings.WEBHOOK_SECRET:
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != settings.WEBHOOK_SECRET:
+            return web.json_response({"ok": False, "detail": "Неверный токен"}, status=403)
+
+    if not update_intake.submit(await request.json()):
+        return web.json_response(
+            {"ok": False, "detail": "Очередь обновлений переполнена"},
+            status=503,
+            headers={"Retry-After": "5"},
+        )
+    return web.json_response({"ok": True})
+
+
+async def run_bot() -> None:
+    """
+    Запустить прием обновлений и работать до SIGINT / SIGTERM, затем
+    дообработать принятые обновления и остановиться
+    """
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await event_bus.start()
+    if event_bus.stats()["backend"] == "memory":
+        # События бота (новые сообщения, сброс кешей) не дойдут до веб-приложения:
+        # страницы увидят сообщения только при редком опросе
+        logger.warning(
+            "Шина событий работает в памяти процесса (EVENT_BUS_URL не задан): "
+            "новые сообщения клиентов появятся в открытых страницах с задержкой до 30 секунд, "
+            "правила событий и кеши веб-приложения обновятся с задержкой. "
+            "Для мгновенных обновлений задайте EVENT_BUS_URL=postgresql://..."
+        )
+    # Регистрация обработчиков, установка или удаление webhook
+    await setup_bot()
+    update_intake.start()
+
+    poller: Optional[UpdatePoller] = None
+    polling_task: Optional[asyncio.Task] = None
+    site_runner: Optional[web.AppRunner] = None
+    if settings.WEBHOOK_URL:
+        app = web.Application()
+        app.router.add_post(f"/webhook/{settings.TELEGRAM_BOT_TOKEN}", handle_webhook)
+        site_runner = web.AppRunner(app)
+        await site_runner.setup()
+        await web.TCPSite(site_runner, settings.BOT_WEBHOOK_HOST, settings.BOT_WEBHOOK_PORT).start()
+        logger.info(f"Прием webhook на {settings.BOT_WEBHOOK_HOST}:{settings.BOT_WEBHOOK_PORT}")
+    else:
+        poller = UpdatePoller(timeout=settings.BOT_POLLING_TIMEOUT)
+        polling_task = asyncio.create_task(poller.run())
+
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("Остановка бота: новые обновления не принимаются")
+        if polling_task is not None:
+            polling_task.cancel()
+            await asyncio.gather(polling_task, return_exceptions=True)
+        if site_runner is not None:
+            await site_runner.cleanup()
+
+        # Дообрабатываем принятые обновления и поставленные ими действия
+        await update_intake.stop()
+        await action_executor.stop()
+        if poller is not None:
+            await poller.confirm()
+        await webhook_client.close()
+        await stop_bot()
+        await event_bus.stop()
+        logger.info("Бот остановлен")
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(run_bot())
@@ -0,0 +1,261 @@
+"""
+Общая очередь исходящих запросов к Telegram Bot API с ограничением частоты
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.types import Message
+
+from app.config import settings
+from app.utils.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _SendJob:
+    call: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    label: str
+    attempts: int = field(default=0)
+
+
+class TelegramSender:
+    """
+    Очередь отправки в Telegram: у каждого чата своя очередь, порядок внутри
+    чата сохраняется. Соблюдаются общий лимит бота (token bucket) и лимит на
+    один чат, учитывается retry_after из ответа Telegram, сетевые ошибки и
+    ошибки сервера повторяются. Вызывающий ждет результат отправки
+
+    Args:
+        global_rate: запросов в секунду на бота
+        chat_rate: запросов в секунду в один чат
+        max_concurrency: одновременных запросов к Bot API
+        max_attempts: попыток при сетевых ошибках и ошибках сервера
+        base_backoff: начальная задержка повтора (сек.)
+        max_backoff: максимальная задержка повтора (сек.)
+    """
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        max_concurrency: int = 16,
+        max_attempts: int = 5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 30.0,
+    ):
+        self.global_bucket = TokenBucket(rate=global_rate, capacity=1)
+        self.chat_interval = 1.0 / chat_rate if chat_rate > 0 else 0.0
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._queues: Dict[Any, Deque[_SendJob]] = {}
+        # Куча (время готовности, порядковый номер, чат); чат в куче или в отправке - в _scheduled
+        self._ready: List[Tuple[float, int, Any]] = []
+        self._scheduled: Set[Any] = set()
+        self._next_allowed: Dict[Any, float] = {}
+        self._seq = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        # Счетчики
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.retry_after = 0
+
+    def start(self) -> None:
+        """
+        Запустить диспетчер (вызывается автоматически при первой отправке)
+        """
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._task = asyncio.create_task(self._run())
+            logger.info("Очередь отправки Telegram запущена")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Дождаться отправки накопленного (не дольше timeout) и остановить диспетчер.
+        Неотправленные запросы завершаются ошибкой
+        """
+        if self._task is None:
+            return
+        deadline = time.monotonic() + timeout
+        while (self._queues or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        self._task.cancel()
+        for task in list(self._in_flight):
+            task.cancel()
+        await asyncio.gather(self._task, *self._in_flight, return_exceptions=True)
+        self._task = None
+
+        pending = 0
+        for queue in self._queues.values():
+            for job in queue:
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError("Очередь отправки Telegram остановлена"))
+                    pending += 1
+        self._queues.clear()
+        self._ready.clear()
+        self._scheduled.clear()
+        if pending:
+            logger.warning(f"Очередь отправки Telegram остановлена, не отправлено: {pending}")
+        logger.info("Очередь отправки Telegram остановлена")
+
+    async def submit(
+        self, chat_id: Any, call: Callable[[], Awaitable[Any]], label: str = "send"
+    ) -> Any:
+        """
+        Поставить запрос к Bot API в очередь чата и дождаться результата
+
+        Args:
+            chat_id: ID чата Telegram (ключ очереди и лимита)
+            call: функция без аргументов, выполняющая запрос
+            label: название запроса для логов
+
+        Returns:
+            результат запроса
+        """
+        self.start()
+        job = _SendJob(call=call, future=asyncio.get_running_loop().create_future(), label=label)
+        self._queues.setdefault(chat_id, deque()).append(job)
+        if chat_id not in self._scheduled:
+            self._schedule(chat_id, self._next_allowed.get(chat_id, 0.0))
+        return await job.future
+
+    def queue_depth(self) -> int:
+        """
+        Количество запросов, ожидающих отправки
+        """
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Глубина очереди и счетчики отправки
+        """
+        return {
+            "queued": self.queue_depth(),
+            "chats": len(self._queues),
+            "in_flight": len(self._in_flight),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "retry_after": self.retry_after,
+        }
+
+    def _schedule(self, chat_id: Any, ready_at: float) -> None:
+        self._seq += 1
+        heapq.heappush(self._ready, (ready_at, self._seq, chat_id))
+        self._scheduled.add(chat_id)
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            ready_at, _, chat_id = self._ready[0]
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                # Ждем готовности чата или появления более раннего
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._ready)
+            await self._semaphore.acquire()
+            await self.global_bucket.acquire()
+            task = asyncio.create_task(self._send(chat_id))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, chat_id: Any) -> None:
+        queue = self._queues[chat_id]
+        # Запросы, которые вызывающий перестал ждать, не отправляем
+        while queue and queue[0].future.done():
+            queue.popleft()
+
+        retry_at = 0.0
+        if queue:
+            job = queue[0]
+            try:
+                result = await job.call()
+            except TelegramRetryAfter as e:
+                self.retry_after += 1
+                retry_at = time.monotonic() + e.retry_after
+                logger.warning(f"Telegram просит подождать {e.retry_after} сек. перед {job.label} в чат {chat_id}")
+            except (TelegramNetworkError, TelegramServerError) as e:
+                job.attempts += 1
+                if job.attempts >= self.max_attempts:
+                    queue.popleft()
+                    self.failed += 1
+                    logger.error(f"{job.label} в чат {chat_id} не выполнен за {job.attempts} попыток: {str(e)}")
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                else:
+                    self.retried += 1
+                    delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** (job.attempts - 1)))
+                    retry_at = time.monotonic() + delay
+                    logger.warning(f"Ошибка {job.label} в чат {chat_id} (попытка {job.attempts}): {str(e)}; повтор через {delay:.1f} сек.")
+            except Exception as e:
+                queue.popleft()
+                self.failed += 1
+                logger.error(f"Ошибка {job.label} в чат {chat_id}: {str(e)}")
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                queue.popleft()
+                self.sent += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._semaphore.release()
+        else:
+            self._semaphore.release()
+
+        now = time.monotonic()
+        self._next_allowed[chat_id] = now + self.chat_interval
+        if queue:
+            self._schedule(chat_id, max(retry_at, self._next_allowed[chat_id]))
+        else:
+            del self._queues[chat_id]
+            self._scheduled.discard(chat_id)
+            # Интервалы давно отправленных чатов больше не нужны
+            if len(self._next_allowed) > 10000:
+                self._next_allowed = {
+                    key: value for key, value in self._next_allowed.items() if value > now
+                }
+
+
+telegram_sender = TelegramSender(
+    global_rate=settings.TELEGRAM_GLOBAL_RATE,
+    chat_rate=settings.TELEGRAM_CHAT_RATE,
+    max_concurrency=settings.TELEGRAM_SEND_CONCURRENCY,
+)
+
+
+async def answer_queued(message: Message, text: str) -> None:
+    """
+    Ответ клиенту через общую очередь отправки Telegram
+    """
+    await telegram_sender.submit(
+        message.chat.id, lambda: message.answer(text), label="send_message"
+    )
@@ -0,0 +1,45 @@
+"""
+Хранилище состояний FSM бота в БД: состояние пользователя общее для всех
+процессов, в отличие от MemoryStorage
+"""
+
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from app.crud.fsm import fsm_state as crud_fsm_state
+from app.database import SessionLocal
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    Хранилище FSM aiogram в таблице fsmstate
+
+    Args:
+        key_builder: построитель ключей хранилища
+    """
+    def __init__(self, key_builder: Optional[KeyBuilder] = None):
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        async with SessionLocal() as db:
+            await crud_fsm_state.save(db, key=self.key_builder.build(key), values={"state": value})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        async with SessionLocal() as db:
+            row = await crud_fsm_state.get_by_key(db, key=self.key_builder.build(key))
+        return row.state if row else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        async with SessionLocal() as db:
+            await crud_fsm_state.save(db, key=self.key_builder.build(key), values={"data": dict(data)})
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async with SessionLocal() as db:
+            row = await crud_fsm_state.get_by_key(db, key=self.key_builder.build(key))
+        return dict(row.data or {}) if row else {}
+
+    async def close(self) -> None:
+        pass
@@ -32,12 +32,72 @@ class Settings(BaseSettings):
     TELEGRAM_BOT_TOKEN: str
     WEBHOOK_URL: Optional[str] = None
     WEBHOOK_SECRET: Optional[str] = None
+    TELEGRAM_GLOBAL_RATE: float = 30.0  # Исходящих запросов в секунду на бота
+    TELEGRAM_CHAT_RATE: float = 1.0  # Исходящих запросов в секунду в один чат
+    TELEGRAM_SEND_CONCURRENCY: int = 16  # Одновременных запросов к Bot API
+    TELEGRAM_PROFILE_CACHE_SIZE: int = 10000  # Профилей клиентов в кеше DatabaseMiddleware
+    TELEGRAM_PROFILE_CACHE_TTL: int = 3600  # Время жизни записи кеша профилей (сек.)
+    TELEGRAM_WEBHOOK_QUEUE: bool = True  # Отвечать на webhook сразу, обрабатывать обновления в очереди
+    TELEGRAM_UPDATE_WORKERS: int = 8  # Одновременно обрабатываемых обновлений (порядок сохраняется для пользователя)
+    TELEGRAM_UPDATE_QUEUE_SIZE: int = 1000  # Необработанных обновлений в очереди
+    TELEGRAM_UPDATE_DEDUPE_TTL: int = 3600  # Сколько помнить принятые update_id (сек.)
+    TELEGRAM_UPDATE_DEDUPE_SIZE: int = 100000
+    BOT_POLLING_TIMEOUT: int = 30  # Таймаут long polling отдельного процесса бота (сек.)
+    BOT_WEBHOOK_HOST: str = "0.0.0.0"  # Адрес приема webhook отдельным процессом бота
+    BOT_WEBHOOK_PORT: int = 8081
+    FSM_STORAGE: str = "memory"  # Хранилище состояний бота: memory или database (несколько процессов)
+    OUTBOX_BATCH_SIZE: int = 50  # Одновременных отправок сообщений менеджеров
+    OUTBOX_POLL_SECONDS: int = 5  # Максимальный интервал проверки очереди доставки
+    OUTBOX_MAX_ATTEMPTS: int = 5  # Попыток доставки до статуса failed
     
     # Настройки API для внешних вызовов
     WEBHOOK_API_TOKEN: str = secrets.token_urlsafe(32)
+    BROADCAST_MAX_RECIPIENTS: int = 1000  # Получателей в одной рассылке
+    CLIENT_BATCH_MAX_ITEMS: int = 5000  # Сообщений в одном пакете /client-message/batch
     BITRIX_WEBHOOK:str='https://begt.bitrix24.ru/rest/1/1234567890/'
     DOMAIN_BITRIX:str='begt.bitrix24.ru'
     
+    # Настройки push-обновлений веб-интерфейса (SSE)
+    STREAM_KEEPALIVE_SECONDS: int = 15
+    STREAM_QUEUE_SIZE: int = 100
+    
+    # Шина событий между процессами: пусто или memory:// - один процесс,
+    # postgresql://... - LISTEN/NOTIFY для нескольких воркеров uvicorn
+    EVENT_BUS_URL: Optional[str] = None
+    
+    # Постраничная загрузка истории чата
+    MESSAGES_PAGE_SIZE: int = 50  # Сообщений на странице по умолчанию
+    MESSAGES_PAGE_MAX: int = 500  # Максимальный размер страницы
+    
+    # Постраничная загрузка списка чатов
+    CHATS_PAGE_SIZE: int = 50  # Чатов на странице по умолчанию
+    CHATS_PAGE_MAX: int = 500  # Максимальный размер страницы
+    
+    # Время жизни кеша статистики дашборда в секундах (0 - без кеша)
+    STATS_CACHE_TTL: int = 30
+    
+    # Как часто сверять скомпилированные правила событий с БД (сек.): подстраховка,
+    # если сброс через шину событий не дошел до процесса (0 - при каждом сообщении)
+    EVENT_RULES_CHECK_SECONDS: float = 5
+    
+    # Уведомления в Bitrix о непрочитанных сообщениях клиентов
+    NOTIFICATION_DELAY_SECONDS: int = 10  # Задержка перед уведомлением
+    NOTIFICATION_POLL_SECONDS: int = 5  # Максимальный интервал проверки очереди
+    NOTIFICATION_LEASE_SECONDS: int = 300  # Аренда уведомления на время отправки
+    NOTIFICATION_MAX_ATTEMPTS: int = 5  # Попыток отправки до отказа от уведомления
+    DEAL_CACHE_TTL: int = 600  # Время жизни кеша сделок по telegram_id (0 - без кеша)
+    DEAL_CACHE_SIZE: int = 1024
+    BITRIX_BATCH_RATE: float = 1.0  # Запросов batch с уведомлениями в секунду
+    BITRIX_BATCH_BURST: int = 2  # Допустимый всплеск запросов batch
+    
+    # Фоновое выполнение действий событий
+    ACTION_WORKERS: int = 8  # Одновременно выполняемых обработок событий (порядок сохраняется в пределах чата)
+    ACTION_QUEUE_SIZE: int = 1000  # Невыполненных обработок событий в очереди
+    WEBHOOK_ACTION_TIMEOUT: float = 10.0  # Таймаут запроса действия run_webhook (сек.)
+    WEBHOOK_ACTION_ATTEMPTS: int = 3  # Количество попыток запроса
+    WEBHOOK_ACTION_PER_HOST: int = 4  # Одновременных запросов к одному хосту
+    WEBHOOK_ACTION_POOL_SIZE: int = 100  # Соединений в общем пуле
+    
     # Настройки времени и часового пояса
     TIMEZONE: str = "Asia/Yekaterinburg"  # UTC+5 по умолчанию
     # CORS настройки
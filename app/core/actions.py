@@ -0,0 +1,126 @@
+"""
+Фоновое выполнение действий событий вне обработчиков бота
+"""
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+from app.core.events import process_events, execute_action
+from app.core.webhooks import webhook_client
+from app.database import SessionLocal
+from app.utils.workers import KeyedWorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Функция ответа клиенту в тот же чат (например, message.answer)
+Reply = Callable[[str], Awaitable[Any]]
+
+
+class ActionExecutor:
+    """
+    Исполнитель действий событий: подбор правил и выполнение действий идут
+    в пуле обработчиков. Действия одного чата выполняются по порядку,
+    разных чатов - параллельно. Время выполнения и ошибки учитываются
+    по типу действия
+    """
+    def __init__(self, workers: int, queue_size: int):
+        self.pool = KeyedWorkerPool("event-actions", workers=workers, queue_size=queue_size)
+
+    def submit_events(
+        self,
+        *,
+        event_type: str,
+        telegram_user_id: int,
+        context: Dict[str, Any],
+        reply: Optional[Reply] = None,
+    ) -> bool:
+        """
+        Поставить обработку событий в очередь чата и сразу вернуть управление
+
+        Args:
+            event_type: тип события
+            telegram_user_id: ID пользователя Telegram
+            context: контекст события (сообщение, пользователь, chat_id);
+                ORM объекты должны быть загружены
+            reply: функция отправки ответа клиенту для действия send_message
+        """
+        return self.pool.submit(
+            context.get("chat_id"),
+            lambda: self._run_events(event_type, telegram_user_id, context, reply),
+            label="process_events",
+        )
+
+    async def _run_events(
+        self,
+        event_type: str,
+        telegram_user_id: int,
+        context: Dict[str, Any],
+        reply: Optional[Reply],
+    ) -> None:
+        async with SessionLocal() as db:
+            actions = await process_events(
+                db=db,
+                event_type=event_type,
+                telegram_user_id=telegram_user_id,
+                context=context,
+            )
+            results = []
+            for action in actions:
+                try:
+                    results.append((action, await execute_action(db=db, action=action, context=context)))
+                except Exception as e:
+                    logger.error(f"Ошибка подготовки действия {action.get('action_type')} события {action.get('event_id')}: {str(e)}")
+                    self.pool.record(f"action:{action.get('action_type')}", 0.0, True)
+        
+        # Сессия закрыта: ответы клиенту и запросы к внешним сервисам
+        # не занимают соединение с БД
+        for action, result in results:
+            await self._run_action(action, result, reply)
+
+    async def _run_action(
+        self,
+        action: Dict[str, Any],
+        result: Optional[Dict[str, Any]],
+        reply: Optional[Reply],
+    ) -> None:
+        started = time.monotonic()
+        failed = False
+        try:
+            if not result:
+                return
+            if result["type"] == "send_message" and reply is not None:
+                await reply(result["text"])
+            elif result["type"] == "run_webhook":
+                await webhook_client.request(
+                    result["method"],
+                    result["url"],
+                    json=result["payload"],
+                    headers=result["headers"],
+                )
+        except Exception as e:
+            failed = True
+            logger.error(f"Ошибка выполнения действия {action.get('action_type')} события {action.get('event_id')}: {str(e)}")
+        finally:
+            self.pool.record(
+                f"action:{action.get('action_type')}", time.monotonic() - started, failed
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Состояние очереди и статистика выполнения действий
+        """
+        return self.pool.stats()
+
+    async def stop(self) -> None:
+        """
+        Дождаться выполнения поставленных действий и остановить обработчики
+        """
+        await self.pool.stop()
+
+
+action_executor = ActionExecutor(
+    workers=settings.ACTION_WORKERS,
+    queue_size=settings.ACTION_QUEUE_SIZE,
+)
@@ -0,0 +1,255 @@
+"""
+Исходящая очередь уведомлений менеджеров в Bitrix24 с отправкой пачками
+через метод batch
+"""
+
+import asyncio
+import logging
+import random
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fast_bitrix24.server_response import ErrorInServerResponseException
+
+from app.config import settings
+from app.core.notifications import notification_scheduler, utcnow
+from app.crud.notification import notification as crud_notification
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество команд в одном запросе batch (ограничение Bitrix24)
+BITRIX_BATCH_LIMIT = 50
+
+
+class BitrixNotifier:
+    """
+    Диспетчер уведомлений: копит уведомления в очереди и отправляет их
+    запросами batch (до 50 команд), соблюдая ограничение частоты запросов.
+    Сетевые ошибки и отказы Bitrix по лимитам повторяются с экспоненциальной
+    задержкой и случайным разбросом; ошибки отдельных команд не повторяются.
+
+    Очередь в памяти - только буфер пачки: запись pendingnotification
+    уведомления остается в аренде планировщика и удаляется после ответа
+    Bitrix. Если пачку отправить не удалось или процесс остановился раньше,
+    запись возвращается в очередь БД и уведомление отправляется повторно.
+
+    Args:
+        client: клиент BitrixAsync
+        rate_limiter: ограничитель частоты запросов batch
+        batch_size: максимальное количество команд в запросе
+        linger: сколько ждать добора пачки после первого уведомления (сек.)
+        max_attempts: количество попыток отправки пачки
+        base_backoff: начальная задержка повтора (сек.)
+        max_backoff: максимальная задержка повтора (сек.)
+        queue_size: максимальный размер буфера
+        retry_delay: через сколько вернуть в очередь БД неотправленную пачку (сек.)
+    """
+    def __init__(
+        self,
+        client: Any,
+        rate_limiter: Any,
+        batch_size: int = BITRIX_BATCH_LIMIT,
+        linger: float = 0.5,
+        max_attempts: int = 5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        queue_size: int = 10000,
+        retry_delay: float = 60.0,
+    ):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.batch_size = min(batch_size, BITRIX_BATCH_LIMIT)
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = 0
+        # Счетчики
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+
+    def enqueue(self, user_id: Any, message: str, notification_id: Optional[int] = None) -> bool:
+        """
+        Поставить уведомление пользователю Bitrix в очередь
+
+        Args:
+            notification_id: запись pendingnotification, которая удаляется
+                после отправки уведомления
+
+        Returns:
+            False если буфер переполнен: уведомление не принято, запись
+            остается в очереди БД
+        """
+        try:
+            self._queue.put_nowait((notification_id, {"USER_ID": user_id, "MESSAGE": message}))
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Буфер уведомлений Bitrix переполнен, уведомление для {user_id} не принято")
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики диспетчера. Ожидающие уведомления хранятся в таблице
+        pendingnotification, здесь - только буфер текущего процесса
+        """
+        return {
+            "buffered": self._queue.qsize() + self._in_flight,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "batches": self.batches,
+        }
+
+    def start(self) -> None:
+        """
+        Запустить фоновую отправку
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info("Диспетчер уведомлений Bitrix запущен")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Остановить отправку, дав до timeout секунд на отправку накопленного
+        """
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не отправлено уведомлений Bitrix при остановке: {self.stats()['buffered']}")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Неотправленные уведомления сразу возвращаем в очередь БД, не дожидаясь
+        # окончания аренды: их отправит следующий запущенный процесс
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            await self._release(pending, delay=0)
+        logger.info("Диспетчер уведомлений Bitrix остановлен")
+
+    async def _drain(self) -> None:
+        while self._queue.qsize() or self._in_flight:
+            await asyncio.sleep(0.1)
+
+    async def _next_batch(self) -> List[Tuple[Optional[int], Dict[str, Any]]]:
+        """
+        Дождаться уведомления и добрать пачку в течение linger секунд
+        """
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            self._in_flight = len(batch)
+            try:
+                handled = await self._send_batch([items for _, items in batch])
+            except asyncio.CancelledError:
+                # Остановка во время отправки: уведомления вернутся в очередь БД
+                # по окончании аренды
+                raise
+            except Exception as e:
+                handled = False
+                logger.error(f"Ошибка при отправке пачки уведомлений Bitrix: {str(e)}")
+            try:
+                if handled:
+                    await self._complete(batch)
+                else:
+                    await self._release(batch, delay=self.retry_delay)
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении результата пачки уведомлений Bitrix: {str(e)}")
+            finally:
+                self._in_flight = 0
+
+    async def _complete(self, batch: List[Tuple[Optional[int], Dict[str, Any]]]) -> None:
+        """
+        Удалить записи pendingnotification обработанной пачки
+        """
+        ids = [notification_id for notification_id, _ in batch if notification_id is not None]
+        if ids:
+            async with SessionLocal() as db:
+                await crud_notification.complete(db, ids=ids)
+
+    async def _release(self, batch: List[Tuple[Optional[int], Dict[str, Any]]], delay: float) -> None:
+        """
+        Вернуть записи pendingnotification неотправленной пачки в очередь БД
+        """
+        ids = [notification_id for notification_id, _ in batch if notification_id is not None]
+        if ids:
+            due_at = utcnow() + timedelta(seconds=delay)
+            async with SessionLocal() as db:
+                await crud_notification.retry_later(db, ids=ids, due_at=due_at)
+            notification_scheduler.wake(due_at)
+            logger.warning(f"Уведомлений Bitrix возвращено в очередь: {len(ids)}")
+
+    async def _send_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """
+        Отправить пачку уведомлений одним запросом batch с повторами
+
+        Returns:
+            True если Bitrix обработал пачку (в том числе отклонив отдельные
+            команды), False если пачку отправить не удалось
+        """
+        commands = {
+            f"notify_{index}": f"im.notify.personal.add?{urlencode(items)}"
+            for index, items in enumerate(batch)
+        }
+        for attempt in range(1, self.max_attempts + 1):
+            await self.rate_limiter.acquire()
+            try:
+                await self.client.call_batch({"halt": 0, "cmd": commands})
+            except ErrorInServerResponseException as e:
+                # Часть команд завершилась ошибкой - такие ошибки не повторяем
+                errors = e.args[0] if e.args and isinstance(e.args[0], dict) else {}
+                failed = min(len(errors), len(batch)) or len(batch)
+                self.batches += 1
+                self.sent += len(batch) - failed
+                self.failed += failed
+                logger.error(f"Bitrix отклонил {failed} из {len(batch)} уведомлений: {errors}")
+                return True
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.failed += len(batch)
+                    logger.error(f"Пачка из {len(batch)} уведомлений Bitrix не отправлена за {attempt} попыток: {str(e)}")
+                    return False
+                # Экспоненциальная задержка с полным случайным разбросом
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+                delay = random.uniform(0, backoff)
+                self.retried += 1
+                logger.warning(f"Ошибка отправки пачки уведомлений Bitrix (попытка {attempt}): {str(e)}; повтор через {delay:.1f} сек.")
+                await asyncio.sleep(delay)
+            else:
+                self.batches += 1
+                self.sent += len(batch)
+                logger.info(f"Отправлено уведомлений в Bitrix одной пачкой: {len(batch)}")
+                return True
+        return False
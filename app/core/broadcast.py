@@ -0,0 +1,145 @@
+"""
+Рассылка одного сообщения списку клиентов через webhook API
+"""
+
+import logging
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.outbox import outbox_worker
+from app.core.pubsub import publish_new_message
+from app.crud.chat import chat as crud_chat
+from app.crud.message import message as crud_message
+from app.crud.user import telegram_user as crud_telegram_user
+from app.models.message import Message
+from app.models.user import TelegramUser
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BroadcastJob:
+    """
+    Задание рассылки: получатели и созданные для них сообщения.
+    Сообщения рассылки помечаются ее ID (Message.broadcast_id), поэтому
+    прогресс доступен любому процессу и после перезапуска
+    """
+    id: str
+    created_at: datetime
+    # Пары (Telegram ID, ID сообщения) в порядке запроса
+    recipients: List[tuple] = field(default_factory=list)
+
+
+async def start_broadcast(
+    db: AsyncSession,
+    *,
+    manager_id: int,
+    telegram_ids: List[int],
+    text: str,
+    file_path: Optional[str] = None,
+) -> BroadcastJob:
+    """
+    Создать сообщения рассылки и поставить их в очередь доставки.
+    Пользователи и чаты находятся или создаются пачкой; они, сообщения и записи
+    очереди сохраняются одной транзакцией. Отправку выполняет обработчик outbox
+    
+    Args:
+        manager_id: менеджер, от имени которого идет рассылка
+        telegram_ids: получатели (повторы отбрасываются)
+        text: текст сообщения
+        file_path: путь к сохраненному файлу (опционально)
+    """
+    telegram_ids = list(dict.fromkeys(telegram_ids))
+    job_id = uuid.uuid4().hex
+    
+    users = await crud_telegram_user.get_or_create_many(db, telegram_ids=telegram_ids, commit=False)
+    chats = await crud_chat.get_or_create_many(
+        db,
+        telegram_user_ids=[user.id for user in users.values()],
+        manager_id=manager_id,
+        commit=False,
+    )
+    
+    objs_in = []
+    for telegram_id in telegram_ids:
+        user = users[telegram_id]
+        objs_in.append({
+            "chat_id": chats[user.id].id,
+            "text": text,
+            "is_from_manager": True,
+            "manager_id": manager_id,
+            "telegram_user_id": user.id,
+            "message_type": "document" if file_path else "text",
+            "file_path": file_path,
+            "broadcast_id": job_id,
+        })
+    messages = await crud_message.create_messages(
+        db, objs_in=objs_in, deliver_to=telegram_ids, commit=False
+    )
+    await db.commit()
+    outbox_worker.wake()
+    
+    job = BroadcastJob(
+        id=job_id,
+        created_at=datetime.now(timezone.utc),
+        recipients=[(telegram_id, message.id) for telegram_id, message in zip(telegram_ids, messages)],
+    )
+    logger.info(f"Рассылка {job.id}: {len(messages)} сообщений поставлено в очередь")
+    
+    # Уведомляем веб-интерфейс менеджеров о новых сообщениях
+    for telegram_id, message in zip(telegram_ids, messages):
+        await publish_new_message(chat=chats[users[telegram_id].id], message=message)
+    
+    return job
+
+
+async def get_broadcast_progress(db: AsyncSession, job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Прогресс рассылки по статусам доставки ее сообщений (один запрос)
+    
+    Returns:
+        None если сообщений рассылки нет
+    """
+    result = await db.execute(
+        select(
+            Message.id,
+            Message.delivery_status,
+            Message.telegram_message_id,
+            Message.created_at,
+            TelegramUser.telegram_id,
+        )
+        .join(TelegramUser, TelegramUser.id == Message.telegram_user_id)
+        .where(Message.broadcast_id == job_id)
+        .order_by(Message.id)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+    
+    recipients = [
+        {
+            "telegram_id": row.telegram_id,
+            "message_id": row.id,
+            "delivery_status": row.delivery_status,
+            "telegram_message_id": row.telegram_message_id,
+        }
+        for row in rows
+    ]
+    counts = Counter(recipient["delivery_status"] for recipient in recipients)
+    
+    return {
+        "job_id": job_id,
+        "created_at": rows[0].created_at,
+        "total": len(recipients),
+        "queued": counts.get("queued", 0),
+        "sent": counts.get("sent", 0),
+        "failed": counts.get("failed", 0),
+        "done": counts.get("queued", 0) == 0,
+        "recipients": recipients,
+    }
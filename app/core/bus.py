@@ -0,0 +1,236 @@
+"""
+Шина событий между процессами приложения (воркерами uvicorn).
+
+Через шину идут push-события веб-интерфейса и сброс кешей процесса.
+Реализации: MemoryEventBus - в пределах одного процесса (и для проверок),
+PostgresEventBus - между процессами через LISTEN/NOTIFY
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Обработчик получает данные события; вызывается в каждом процессе
+Handler = Callable[[Dict[str, Any]], None]
+
+# Тема сброса кешей процесса
+CACHE_TOPIC = "cache"
+
+# Больше ключей в одном сбросе - кеш очищается целиком (лимит размера NOTIFY)
+MAX_INVALIDATE_KEYS = 100
+
+
+class MemoryEventBus:
+    """
+    Шина событий в памяти процесса: событие сразу доставляется подписчикам
+    этого же процесса. Подходит для одного воркера и для проверок
+    """
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._caches: Dict[str, Any] = {}
+        self.published = 0
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        """
+        Подписать обработчик на тему
+        """
+        self._handlers.setdefault(topic, []).append(handler)
+
+    async def publish(self, topic: str, data: Dict[str, Any]) -> None:
+        """
+        Опубликовать событие для всех процессов
+        """
+        self.published += 1
+        self.dispatch(topic, data)
+
+    def dispatch(self, topic: str, data: Dict[str, Any]) -> None:
+        """
+        Доставить событие подписчикам текущего процесса
+        """
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(data)
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике события {topic}: {str(e)}")
+
+    def register_cache(self, name: str, cache: Any) -> None:
+        """
+        Зарегистрировать кеш процесса (TTLCache / AsyncTTLCache), записи
+        которого сбрасываются во всех процессах через invalidate_cache
+        """
+        if not self._caches:
+            self.subscribe(CACHE_TOPIC, self._on_invalidate)
+        self._caches[name] = cache
+
+    async def invalidate_cache(self, name: str, keys: Optional[List[Hashable]] = None) -> None:
+        """
+        Сбросить записи кеша во всех процессах
+
+        Args:
+            name: имя кеша из register_cache
+            keys: ключи записей; None - очистить кеш целиком
+        """
+        if keys is not None and len(keys) > MAX_INVALIDATE_KEYS:
+            keys = None
+        await self.publish(CACHE_TOPIC, {"name": name, "keys": keys})
+
+    def _on_invalidate(self, data: Dict[str, Any]) -> None:
+        cache = self._caches.get(data.get("name"))
+        if cache is None:
+            return
+        keys = data.get("keys")
+        if keys is None:
+            cache.clear()
+            return
+        for key in keys:
+            cache.invalidate(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Состояние шины
+        """
+        return {"backend": "memory", "published": self.published}
+
+    async def start(self) -> None:
+        """
+        Подключиться к брокеру (для памяти процесса ничего не делает)
+        """
+
+    async def stop(self) -> None:
+        """
+        Отключиться от брокера (для памяти процесса ничего не делает)
+        """
+
+
+class PostgresEventBus(MemoryEventBus):
+    """
+    Шина событий через PostgreSQL LISTEN/NOTIFY. Каждый процесс слушает
+    общий канал на отдельном соединении; событие, опубликованное любым
+    процессом (в том числе текущим), доставляется подписчикам всех процессов.
+    При потере соединения процесс переподключается, а до переподключения
+    события доставляются только локально
+
+    Args:
+        dsn: строка подключения PostgreSQL
+        channel: имя канала NOTIFY
+        reconnect_delay: пауза между попытками переподключения в секундах
+    """
+    # Предельный размер payload NOTIFY в PostgreSQL - 8000 байт
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, dsn: str, channel: str = "chat_room_events", reconnect_delay: float = 5.0):
+        super().__init__()
+        self.dsn = dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._conn = None
+        self._lock = asyncio.Lock()
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.failed = 0
+
+    async def publish(self, topic: str, data: Dict[str, Any]) -> None:
+        self.published += 1
+        payload = json.dumps({"topic": topic, "data": data}, default=str)
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            logger.error(f"Событие {topic} слишком велико для NOTIFY, доставлено только локально")
+            self.dispatch(topic, data)
+            return
+
+        conn = self._conn
+        if conn is None or conn.is_closed():
+            self.failed += 1
+            self.dispatch(topic, data)
+            return
+
+        try:
+            # Одно соединение не выполняет запросы параллельно
+            async with self._lock:
+                await conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Ошибка публикации события {topic}: {str(e)}")
+            self.dispatch(topic, data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "postgresql",
+            "connected": self._conn is not None and not self._conn.is_closed(),
+            "published": self.published,
+            "failed": self.failed,
+        }
+
+    async def start(self) -> None:
+        self._stopping = False
+        try:
+            await self._connect()
+        except Exception as e:
+            logger.error(f"Не удалось подключиться к шине событий: {str(e)}")
+            self._schedule_reconnect()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+        logger.info("Шина событий остановлена")
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        conn = await asyncpg.connect(self.dsn)
+        await conn.add_listener(self.channel, self._on_notify)
+        conn.add_termination_listener(self._on_terminated)
+        self._conn = conn
+        logger.info(f"Шина событий подключена к каналу {self.channel}")
+
+    def _on_notify(self, conn: Any, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.error(f"Некорректное событие в канале {channel}")
+            return
+        self.dispatch(message.get("topic"), message.get("data") or {})
+
+    def _on_terminated(self, conn: Any) -> None:
+        if self._stopping:
+            return
+        logger.warning("Соединение шины событий потеряно")
+        self._conn = None
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._connect()
+                return
+            except Exception as e:
+                logger.error(f"Не удалось переподключиться к шине событий: {str(e)}")
+
+
+def create_event_bus(url: Optional[str]) -> MemoryEventBus:
+    """
+    Создать шину по адресу EVENT_BUS_URL: пусто или memory:// - память
+    процесса, postgresql://... - LISTEN/NOTIFY
+    """
+    if not url or url.startswith("memory://"):
+        return MemoryEventBus()
+    if url.startswith("postgres"):
+        return PostgresEventBus(url)
+    raise ValueError(f"Неподдерживаемый EVENT_BUS_URL: {url}")
+
+
+event_bus = create_event_bus(settings.EVENT_BUS_URL)
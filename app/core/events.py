@@ -1,10 +1,175 @@
 from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+import asyncio
+import logging
+import time
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
+from app.core.bus import event_bus
 from app.models.event import Event
 from app.models.message import Message
-from app.crud import event as event_crud
+from app.crud.event import event as crud_event
+from app.core.webhooks import build_template_variables, render_template
+from app.utils.aho_corasick import AhoCorasick
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompiledRule:
+    """
+    Правило события, подготовленное для проверки без обращения к БД
+    """
+    event_id: int
+    action_type: str
+    action_data: Dict[str, Any]
+    telegram_user_id: Optional[int]
+    # Номера шаблонов text_contains в автомате набора правил
+    text_patterns: List[int]
+    user_username: Optional[str]
+
+
+class CompiledRuleSet:
+    """
+    Скомпилированные активные правила одного типа события.
+    Все условия text_contains проверяются одним проходом по тексту сообщения
+    """
+    def __init__(self, events: List[Event]):
+        patterns: Dict[str, int] = {}
+        self.rules: List[CompiledRule] = []
+        
+        for event in sorted(events, key=lambda event: event.id):
+            text_patterns = []
+            user_username = None
+            for condition_key, condition_value in (event.conditions or {}).items():
+                # Пустое значение условия не ограничивает срабатывание
+                if not condition_value:
+                    continue
+                if condition_key == "text_contains":
+                    pattern = str(condition_value).lower()
+                    text_patterns.append(patterns.setdefault(pattern, len(patterns)))
+                elif condition_key == "user_username":
+                    user_username = condition_value
+            
+            self.rules.append(CompiledRule(
+                event_id=event.id,
+                action_type=event.action_type,
+                action_data=event.action_data or {},
+                telegram_user_id=event.telegram_user_id,
+                text_patterns=text_patterns,
+                user_username=user_username,
+            ))
+        
+        self.matcher = AhoCorasick(patterns) if patterns else None
+    
+    def match(self, telegram_user_id: Optional[int], context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Действия правил, условия которых выполнены
+        """
+        message = context.get("message")
+        telegram_user = context.get("telegram_user")
+        
+        found = None
+        if self.matcher is not None and isinstance(message, Message):
+            found = self.matcher.find_all((message.text or "").lower())
+        
+        actions = []
+        for rule in self.rules:
+            if telegram_user_id and rule.telegram_user_id not in (None, telegram_user_id):
+                continue
+            if rule.text_patterns:
+                if found is None or not all(index in found for index in rule.text_patterns):
+                    continue
+            if rule.user_username is not None:
+                if telegram_user is None or telegram_user.username != rule.user_username:
+                    continue
+            actions.append({
+                "event_id": rule.event_id,
+                "action_type": rule.action_type,
+                "action_data": rule.action_data,
+            })
+        return actions
+
+
+class RuleRegistry:
+    """
+    Кеш скомпилированных правил по типу события. Правила загружаются из БД
+    при первом обращении и перестраиваются после изменения событий.
+    
+    Изменения обычно приходят сбросом через шину событий. Если сброс не дошел
+    (шина в памяти другого процесса, потерянный NOTIFY), кеш сбрасывается по
+    версии набора событий в БД, которая сверяется не чаще раза в check_interval
+    секунд
+    
+    Args:
+        check_interval: интервал сверки версии с БД (0 - при каждом обращении)
+    """
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self._rule_sets: Dict[str, CompiledRuleSet] = {}
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self._db_version: Optional[tuple] = None
+        self._checked_at: Optional[float] = None
+    
+    async def _check_db_version(self, db: AsyncSession) -> None:
+        """
+        Сбросить кеш, если события в БД изменились с прошлой сверки
+        """
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        db_version = await crud_event.get_version(db)
+        if self._db_version is not None and db_version != self._db_version:
+            logger.info("События изменились в БД, скомпилированные правила сброшены")
+            self.clear()
+        self._db_version = db_version
+    
+    async def get(self, db: AsyncSession, event_type: str) -> CompiledRuleSet:
+        """
+        Получить скомпилированные правила типа события
+        """
+        await self._check_db_version(db)
+        rule_set = self._rule_sets.get(event_type)
+        if rule_set is not None:
+            return rule_set
+        
+        async with self._lock:
+            rule_set = self._rule_sets.get(event_type)
+            if rule_set is not None:
+                return rule_set
+            
+            version = self._version
+            events = await crud_event.get_active_events_by_type(db, event_type=event_type)
+            rule_set = CompiledRuleSet(events)
+            # Правила изменились во время загрузки - не кешируем устаревший набор
+            if version == self._version:
+                self._rule_sets[event_type] = rule_set
+            logger.info(f"Скомпилированы правила события {event_type}: {len(rule_set.rules)}")
+            return rule_set
+    
+    def invalidate(self, event_type: str) -> None:
+        """
+        Сбросить скомпилированные правила одного типа события
+        """
+        self._version += 1
+        self._rule_sets.pop(event_type, None)
+    
+    def clear(self) -> None:
+        """
+        Сбросить все скомпилированные правила (после изменения событий)
+        """
+        self._version += 1
+        self._rule_sets.clear()
+
+
+rule_registry = RuleRegistry(check_interval=settings.EVENT_RULES_CHECK_SECONDS)
+# Правила сбрасываются во всех процессах (воркеры API и бот) через
+# event_bus.invalidate_cache("event_rules")
+event_bus.register_cache("event_rules", rule_registry)
 
 
 async def process_events(
@@ -25,64 +190,8 @@ async def process_events(
     Returns:
         Список действий для выполнения
     """
-    # Получаем все активные события заданного типа
-    events = await event_crud.get_active_events_by_type(
-        db=db, 
-        event_type=event_type,
-        telegram_user_id=telegram_user_id
-    )
-    
-    actions = []
-    
-    for event in events:
-        # Проверяем условия срабатывания
-        if await check_event_conditions(event, context):
-            # Добавляем действие в список для выполнения
-            action = {
-                "event_id": event.id,
-                "action_type": event.action_type,
-                "action_data": event.action_data or {}
-            }
-            actions.append(action)
-    
-    return actions
-
-
-async def check_event_conditions(event: Event, context: Dict[str, Any]) -> bool:
-    """
-    Проверка условий срабатывания события
-    
-    Args:
-        event: событие для проверки
-        context: контекст события
-        
-    Returns:
-        True если все условия выполнены, иначе False
-    """
-    if not event.conditions:
-        return True
-    
-    # Проверяем каждое условие
-    for condition_key, condition_value in event.conditions.items():
-        if condition_key == "text_contains":
-            # Проверяем что сообщение содержит заданный текст
-            if "message" not in context or not isinstance(context["message"], Message):
-                return False
-            
-            message: Message = context["message"]
-            if condition_value and condition_value.lower() not in message.text.lower():
-                return False
-                
-        elif condition_key == "user_username":
-            # Проверяем имя пользователя
-            if "telegram_user" not in context:
-                return False
-                
-            telegram_user = context["telegram_user"]
-            if condition_value and telegram_user.username != condition_value:
-                return False
-    
-    return True
+    rule_set = await rule_registry.get(db, event_type)
+    return rule_set.match(telegram_user_id, context)
 
 
 async def execute_action(
@@ -132,5 +241,20 @@ async def execute_action(
             "message_id": message.id
         }
     
+    elif action_type == "run_webhook":
+        # Вызов внешнего сервиса; payload и headers - шаблоны с переменными контекста
+        url = action_data.get("url")
+        if not url:
+            return None
+        
+        variables = build_template_variables(context, action)
+        return {
+            "type": "run_webhook",
+            "method": action_data.get("method", "POST").upper(),
+            "url": render_template(url, variables),
+            "headers": render_template(action_data.get("headers") or {}, variables),
+            "payload": render_template(action_data.get("payload", variables), variables),
+        }
+    
     return None
  
\ No newline at end of file
@@ -0,0 +1,308 @@
+"""
+Прием сообщений клиентов: из Telegram (обработчики бота) и из внешних систем
+через webhook API. Пользователь, чат, сообщение, счетчик непрочитанных и
+уведомление менеджера сохраняются одной транзакцией
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.notifications import notification_scheduler
+from app.core.pubsub import publish_new_message
+from app.crud.chat import chat as crud_chat
+from app.crud.message import message as crud_message
+from app.crud.user import telegram_user as crud_telegram_user
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.user import TelegramUser, User
+from app.utils.files import remove_files, save_file_from_base64
+
+logger = logging.getLogger(__name__)
+
+# Поля профиля, которые клиент может передать вместе с сообщением
+PROFILE_FIELDS = ("last_name", "additional_info", "deal_link", "apartments")
+
+
+@dataclass
+class IngestedMessage:
+    """
+    Результат приема сообщения клиента
+    """
+    telegram_user: TelegramUser
+    chat: Chat
+    message: Message
+
+
+async def get_default_manager_id(db: AsyncSession) -> Optional[int]:
+    """
+    Менеджер для новых чатов из внешних систем: первый активный
+    """
+    result = await db.execute(select(User.id).where(User.is_active == True).limit(1))
+    return result.scalar_one_or_none()
+
+
+async def _resolve_user(
+    db: AsyncSession,
+    profile: Dict[str, Any],
+    update_fields: Optional[Iterable[str]],
+    telegram_user_id: Optional[int],
+) -> TelegramUser:
+    """
+    Пользователь Telegram для приема сообщения: upsert в текущей транзакции
+    или, если профиль уже сохранен (telegram_user_id известен), объект из
+    профиля без обращения к БД
+    """
+    if telegram_user_id is not None:
+        # Объект не добавляется в сессию: нужен только для чтения полей профиля
+        return TelegramUser(id=telegram_user_id, **profile)
+    return await crud_telegram_user.upsert(
+        db, values=profile, update_fields=update_fields, commit=False
+    )
+
+
+async def ensure_chat(
+    db: AsyncSession,
+    *,
+    profile: Dict[str, Any],
+    update_fields: Optional[Iterable[str]] = None,
+    manager_id: Optional[int] = None,
+    telegram_user_id: Optional[int] = None,
+    commit: bool = True,
+) -> Tuple[TelegramUser, Chat]:
+    """
+    Создать или обновить пользователя Telegram и получить или создать его чат:
+    два запроса INSERT ... ON CONFLICT в одной транзакции
+    
+    Args:
+        profile: данные пользователя Telegram (для нового - все поля)
+        update_fields: поля профиля, перезаписываемые у существующего
+            пользователя; None - все переданные
+        manager_id: менеджер нового чата
+        telegram_user_id: ID пользователя, профиль которого уже сохранен
+            (DatabaseMiddleware) - upsert пользователя пропускается
+        commit: зафиксировать транзакцию
+    """
+    telegram_user = await _resolve_user(db, profile, update_fields, telegram_user_id)
+    chat = await crud_chat.upsert_for_user(
+        db, telegram_user_id=telegram_user.id, manager_id=manager_id, commit=commit
+    )
+    return telegram_user, chat
+
+
+async def ingest_client_message(
+    db: AsyncSession,
+    *,
+    profile: Dict[str, Any],
+    message_in: Dict[str, Any],
+    update_fields: Optional[Iterable[str]] = None,
+    manager_id: Optional[int] = None,
+    telegram_user_id: Optional[int] = None,
+) -> IngestedMessage:
+    """
+    Принять сообщение клиента одной транзакцией: upsert пользователя (если
+    профиль еще не сохранен), upsert чата с увеличением счетчика непрочитанных
+    (RETURNING), вставка сообщения и планирование уведомления менеджера.
+    После коммита публикует событие new_message для веб-интерфейса
+    
+    Args:
+        profile: данные пользователя Telegram (для нового - все поля)
+        message_in: данные сообщения без chat_id и telegram_user_id
+        update_fields: поля профиля, перезаписываемые у существующего
+            пользователя; None - все переданные
+        manager_id: менеджер нового чата
+        telegram_user_id: ID пользователя, профиль которого уже сохранен
+            (DatabaseMiddleware) - upsert пользователя пропускается
+    """
+    telegram_user = await _resolve_user(db, profile, update_fields, telegram_user_id)
+    chat = await crud_chat.upsert_for_user(
+        db,
+        telegram_user_id=telegram_user.id,
+        manager_id=manager_id,
+        unread_increment=1,
+        commit=False,
+    )
+    message = await crud_message.create_message(
+        db,
+        obj_in={
+            **message_in,
+            "chat_id": chat.id,
+            "telegram_user_id": telegram_user.id,
+            "is_from_manager": False,  # Сообщение от клиента
+        },
+        touch_chat=False,  # Время сообщения уже обновлено upsert чата
+        commit=False,
+    )
+    
+    # Уведомление менеджеру, если сообщение не будет прочитано вовремя
+    await notification_scheduler.schedule(
+        db,
+        chat_id=chat.id,
+        telegram_id=telegram_user.telegram_id,
+        message_id=message.id,
+        commit=False,
+    )
+    await db.commit()
+    
+    # Уведомляем веб-интерфейс менеджера о новом сообщении
+    await publish_new_message(chat=chat, message=message)
+    
+    return IngestedMessage(telegram_user=telegram_user, chat=chat, message=message)
+
+
+def merge_profile(telegram_id: int, current: Optional[Dict[str, Any]], item: Any) -> Dict[str, Any]:
+    """
+    Данные профиля клиента после сообщения: переданные поля заменяют
+    сохраненные, непереданные остаются прежними, новым клиентам
+    назначаются временные имена
+    """
+    current = current or {}
+    profile = {
+        "telegram_id": telegram_id,
+        "username": item.username or current.get("username") or f"user_{telegram_id}",
+        "first_name": item.first_name or current.get("first_name") or f"User {telegram_id}",
+        "language_code": current.get("language_code") or "ru",
+    }
+    for field in PROFILE_FIELDS:
+        value = getattr(item, field)
+        profile[field] = value if value is not None else current.get(field)
+    return profile
+
+
+async def ingest_client_messages(db: AsyncSession, items: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Принять пакет сообщений клиентов одной транзакцией.
+    
+    Профили клиентов обновляются через INSERT ... ON CONFLICT, чаты находятся
+    или создаются пачкой, сообщения вставляются одним INSERT, счетчики
+    непрочитанных увеличиваются через UPDATE, уведомления менеджеров
+    планируются по одному на чат. Многострочные запросы разбиваются на части
+    по INSERT_CHUNK_SIZE строк, чтобы не превысить лимит параметров PostgreSQL.
+    
+    Пакет сохраняется целиком или не сохраняется: при ошибке транзакция
+    откатывается, а уже записанные файлы пакета удаляются.
+    
+    Args:
+        items: сообщения (ClientMessageItem) в порядке поступления
+    
+    Returns:
+        результат по каждому сообщению в порядке items
+    
+    Raises:
+        LookupError: в системе нет активных менеджеров
+    """
+    # Импорт здесь: пакет app.api импортирует эндпоинты, которые используют этот модуль
+    from app.api.endpoints.workBitrix import invalidate_deal_cache
+    
+    # Файлы записываются до начала транзакции
+    file_paths = await asyncio.gather(*(
+        save_file_from_base64(item.file) if item.file else _no_file()
+        for item in items
+    ))
+    
+    try:
+        telegram_ids = list(dict.fromkeys(item.telegram_id for item in items))
+        result = await db.execute(
+            select(TelegramUser).where(TelegramUser.telegram_id.in_(telegram_ids))
+        )
+        existing = {
+            user.telegram_id: {
+                "username": user.username,
+                "first_name": user.first_name,
+                "language_code": user.language_code,
+                **{field: getattr(user, field) for field in PROFILE_FIELDS},
+            }
+            for user in result.scalars().all()
+        }
+        
+        # Профили применяются по порядку сообщений, побеждают последние данные
+        profiles: Dict[int, Dict[str, Any]] = {}
+        for item in items:
+            current = profiles.get(item.telegram_id) or existing.get(item.telegram_id)
+            profiles[item.telegram_id] = merge_profile(item.telegram_id, current, item)
+        
+        # Сделка клиента могла смениться - сбрасываем закешированную сделку из Bitrix
+        await invalidate_deal_cache(*(
+            telegram_id
+            for telegram_id, before in existing.items()
+            if before["deal_link"] != profiles[telegram_id]["deal_link"]
+            or before["apartments"] != profiles[telegram_id]["apartments"]
+        ))
+        
+        # Берем первого доступного менеджера, как и для одиночных сообщений
+        manager_id = await get_default_manager_id(db)
+        if manager_id is None:
+            raise LookupError("Нет доступных менеджеров в системе")
+        
+        user_ids = await crud_telegram_user.upsert_many(
+            db, profiles=list(profiles.values()), commit=False
+        )
+        chats = await crud_chat.get_or_create_many(
+            db, telegram_user_ids=list(user_ids.values()), manager_id=manager_id, commit=False
+        )
+        
+        objs_in = []
+        for item, file_path in zip(items, file_paths):
+            user_id = user_ids[item.telegram_id]
+            objs_in.append({
+                "chat_id": chats[user_id].id,
+                "text": item.text,
+                "is_from_manager": False,  # Сообщение от клиента
+                "telegram_user_id": user_id,
+                "message_type": "document" if file_path else "text",
+                "file_path": file_path,
+            })
+        # Время последнего сообщения чатов обновляется вместе со счетчиками
+        messages = await crud_message.create_messages(db, objs_in=objs_in, touch_chat=False, commit=False)
+        
+        await crud_chat.increment_unread_counts(
+            db, counts=Counter(message.chat_id for message in messages), commit=False
+        )
+        
+        # Одно уведомление на чат - по первому сообщению пакета
+        first_by_chat: Dict[int, Any] = {}
+        last_by_chat: Dict[int, Any] = {}
+        for item, message in zip(items, messages):
+            first_by_chat.setdefault(message.chat_id, (item.telegram_id, message))
+            last_by_chat[message.chat_id] = message
+        await notification_scheduler.schedule_many(
+            db,
+            items=[
+                {"chat_id": chat_id, "telegram_id": telegram_id, "message_id": message.id}
+                for chat_id, (telegram_id, message) in first_by_chat.items()
+            ],
+            commit=False,
+        )
+        
+        await db.commit()
+    except Exception:
+        # Пакет не сохранен - файлы его сообщений больше не нужны
+        await db.rollback()
+        remove_files(file_paths)
+        raise
+    
+    logger.info(f"Принят пакет из {len(messages)} сообщений клиентов в {len(last_by_chat)} чатах")
+    
+    # Веб-интерфейсу достаточно одного события на чат
+    chats_by_id = {chat.id: chat for chat in chats.values()}
+    for chat_id, message in last_by_chat.items():
+        await publish_new_message(chat=chats_by_id[chat_id], message=message)
+    
+    return [
+        {
+            "telegram_id": item.telegram_id,
+            "chat_id": message.chat_id,
+            "message_id": message.id,
+            "file_path": file_path,
+        }
+        for item, message, file_path in zip(items, messages, file_paths)
+    ]
+
+
+async def _no_file() -> None:
+    return None
@@ -0,0 +1,265 @@
+"""
+Планировщик отложенных уведомлений менеджеров в Bitrix о непрочитанных
+сообщениях клиентов
+"""
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.crud.notification import notification as crud_notification
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def utcnow() -> datetime:
+    """
+    Текущее время UTC без часового пояса (формат колонки due_at)
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class NotificationScheduler:
+    """
+    Очередь отложенных уведомлений, хранящаяся в таблице pendingnotification.
+    
+    Один фоновый обработчик спит до ближайшего срока (или до пробуждения при
+    появлении более раннего уведомления), берет наступившие уведомления в
+    аренду, одним запросом проверяет, остались ли в их чатах непрочитанные
+    сообщения, и передает уведомления только по таким чатам диспетчеру
+    Bitrix. Запись удаляется диспетчером после отправки пачки; если
+    уведомление не удалось подготовить, отправка переносится с
+    экспоненциальной задержкой. Записи переживают перезапуск и не
+    дублируются между процессами.
+    
+    Args:
+        delay_seconds: задержка перед уведомлением
+        poll_interval: максимальное время сна обработчика (подхватывает
+            уведомления, запланированные другими процессами)
+        batch_size: максимальное количество уведомлений за один проход
+        lease_seconds: время аренды записи на время отправки (включая
+            ожидание в буфере диспетчера Bitrix)
+        max_attempts: попыток отправки до отказа от уведомления
+        base_backoff: начальная задержка повтора в секундах
+        max_backoff: максимальная задержка повтора в секундах
+    """
+    def __init__(
+        self,
+        delay_seconds: float,
+        poll_interval: float,
+        batch_size: int = 500,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 5,
+        base_backoff: float = 5.0,
+        max_backoff: float = 300.0,
+    ):
+        self.delay_seconds = delay_seconds
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._wakeup = asyncio.Event()
+        self._next_due: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    async def schedule(
+        self,
+        db: AsyncSession,
+        *,
+        chat_id: int,
+        telegram_id: int,
+        message_id: int,
+        commit: bool = True,
+    ) -> bool:
+        """
+        Запланировать уведомление по чату через delay_seconds.
+        Повторные сообщения чата до отправки уведомления новых записей не создают
+        """
+        due_at = utcnow() + timedelta(seconds=self.delay_seconds)
+        created = await crud_notification.schedule(
+            db,
+            chat_id=chat_id,
+            telegram_id=telegram_id,
+            message_id=message_id,
+            due_at=due_at,
+            commit=commit,
+        )
+        if created:
+            logger.info(f"Запланировано уведомление по чату {chat_id} (message_id: {message_id}) на {due_at}")
+            self.wake(due_at)
+        return created
+    
+    async def schedule_many(
+        self, db: AsyncSession, *, items: List[Dict[str, int]], commit: bool = True
+    ) -> int:
+        """
+        Запланировать уведомления по нескольким чатам (одно на чат) через delay_seconds
+        
+        Args:
+            items: словари с ключами chat_id, telegram_id, message_id
+        """
+        due_at = utcnow() + timedelta(seconds=self.delay_seconds)
+        created = await crud_notification.schedule_many(
+            db, items=items, due_at=due_at, commit=commit
+        )
+        if created:
+            logger.info(f"Запланировано уведомлений: {created} на {due_at}")
+            self.wake(due_at)
+        return created
+    
+    async def cancel(self, db: AsyncSession, *, chat_id: int) -> bool:
+        """
+        Отменить ожидающее уведомление по прочитанному чату
+        """
+        cancelled = await crud_notification.cancel_for_chat(db, chat_id=chat_id)
+        if cancelled:
+            logger.info(f"Уведомление по чату {chat_id} отменено: чат прочитан")
+        return cancelled
+    
+    def wake(self, due_at: Optional[datetime] = None) -> None:
+        """
+        Разбудить обработчик, если новый срок раньше того, до которого он спит
+        """
+        if due_at is None or self._next_due is None or due_at < self._next_due:
+            self._wakeup.set()
+    
+    def start(self) -> None:
+        """
+        Запустить фоновый обработчик
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info("Планировщик уведомлений запущен")
+    
+    async def stop(self) -> None:
+        """
+        Остановить фоновый обработчик. Незавершенные уведомления остаются в БД
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Планировщик уведомлений остановлен")
+    
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                timeout = await self._process_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в планировщике уведомлений: {str(e)}")
+                timeout = self.poll_interval
+            
+            if timeout <= 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _process_due(self) -> float:
+        """
+        Отправить наступившие уведомления
+        
+        Returns:
+            время сна до следующего прохода в секундах
+        """
+        # Импорт здесь: пакет app.api импортирует эндпоинты, которые сами
+        # используют планировщик
+        from app.api.endpoints.workBitrix import send_notification_to_bitrix
+        
+        async with SessionLocal() as db:
+            due = await crud_notification.claim_due(
+                db, now=utcnow(), lease_seconds=self.lease_seconds, limit=self.batch_size
+            )
+            unread_chat_ids = await crud_notification.get_chats_with_unread(
+                db, chat_ids=[row.chat_id for row in due]
+            )
+            # Пачки с уведомлением не ушли в Bitrix за max_attempts попыток
+            exhausted = {row.id for row in due if row.attempts > self.max_attempts}
+            for row in due:
+                if row.id in exhausted:
+                    logger.error(f"Уведомление по чату {row.chat_id} не отправлено за {row.attempts - 1} попыток")
+            # Чаты уже прочитаны - уведомления не нужны
+            await crud_notification.complete(
+                db, ids=[
+                    row.id for row in due
+                    if row.chat_id not in unread_chat_ids or row.id in exhausted
+                ]
+            )
+        
+        to_send = [
+            row for row in due
+            if row.chat_id in unread_chat_ids and row.id not in exhausted
+        ]
+        if due:
+            logger.info(f"Наступило уведомлений: {len(due)}, из них с непрочитанными сообщениями: {len(to_send)}")
+        if to_send:
+            results = await asyncio.gather(
+                *(send_notification_to_bitrix(row.telegram_id, notification_id=row.id) for row in to_send),
+                return_exceptions=True,
+            )
+            await self._save_results(to_send, results)
+        
+        # Забрали полную пачку - вероятно, есть еще наступившие уведомления
+        if len(due) >= self.batch_size:
+            return 0
+        
+        async with SessionLocal() as db:
+            self._next_due = await crud_notification.get_next_due_at(db)
+        
+        if self._next_due is None:
+            return self.poll_interval
+        delay = (self._next_due - utcnow()).total_seconds()
+        return min(max(delay, 0), self.poll_interval)
+    
+    async def _save_results(self, rows: List[Any], results: List[Any]) -> None:
+        """
+        Перенести неотправленные уведомления одной транзакцией. Принятые
+        диспетчером записи остаются в аренде до ответа Bitrix
+        """
+        now = utcnow()
+        dropped = []
+        async with SessionLocal() as db:
+            for row, result in zip(rows, results):
+                if result is True:
+                    continue
+                if row.attempts >= self.max_attempts:
+                    logger.error(f"Уведомление по чату {row.chat_id} не отправлено за {row.attempts} попыток")
+                    dropped.append(row.id)
+                else:
+                    # Полный джиттер, чтобы повторы не приходили пачкой
+                    delay = random.uniform(
+                        0, min(self.max_backoff, self.base_backoff * 2 ** (row.attempts - 1))
+                    )
+                    logger.warning(
+                        f"Уведомление по чату {row.chat_id} не отправлено (попытка {row.attempts}), "
+                        f"повтор через {delay:.1f} сек."
+                    )
+                    await crud_notification.retry_later(
+                        db, ids=[row.id], due_at=now + timedelta(seconds=delay), commit=False
+                    )
+            await crud_notification.complete(db, ids=dropped, commit=False)
+            await db.commit()
+
+
+notification_scheduler = NotificationScheduler(
+    delay_seconds=settings.NOTIFICATION_DELAY_SECONDS,
+    poll_interval=settings.NOTIFICATION_POLL_SECONDS,
+    lease_seconds=settings.NOTIFICATION_LEASE_SECONDS,
+    max_attempts=settings.NOTIFICATION_MAX_ATTEMPTS,
+)
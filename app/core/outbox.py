@@ -0,0 +1,278 @@
+"""
+Доставка сообщений менеджеров в Telegram через таблицу outboxmessage
+"""
+
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Set
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound
+from sqlalchemy.future import select
+
+from app.bot.bot import send_document, send_message
+from app.config import settings
+from app.core.pubsub import hub
+from app.crud.outbox import outbox as crud_outbox
+from app.database import SessionLocal
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, при которых повторная попытка не поможет
+PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, FileNotFoundError)
+
+
+def utcnow() -> datetime:
+    """
+    Текущее время UTC без часового пояса (формат колонок очереди)
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class OutboxWorker:
+    """
+    Фоновый обработчик очереди доставки сообщений менеджеров.
+    
+    Сообщение и запись очереди создаются в одной транзакции, поэтому сообщение,
+    сохраненное в БД, не потеряется при сбое отправки или перезапуске процесса.
+    Обработчик забирает записи пачками (с арендой, чтобы несколько процессов не
+    отправили одно сообщение дважды), отправляет их через общую очередь
+    Telegram и сохраняет результат каждой отправки сразу после ее завершения:
+    sent с telegram_message_id, повтор с экспоненциальной задержкой или failed
+    после max_attempts попыток. Забирается только самая ранняя запись каждого
+    получателя, поэтому сообщения чата доставляются по порядку даже при
+    повторах, а медленный чат не задерживает остальные.
+    
+    Args:
+        batch_size: максимальное количество одновременных отправок
+        poll_interval: максимальное время сна обработчика
+        max_attempts: попыток доставки до статуса failed
+        lease_seconds: время аренды записи на время отправки
+        base_backoff: начальная задержка повтора в секундах
+        max_backoff: максимальная задержка повтора в секундах
+    """
+    def __init__(
+        self,
+        batch_size: int = 50,
+        poll_interval: float = 5.0,
+        max_attempts: int = 5,
+        lease_seconds: float = 300.0,
+        base_backoff: float = 5.0,
+        max_backoff: float = 300.0,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._sent = 0
+        self._failed = 0
+        self._retried = 0
+    
+    def wake(self) -> None:
+        """
+        Разбудить обработчик после постановки сообщения в очередь
+        """
+        self._wakeup.set()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики доставки с момента запуска процесса
+        """
+        return {
+            "sent": self._sent,
+            "failed": self._failed,
+            "retried": self._retried,
+        }
+    
+    def start(self) -> None:
+        """
+        Запустить фоновый обработчик
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info("Обработчик доставки сообщений запущен")
+    
+    async def stop(self) -> None:
+        """
+        Остановить фоновый обработчик. Недоставленные сообщения остаются в БД
+        и будут отправлены после перезапуска
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Записи прерванных отправок остаются в аренде и будут повторены
+        # после ее окончания
+        for task in self._in_flight:
+            task.cancel()
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+        self._in_flight.clear()
+        logger.info("Обработчик доставки сообщений остановлен")
+    
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                timeout = await self._process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике доставки сообщений: {str(e)}")
+                timeout = self.poll_interval
+            
+            if timeout <= 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _process_batch(self) -> float:
+        """
+        Забрать наступившие сообщения и запустить их отправку
+        
+        Returns:
+            время сна до следующего прохода в секундах
+        """
+        free = self.batch_size - len(self._in_flight)
+        if free <= 0:
+            # Обработчик разбудит завершившаяся отправка
+            return self.poll_interval
+        
+        async with SessionLocal() as db:
+            rows = await crud_outbox.claim_batch(
+                db, now=utcnow(), lease_seconds=self.lease_seconds, limit=free
+            )
+            messages: Dict[int, Message] = {}
+            if rows:
+                result = await db.execute(
+                    select(Message).where(Message.id.in_([row.message_id for row in rows]))
+                )
+                messages = {message.id: message for message in result.scalars().all()}
+        
+        for row in rows:
+            task = asyncio.create_task(self._process_row(row, messages.get(row.message_id)))
+            self._in_flight.add(task)
+            task.add_done_callback(self._on_done)
+        
+        # Забрали все, что помещалось, - вероятно, есть еще сообщения
+        if len(rows) >= free:
+            return 0
+        
+        async with SessionLocal() as db:
+            next_attempt_at = await crud_outbox.get_next_attempt_at(db)
+        
+        if next_attempt_at is None:
+            return self.poll_interval
+        delay = (next_attempt_at - utcnow()).total_seconds()
+        return min(max(delay, 0), self.poll_interval)
+    
+    def _on_done(self, task: asyncio.Task) -> None:
+        """
+        Освободить место после отправки и разбудить обработчик: следующее
+        сообщение этого получателя стало доступно
+        """
+        self._in_flight.discard(task)
+        self._wakeup.set()
+    
+    async def _process_row(self, row: Any, message: Optional[Message]) -> None:
+        """
+        Отправить одно сообщение и сразу сохранить результат
+        """
+        try:
+            result: Any = await self._deliver(row, message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result = e
+        try:
+            await self._save_result(row, message, result)
+        except Exception as e:
+            # Запись останется в аренде и будет повторена после ее окончания
+            logger.error(f"Ошибка сохранения результата доставки сообщения {row.message_id}: {str(e)}")
+    
+    async def _deliver(self, row: Any, message: Optional[Message]) -> Optional[int]:
+        """
+        Отправить одно сообщение, возвращает ID сообщения в Telegram
+        """
+        if message is None:
+            return None
+        
+        if message.file_path:
+            if not os.path.exists(message.file_path):
+                raise FileNotFoundError(f"Файл {message.file_path} не найден")
+            sent = await send_document(
+                chat_id=row.telegram_id,
+                document=message.file_path,
+                caption=message.text if message.text else None,
+            )
+        else:
+            sent = await send_message(chat_id=row.telegram_id, text=message.text)
+        return sent.message_id if sent is not None else None
+    
+    async def _save_result(self, row: Any, message: Optional[Message], result: Any) -> None:
+        """
+        Сохранить результат доставки и уведомить менеджера
+        """
+        now = utcnow()
+        async with SessionLocal() as db:
+            if not isinstance(result, BaseException):
+                status = "sent"
+                await crud_outbox.complete(
+                    db, outbox_id=row.id, message_id=row.message_id,
+                    delivery_status=status, telegram_message_id=result, now=now,
+                )
+                self._sent += 1
+            elif isinstance(result, PERMANENT_ERRORS) or row.attempts >= self.max_attempts:
+                status = "failed"
+                logger.error(
+                    f"Сообщение {row.message_id} не доставлено в Telegram "
+                    f"(попытка {row.attempts}): {str(result)}"
+                )
+                await crud_outbox.complete(
+                    db, outbox_id=row.id, message_id=row.message_id,
+                    delivery_status=status, now=now,
+                )
+                self._failed += 1
+            else:
+                # Полный джиттер, чтобы повторы не приходили пачкой
+                delay = random.uniform(
+                    0, min(self.max_backoff, self.base_backoff * 2 ** (row.attempts - 1))
+                )
+                logger.warning(
+                    f"Ошибка доставки сообщения {row.message_id} (попытка {row.attempts}), "
+                    f"повтор через {delay:.1f} сек.: {str(result)}"
+                )
+                await crud_outbox.retry_later(
+                    db, outbox_id=row.id,
+                    next_attempt_at=now + timedelta(seconds=delay),
+                    error=str(result),
+                )
+                self._retried += 1
+                return
+        
+        if message is not None:
+            await hub.publish(message.manager_id, {
+                "type": "message_status",
+                "chat_id": message.chat_id,
+                "message_id": message.id,
+                "delivery_status": status,
+            })
+
+outbox_worker = OutboxWorker(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+)
@@ -0,0 +1,137 @@
+"""
+Хаб публикации событий для push-обновлений веб-интерфейса. События идут
+через шину (app/core/bus.py), поэтому доходят до подписчиков всех процессов
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.config import settings
+from app.core.bus import MemoryEventBus, event_bus
+
+logger = logging.getLogger(__name__)
+
+# Слушатель получает ID менеджера (или None) и событие
+Listener = Callable[[Optional[int], Dict[str, Any]], None]
+
+# Тема шины для событий веб-интерфейса
+HUB_TOPIC = "hub"
+
+
+class PubSubHub:
+    """
+    Хаб событий: доставляет события в очереди подписчиков конкретного менеджера.
+    Подписчики и слушатели локальны для процесса, публикация идет через шину
+
+    Args:
+        bus: шина событий между процессами
+        queue_size: размер очереди каждого подключения
+    """
+    def __init__(self, bus: MemoryEventBus, queue_size: int = 100):
+        self.bus = bus
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._listeners: List[Listener] = []
+        bus.subscribe(HUB_TOPIC, self._deliver)
+
+    def subscribe(self, manager_id: int) -> asyncio.Queue:
+        """
+        Подписать менеджера на события, возвращает очередь событий
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(manager_id, set()).add(queue)
+        logger.info(f"Менеджер {manager_id} подписан на события ({len(self._subscribers[manager_id])} подключений)")
+        return queue
+
+    def unsubscribe(self, manager_id: int, queue: asyncio.Queue) -> None:
+        """
+        Отписать очередь менеджера от событий
+        """
+        queues = self._subscribers.get(manager_id)
+        if not queues:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[manager_id]
+        logger.info(f"Менеджер {manager_id} отписан от событий")
+
+    def add_listener(self, listener: Listener) -> None:
+        """
+        Добавить синхронного слушателя всех событий (например, для сброса кешей).
+        Слушатель вызывается в каждом процессе
+        """
+        self._listeners.append(listener)
+
+    def subscribers_count(self) -> int:
+        """
+        Количество активных подключений
+        """
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def publish(self, manager_id: Optional[int], event: Dict[str, Any]) -> None:
+        """
+        Опубликовать событие для подписчиков всех процессов
+
+        Args:
+            manager_id: ID менеджера-получателя; None - всем подключенным менеджерам
+            event: событие, обязательно содержит ключ "type"
+        """
+        await self.bus.publish(HUB_TOPIC, {"manager_id": manager_id, "event": event})
+
+    def _deliver(self, data: Dict[str, Any]) -> None:
+        """
+        Доставить событие из шины слушателям и подписчикам текущего процесса
+        """
+        manager_id = data.get("manager_id")
+        event = data.get("event") or {}
+        for listener in self._listeners:
+            try:
+                listener(manager_id, event)
+            except Exception as e:
+                logger.error(f"Ошибка в слушателе событий: {str(e)}")
+
+        if manager_id is None:
+            queues = [queue for manager_queues in self._subscribers.values() for queue in manager_queues]
+        else:
+            queues = list(self._subscribers.get(manager_id, ()))
+
+        for queue in queues:
+            if queue.full():
+                # Медленный клиент: отбрасываем самое старое событие
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+
+hub = PubSubHub(event_bus, queue_size=settings.STREAM_QUEUE_SIZE)
+
+
+async def publish_new_message(chat: Any, message: Any) -> None:
+    """
+    Опубликовать событие о новом сообщении в чате
+
+    Args:
+        chat: чат (ORM объект) с актуальным счетчиком непрочитанных
+        message: созданное сообщение (ORM объект)
+    """
+    await hub.publish(chat.manager_id, {
+        "type": "new_message",
+        "chat_id": chat.id,
+        "message_id": message.id,
+        "is_from_manager": bool(message.is_from_manager),
+        "unread_count": chat.unread_count or 0,
+    })
+
+
+async def publish_chat_read(chat: Any) -> None:
+    """
+    Опубликовать событие о прочтении чата менеджером
+    """
+    await hub.publish(chat.manager_id, {
+        "type": "chat_read",
+        "chat_id": chat.id,
+        "unread_count": 0,
+    })
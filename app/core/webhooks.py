@@ -0,0 +1,190 @@
+"""
+Исходящие HTTP-вызовы для действия run_webhook
+"""
+
+import asyncio
+import logging
+import random
+from string import Template
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Коды ответа, при которых вызов повторяется
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def build_template_variables(context: Dict[str, Any], action: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Переменные шаблона запроса из контекста события
+    """
+    message = context.get("message")
+    telegram_user = context.get("telegram_user")
+    return {
+        "event_id": action.get("event_id"),
+        "chat_id": context.get("chat_id"),
+        "message_id": getattr(message, "id", None),
+        "message_text": getattr(message, "text", None) or "",
+        "message_type": getattr(message, "message_type", None),
+        "telegram_id": getattr(telegram_user, "telegram_id", None),
+        "username": getattr(telegram_user, "username", None),
+        "first_name": getattr(telegram_user, "first_name", None),
+        "last_name": getattr(telegram_user, "last_name", None),
+    }
+
+
+def render_template(value: Any, variables: Dict[str, Any]) -> Any:
+    """
+    Подставить переменные ($chat_id, ${message_text}) в строки шаблона,
+    включая вложенные словари и списки. Строка, целиком состоящая из одной
+    переменной, заменяется значением с сохранением типа
+    """
+    if isinstance(value, str):
+        for name, variable in variables.items():
+            if value in (f"${name}", f"${{{name}}}"):
+                return variable
+        return Template(value).safe_substitute(
+            {name: "" if variable is None else variable for name, variable in variables.items()}
+        )
+    if isinstance(value, dict):
+        return {key: render_template(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [render_template(item, variables) for item in value]
+    return value
+
+
+class WebhookClient:
+    """
+    Общий HTTP-клиент с пулом соединений для вызова внешних сервисов.
+    Ограничивает количество одновременных запросов к одному хосту,
+    повторяет вызов при сетевых ошибках и ответах 429/5xx с экспоненциальной
+    задержкой и случайным разбросом
+
+    Args:
+        timeout: общий таймаут одного запроса (сек.)
+        max_attempts: количество попыток
+        base_backoff: начальная задержка повтора (сек.)
+        max_backoff: максимальная задержка повтора (сек.)
+        per_host_limit: одновременных запросов к одному хосту
+        pool_size: максимальное количество соединений в пуле
+    """
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        max_attempts: int = 3,
+        base_backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        per_host_limit: int = 4,
+        pool_size: int = 100,
+    ):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.per_host_limit = per_host_limit
+        self.pool_size = pool_size
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        # Счетчики
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+            )
+        return self._session
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1)))
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Выполнить запрос с повторами
+
+        Returns:
+            {"status": код ответа, "body": текст ответа}
+
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: если все попытки неудачны
+        """
+        semaphore = self._host_semaphore(url)
+        for attempt in range(1, self.max_attempts + 1):
+            retry_after = None
+            try:
+                async with semaphore:
+                    async with self._get_session().request(method, url, json=json, headers=headers) as response:
+                        body = await response.text()
+                        if response.status not in RETRY_STATUSES or attempt == self.max_attempts:
+                            response.raise_for_status()
+                            self.succeeded += 1
+                            return {"status": response.status, "body": body}
+                        retry_after = response.headers.get("Retry-After")
+                        error = f"HTTP {response.status}"
+            except aiohttp.ClientResponseError:
+                self.failed += 1
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_attempts:
+                    self.failed += 1
+                    raise
+                error = f"{type(e).__name__}: {str(e)}"
+
+            delay = self._backoff(attempt, retry_after)
+            self.retried += 1
+            logger.warning(f"Ошибка вызова {method} {url} (попытка {attempt}): {error}; повтор через {delay:.1f} сек.")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики вызовов
+        """
+        return {
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    async def close(self) -> None:
+        """
+        Закрыть пул соединений
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+webhook_client = WebhookClient(
+    timeout=settings.WEBHOOK_ACTION_TIMEOUT,
+    max_attempts=settings.WEBHOOK_ACTION_ATTEMPTS,
+    per_host_limit=settings.WEBHOOK_ACTION_PER_HOST,
+    pool_size=settings.WEBHOOK_ACTION_POOL_SIZE,
+)
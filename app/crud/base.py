@@ -1,9 +1,10 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, Iterator, List, Optional, Sequence, Type, TypeVar, Union
 
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import update, delete
+from sqlalchemy.dialects import postgresql, sqlite
 
 from app.database import Base
 
@@ -11,6 +12,28 @@ ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# Строк в одном многострочном INSERT ... VALUES: PostgreSQL (asyncpg) допускает
+# не более 32767 параметров в запросе
+INSERT_CHUNK_SIZE = 1000
+
+
+def chunked(items: Sequence[Any], size: int = INSERT_CHUNK_SIZE) -> Iterator[Sequence[Any]]:
+    """
+    Разбить список на части не больше size элементов
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def dialect_insert(db: AsyncSession, model: Type[Base]):
+    """
+    Конструкция INSERT для диалекта текущей БД с поддержкой
+    ON CONFLICT (on_conflict_do_nothing / on_conflict_do_update)
+    """
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
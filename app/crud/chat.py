@@ -1,20 +1,129 @@
-from typing import List, Optional, Dict, Any
-from datetime import datetime, date, timedelta
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, date, timedelta, timezone
 import logging
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc, asc, or_, and_, func, distinct
-from sqlalchemy.orm import joinedload
+from sqlalchemy import desc, asc, or_, and_, func, distinct, case, update, tuple_
+from sqlalchemy.orm import joinedload, aliased
+from sqlalchemy.sql import Select
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 
+from app.config import settings
+from app.core.bus import event_bus
+from app.core.pubsub import hub
 from app.models.chat import Chat
 from app.models.message import Message
 from app.models.user import TelegramUser
 from app.schemas.chat import ChatCreate, ChatUpdate
-from .base import CRUDBase
+from app.utils.cache import TTLCache
+from .base import CRUDBase, chunked, dialect_insert
 
 logger = logging.getLogger(__name__)
 
+# Кеш статистики дашборда по ID менеджера
+statistics_cache = TTLCache(ttl=settings.STATS_CACHE_TTL)
+event_bus.register_cache("statistics", statistics_cache)
+
+# Точный текст сообщения о запросе инструкции по заселению
+INSTRUCTION_REQUEST_TEXT = "🤖 Пользователь запросил 🗒 Инструкция по заселению"
+
+
+def _invalidate_statistics(manager_id: Optional[int], event: Dict[str, Any]) -> None:
+    """
+    Сбросить кеш статистики менеджера при появлении нового сообщения
+    """
+    if event.get("type") == "new_message" and manager_id is not None:
+        statistics_cache.invalidate(manager_id)
+
+
+hub.add_listener(_invalidate_statistics)
+
+
+def _period_counts(column) -> list:
+    """
+    Колонки условной агрегации: количество строк за сегодня, неделю,
+    месяц и за все время в одном запросе
+    """
+    today = date.today()
+    today_start = datetime.combine(today, datetime.min.time())
+    today_end = datetime.combine(today, datetime.max.time())
+    week_start = datetime.combine(today - timedelta(days=7), datetime.min.time())
+    month_start = datetime.combine(today - timedelta(days=30), datetime.min.time())
+    
+    periods = {
+        "today": and_(column >= today_start, column <= today_end),
+        "week": column >= week_start,
+        "month": column >= month_start,
+    }
+    columns = [
+        func.coalesce(func.sum(case((condition, 1), else_=0)), 0).label(name)
+        for name, condition in periods.items()
+    ]
+    columns.append(func.count().label("all_time"))
+    return columns
+
+
+def _statistics_from_row(row) -> Dict[str, int]:
+    """
+    Преобразовать строку условной агрегации в словарь статистики
+    """
+    return {
+        "today": int(row.today or 0),
+        "week": int(row.week or 0),
+        "month": int(row.month or 0),
+        "all_time": int(row.all_time or 0)
+    }
+
+
+def _sync_unread_count(db: AsyncSession, chat_id: int, unread_count: int) -> None:
+    """
+    Записать значение счетчика, полученное через RETURNING, в уже загруженный
+    в сессию объект чата, чтобы не перечитывать строку отдельным запросом
+    """
+    chat_obj = db.identity_map.get(identity_key(Chat, chat_id))
+    if chat_obj is not None:
+        set_committed_value(chat_obj, "unread_count", unread_count)
+
+
+def _as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Время UTC без часового пояса (SQLite и PostgreSQL возвращают по-разному)
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# Последнее сообщение чата, присоединяемое к выборке чатов
+LastMessage = aliased(Message, name="last_message")
+
+
+def _last_message_id_subquery():
+    """
+    Коррелированный подзапрос ID последнего сообщения чата.
+    Используется в условии LEFT JOIN, чтобы последнее сообщение
+    загружалось тем же запросом, что и сами чаты. ID сообщений растут
+    в порядке вставки, поэтому подзапрос читает одну запись индекса
+    (chat_id, id).
+    """
+    return (
+        select(Message.id)
+        .where(Message.chat_id == Chat.id)
+        .order_by(desc(Message.id))
+        .limit(1)
+        .correlate(Chat)
+        .scalar_subquery()
+    )
+
+
+def _chat_sort_column(sort_by: str):
+    """
+    Колонка сортировки списка чатов: updated_at или last_message_date
+    """
+    return Chat.last_message_at if sort_by == "last_message_date" else Chat.updated_at
+
 
 class CRUDChat(CRUDBase[Chat, ChatCreate, ChatUpdate]):
     async def get_by_telegram_user_id(
@@ -43,29 +152,29 @@ class CRUDChat(CRUDBase[Chat, ChatCreate, ChatUpdate]):
         # Фильтруем пустые строки и возвращаем отсортированный список
         return sorted([apt for apt in apartments if apt and apt.strip()])
 
-    async def get_chats_by_manager(
+    def build_chats_query(
         self, 
-        db: AsyncSession, 
         *, 
         manager_id: int, 
-        skip: int = 0, 
-        limit: int = 100,
+        cursor: Optional[Tuple[datetime, int]] = None, 
+        limit: int = 50,
         date_filter: Optional[str] = None,
         custom_date: Optional[date] = None,
         apartments_filter: Optional[str] = None,
         sort_by: str = "updated_at",
         sort_order: str = "desc"
-    ) -> List[Chat]:
+    ) -> Select:
         """
-        Получить чаты по ID менеджера с предварительной загрузкой связанных объектов
-        Поддерживает фильтрацию по дате, аппартаментам и сортировку
+        Запрос страницы чатов менеджера (см. get_chats_by_manager); выбирает
+        limit + 1 строку, лишняя показывает наличие следующей страницы
         """
         logger.info(f"Фильтры - date_filter: {date_filter}, custom_date: {custom_date}, apartments_filter: {apartments_filter}, sort_by: {sort_by}, sort_order: {sort_order}")
         
-        # Базовый запрос
+        # Базовый запрос: чаты вместе с последним сообщением
         query = (
-            select(Chat)
+            select(Chat, LastMessage)
             .options(joinedload(Chat.telegram_user))
+            .outerjoin(LastMessage, LastMessage.id == _last_message_id_subquery())
             .where(Chat.manager_id == manager_id)
         )
         
@@ -106,49 +215,77 @@ class CRUDChat(CRUDBase[Chat, ChatCreate, ChatUpdate]):
             query = query.join(TelegramUser, Chat.telegram_user_id == TelegramUser.id)
             query = query.where(TelegramUser.apartments == apartments_filter)
         
-        # Если сортировка по дате последнего сообщения - применяем SQL сортировку
-        if sort_by == "last_message_date":
-            logger.info("Сортировка по дате последнего сообщения через SQL")
-            
-            # Подзапрос для получения даты последнего сообщения
-            last_message_subquery = (
-                select(
-                    Message.chat_id,
-                    func.max(Message.created_at).label('last_message_date')
-                )
-                .group_by(Message.chat_id)
-                .subquery()
-            )
-            
-            # Присоединяем подзапрос к основному запросу
-            query = query.outerjoin(
-                last_message_subquery,
-                Chat.id == last_message_subquery.c.chat_id
-            )
-            
-            # Применяем сортировку
-            if sort_order == "asc":
-                query = query.order_by(asc(last_message_subquery.c.last_message_date))
-            else:
-                query = query.order_by(desc(last_message_subquery.c.last_message_date))
+        # Ключ сортировки - колонка чата: дата последнего сообщения хранится
+        # в самом чате, поэтому обе сортировки идут по индексу
+        sort_column = _chat_sort_column(sort_by)
+        
+        if sort_order == "asc":
+            if cursor is not None:
+                query = query.where(tuple_(sort_column, Chat.id) > tuple_(*cursor))
+            query = query.order_by(asc(sort_column), asc(Chat.id))
         else:
-            logger.info("Сортировка по дате обновления чата")
-            if sort_order == "asc":
-                query = query.order_by(asc(Chat.updated_at))
-            else:
-                query = query.order_by(desc(Chat.updated_at))
+            if cursor is not None:
+                query = query.where(tuple_(sort_column, Chat.id) < tuple_(*cursor))
+            query = query.order_by(desc(sort_column), desc(Chat.id))
+        
+        # Лишняя строка показывает, есть ли следующая страница
+        query = query.limit(limit + 1)
+        return query
+        
+    async def get_chats_by_manager(
+        self, 
+        db: AsyncSession, 
+        *, 
+        manager_id: int, 
+        cursor: Optional[Tuple[datetime, int]] = None, 
+        limit: int = 50,
+        date_filter: Optional[str] = None,
+        custom_date: Optional[date] = None,
+        apartments_filter: Optional[str] = None,
+        sort_by: str = "updated_at",
+        sort_order: str = "desc"
+    ) -> Tuple[List[Tuple[Chat, Optional[Message]]], Optional[Tuple[datetime, int]]]:
+        """
+        Получить страницу чатов менеджера с предварительной загрузкой связанных объектов
+        Поддерживает фильтрацию по дате, аппартаментам и сортировку
+        
+        Страницы выбираются по курсору (ключ сортировки, id): запрос читает
+        индекс (manager_id, ключ, id) с позиции курсора и останавливается
+        после limit строк, поэтому стоимость страницы не зависит от ее номера
         
-        # Применяем пагинацию в конце
-        query = query.offset(skip).limit(limit)
+        Args:
+            cursor: (ключ сортировки, id) последнего чата предыдущей страницы;
+                None - первая страница
+            limit: размер страницы
+            sort_by: updated_at или last_message_date
         
-        logger.info(f"Выполняем SQL запрос")
+        Returns:
+            Список пар (чат, последнее сообщение чата или None), загруженных
+            одним запросом, и курсор следующей страницы (None - страница последняя)
+        """
+        query = self.build_chats_query(
+            manager_id=manager_id,
+            cursor=cursor,
+            limit=limit,
+            date_filter=date_filter,
+            custom_date=custom_date,
+            apartments_filter=apartments_filter,
+            sort_by=sort_by,
+            sort_order=sort_order,
+        )
         
         result = await db.execute(query)
-        chats = result.unique().scalars().all()
+        rows = [(row[0], row[1]) for row in result.unique().all()]
         
-        logger.info(f"Получено чатов: {len(chats)}")
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_chat = rows[-1][0]
+            next_cursor = (_as_naive_utc(getattr(last_chat, _chat_sort_column(sort_by).key)), last_chat.id)
         
-        return chats
+        logger.info(f"Получено чатов: {len(rows)}")
+        
+        return rows, next_cursor
         
     async def get_chat_with_relations(
         self, db: AsyncSession, *, chat_id: int
@@ -169,222 +306,293 @@ class CRUDChat(CRUDBase[Chat, ChatCreate, ChatUpdate]):
         """
         Получить или создать чат
         """
-        chat = await self.get_by_telegram_user_id(db, telegram_user_id=telegram_user_id)
-        
-        if not chat:
-            chat_data = {
-                "telegram_user_id": telegram_user_id,
-                "manager_id": manager_id,
-                "is_active": True,
-                "unread_count": 0
-            }
-            chat = Chat(**chat_data)
-            db.add(chat)
-            await db.commit()
-            await db.refresh(chat)
-            
-        return chat
+        return await self.upsert_for_user(
+            db, telegram_user_id=telegram_user_id, manager_id=manager_id
+        )
         
-    async def increment_unread_count(
-        self, db: AsyncSession, *, chat_id: int
+    async def upsert_for_user(
+        self,
+        db: AsyncSession,
+        *,
+        telegram_user_id: int,
+        manager_id: Optional[int] = None,
+        unread_increment: int = 0,
+        commit: bool = True,
     ) -> Chat:
         """
-        Увеличить счетчик непрочитанных сообщений
+        Получить или создать чат пользователя Telegram и увеличить счетчик
+        непрочитанных одним INSERT ... ON CONFLICT (telegram_user_id) DO UPDATE
+        ... RETURNING. Уникальность чата на пользователя гарантирует БД, поэтому
+        одновременные сообщения не создают дубликаты
+        
+        Args:
+            telegram_user_id: ID пользователя Telegram (в нашей БД)
+            manager_id: менеджер нового чата (у существующего не меняется)
+            unread_increment: на сколько увеличить счетчик непрочитанных
+            commit: зафиксировать транзакцию
         """
-        chat = await self.get(db, id=chat_id)
-        if chat:
-            chat.unread_count += 1
-            db.add(chat)
+        now = datetime.now(timezone.utc)
+        stmt = dialect_insert(db, Chat).values(
+            telegram_user_id=telegram_user_id,
+            manager_id=manager_id,
+            is_active=True,
+            unread_count=unread_increment,
+            created_at=now,
+            updated_at=now,
+            last_message_at=now,
+        )
+        set_ = {"unread_count": func.coalesce(Chat.unread_count, 0) + unread_increment}
+        if unread_increment:
+            set_["updated_at"] = now
+            set_["last_message_at"] = now
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Chat.telegram_user_id], set_=set_
+        ).returning(Chat)
+        
+        result = await db.scalars(stmt, execution_options={"populate_existing": True})
+        chat = result.one()
+        if commit:
             await db.commit()
-            await db.refresh(chat)
+        
+        # Строка вставлена, а не обновлена: новый диалог меняет статистику менеджера
+        if _as_naive_utc(chat.created_at) == now.replace(tzinfo=None):
+            await event_bus.invalidate_cache("statistics", [chat.manager_id])
         return chat
         
-    async def reset_unread_count(
-        self, db: AsyncSession, *, chat_id: int
-    ) -> Chat:
+    async def get_or_create_many(
+        self,
+        db: AsyncSession,
+        *,
+        telegram_user_ids: List[int],
+        manager_id: Optional[int] = None,
+        commit: bool = True,
+    ) -> Dict[int, Chat]:
         """
-        Сбросить счетчик непрочитанных сообщений
+        Получить или создать чаты для списка пользователей Telegram:
+        один запрос на поиск и INSERT ... ON CONFLICT DO NOTHING ... RETURNING
+        на недостающие чаты (по INSERT_CHUNK_SIZE строк)
+        
+        Returns:
+            словарь ID пользователя Telegram -> чат
         """
-        chat = await self.get(db, id=chat_id)
-        if chat:
-            chat.unread_count = 0
-            db.add(chat)
-            await db.commit()
-            await db.refresh(chat)
-        return chat
+        if not telegram_user_ids:
+            return {}
         
-    async def search_chats(
-        self, db: AsyncSession, *, query: str, skip: int = 0, limit: int = 100
-    ) -> List[Chat]:
+        query = select(Chat).where(Chat.telegram_user_id.in_(telegram_user_ids))
+        result = await db.execute(query)
+        chats: Dict[int, Chat] = {chat.telegram_user_id: chat for chat in result.scalars().all()}
+        
+        missing = [user_id for user_id in dict.fromkeys(telegram_user_ids) if user_id not in chats]
+        if missing:
+            for part in chunked(missing):
+                created = await db.scalars(
+                    dialect_insert(db, Chat)
+                    .values([
+                        {
+                            "telegram_user_id": user_id,
+                            "manager_id": manager_id,
+                            "is_active": True,
+                            "unread_count": 0,
+                        }
+                        for user_id in part
+                    ])
+                    .on_conflict_do_nothing(index_elements=[Chat.telegram_user_id])
+                    .returning(Chat)
+                )
+                for chat in created.all():
+                    chats[chat.telegram_user_id] = chat
+            
+            # Чаты, созданные параллельным запросом
+            raced = [user_id for user_id in missing if user_id not in chats]
+            if raced:
+                result = await db.execute(query.where(Chat.telegram_user_id.in_(raced)))
+                for chat in result.scalars().all():
+                    chats[chat.telegram_user_id] = chat
+            
+            if commit:
+                await db.commit()
+            
+            # Новые диалоги меняют статистику менеджера
+            await event_bus.invalidate_cache("statistics", [manager_id])
+        
+        return chats
+        
+    async def increment_unread_count(
+        self, db: AsyncSession, *, chat_id: int, commit: bool = True
+    ) -> Optional[int]:
         """
-        Поиск чатов
+        Увеличить счетчик непрочитанных сообщений одним атомарным UPDATE
+        и обновить время последнего сообщения чата
+        
+        Args:
+            chat_id: ID чата
+            commit: зафиксировать транзакцию; False - когда счетчик обновляется
+                в одной транзакции с другими изменениями
+        
+        Returns:
+            Новое значение счетчика или None, если чат не найден
         """
         result = await db.execute(
-            select(Chat)
-            .options(joinedload(Chat.telegram_user))
-            .join(Chat.telegram_user)
-            .where(
-                or_(
-                    Chat.title.ilike(f"%{query}%"),
-                )
+            update(Chat)
+            .where(Chat.id == chat_id)
+            .values(
+                unread_count=func.coalesce(Chat.unread_count, 0) + 1,
+                last_message_at=datetime.now(timezone.utc),
             )
-            .offset(skip)
-            .limit(limit)
+            .returning(Chat.unread_count)
+            .execution_options(synchronize_session=False)
         )
-        return result.scalars().all()
+        unread_count = result.scalar_one_or_none()
+        if unread_count is not None:
+            _sync_unread_count(db, chat_id, unread_count)
+        if commit:
+            await db.commit()
+        return unread_count
         
-    async def get_messages_statistics(
-        self, db: AsyncSession, *, manager_id: int
-    ) -> Dict[str, int]:
-        """
-        Получить статистику новых сообщений для менеджера
+    async def increment_unread_counts(
+        self, db: AsyncSession, *, counts: Dict[int, int], commit: bool = True
+    ) -> Dict[int, int]:
         """
-        today = date.today()
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        
-        # Получаем чаты менеджера
-        chats_result = await db.execute(
-            select(Chat.id).where(Chat.manager_id == manager_id)
-        )
-        chat_ids = [row[0] for row in chats_result.fetchall()]
+        Увеличить счетчики непрочитанных нескольких чатов запросами UPDATE
+        по INSERT_CHUNK_SIZE чатов и обновить время их последнего сообщения
         
-        if not chat_ids:
-            return {"today": 0, "week": 0, "month": 0, "all_time": 0}
-        
-        # Статистика за сегодня
-        today_start = datetime.combine(today, datetime.min.time())
-        today_end = datetime.combine(today, datetime.max.time())
+        Args:
+            counts: словарь ID чата -> на сколько увеличить
         
-        today_result = await db.execute(
-            select(func.count(Message.id))
-            .where(
-                and_(
-                    Message.chat_id.in_(chat_ids),
-                    Message.is_from_manager == False,  # Сообщения от клиентов
-                    Message.created_at >= today_start,
-                    Message.created_at <= today_end
+        Returns:
+            словарь ID чата -> новое значение счетчика
+        """
+        if not counts:
+            return {}
+        values: Dict[int, int] = {}
+        now = datetime.now(timezone.utc)
+        for part in chunked(list(counts)):
+            result = await db.execute(
+                update(Chat)
+                .where(Chat.id.in_(part))
+                .values(
+                    unread_count=func.coalesce(Chat.unread_count, 0)
+                    + case({chat_id: counts[chat_id] for chat_id in part}, value=Chat.id, else_=0),
+                    last_message_at=now,
                 )
+                .returning(Chat.id, Chat.unread_count)
+                .execution_options(synchronize_session=False)
             )
+            values.update({row.id: row.unread_count for row in result.all()})
+        for chat_id, value in values.items():
+            _sync_unread_count(db, chat_id, value)
+        if commit:
+            await db.commit()
+        return values
+        
+    async def touch_last_message(
+        self, db: AsyncSession, *, chat_ids: List[int], commit: bool = True
+    ) -> None:
+        """
+        Обновить время последнего сообщения чатов одним UPDATE
+        (сообщения менеджера, которые не меняют счетчик непрочитанных)
+        """
+        if not chat_ids:
+            return
+        await db.execute(
+            update(Chat)
+            .where(Chat.id.in_(list(dict.fromkeys(chat_ids))))
+            .values(last_message_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
         )
-        today_count = today_result.scalar() or 0
+        if commit:
+            await db.commit()
         
-        # Статистика за неделю
-        week_start = datetime.combine(week_ago, datetime.min.time())
+    async def reset_unread_count(
+        self, db: AsyncSession, *, chat_id: int, commit: bool = True
+    ) -> bool:
+        """
+        Сбросить счетчик непрочитанных сообщений одним атомарным UPDATE.
+        Если непрочитанных нет, строка чата не изменяется.
         
-        week_result = await db.execute(
-            select(func.count(Message.id))
-            .where(
-                and_(
-                    Message.chat_id.in_(chat_ids),
-                    Message.is_from_manager == False,
-                    Message.created_at >= week_start
-                )
-            )
+        Returns:
+            True если счетчик был ненулевым и сброшен
+        """
+        result = await db.execute(
+            update(Chat)
+            .where(Chat.id == chat_id, Chat.unread_count != 0)
+            .values(unread_count=0)
+            .returning(Chat.id)
+            .execution_options(synchronize_session=False)
         )
-        week_count = week_result.scalar() or 0
+        was_reset = result.scalar_one_or_none() is not None
+        if was_reset:
+            _sync_unread_count(db, chat_id, 0)
+        if commit and was_reset:
+            await db.commit()
+        return was_reset
         
-        # Статистика за месяц
-        month_start = datetime.combine(month_ago, datetime.min.time())
+    async def search_chats(
+        self,
+        db: AsyncSession,
+        *,
+        query: str,
+        manager_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[Tuple[Chat, Optional[Message]]]:
+        """
+        Поиск чатов
         
-        month_result = await db.execute(
-            select(func.count(Message.id))
+        Returns:
+            Список пар (чат, последнее сообщение чата или None),
+            загруженных одним запросом
+        """
+        statement = (
+            select(Chat, LastMessage)
+            .options(joinedload(Chat.telegram_user))
+            .join(Chat.telegram_user)
+            .outerjoin(LastMessage, LastMessage.id == _last_message_id_subquery())
             .where(
-                and_(
-                    Message.chat_id.in_(chat_ids),
-                    Message.is_from_manager == False,
-                    Message.created_at >= month_start
+                or_(
+                    Chat.title.ilike(f"%{query}%"),
                 )
             )
         )
-        month_count = month_result.scalar() or 0
         
-        # Статистика за все время
-        all_time_result = await db.execute(
-            select(func.count(Message.id))
-            .where(
-                and_(
-                    Message.chat_id.in_(chat_ids),
-                    Message.is_from_manager == False
-                )
-            )
-        )
-        all_time_count = all_time_result.scalar() or 0
+        # Фильтр по менеджеру применяем в SQL, а не после выборки
+        if manager_id is not None:
+            statement = statement.where(Chat.manager_id == manager_id)
         
-        return {
-            "today": today_count,
-            "week": week_count,
-            "month": month_count,
-            "all_time": all_time_count
-        }
+        result = await db.execute(statement.offset(skip).limit(limit))
+        return [(row[0], row[1]) for row in result.unique().all()]
         
-    async def get_chats_statistics(
+    async def get_messages_statistics(
         self, db: AsyncSession, *, manager_id: int
     ) -> Dict[str, int]:
         """
-        Получить статистику новых диалогов для менеджера
+        Получить статистику новых сообщений для менеджера
         """
-        today = date.today()
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        
-        # Статистика за сегодня
-        today_start = datetime.combine(today, datetime.min.time())
-        today_end = datetime.combine(today, datetime.max.time())
-        
-        today_result = await db.execute(
-            select(func.count(Chat.id))
-            .where(
-                and_(
-                    Chat.manager_id == manager_id,
-                    Chat.created_at >= today_start,
-                    Chat.created_at <= today_end
-                )
-            )
-        )
-        today_count = today_result.scalar() or 0
-        
-        # Статистика за неделю
-        week_start = datetime.combine(week_ago, datetime.min.time())
-        
-        week_result = await db.execute(
-            select(func.count(Chat.id))
-            .where(
-                and_(
-                    Chat.manager_id == manager_id,
-                    Chat.created_at >= week_start
-                )
-            )
-        )
-        week_count = week_result.scalar() or 0
-        
-        # Статистика за месяц
-        month_start = datetime.combine(month_ago, datetime.min.time())
-        
-        month_result = await db.execute(
-            select(func.count(Chat.id))
+        result = await db.execute(
+            select(*_period_counts(Message.created_at))
+            .select_from(Message)
+            .join(Chat, Chat.id == Message.chat_id)
             .where(
                 and_(
                     Chat.manager_id == manager_id,
-                    Chat.created_at >= month_start
+                    Message.is_from_manager == False  # Сообщения от клиентов
                 )
             )
         )
-        month_count = month_result.scalar() or 0
+        return _statistics_from_row(result.one())
         
-        # Статистика за все время
-        all_time_result = await db.execute(
-            select(func.count(Chat.id))
+    async def get_chats_statistics(
+        self, db: AsyncSession, *, manager_id: int
+    ) -> Dict[str, int]:
+        """
+        Получить статистику новых диалогов для менеджера
+        """
+        result = await db.execute(
+            select(*_period_counts(Chat.created_at))
+            .select_from(Chat)
             .where(Chat.manager_id == manager_id)
         )
-        all_time_count = all_time_result.scalar() or 0
-        
-        return {
-            "today": today_count,
-            "week": week_count,
-            "month": month_count,
-            "all_time": all_time_count
-        }
+        return _statistics_from_row(result.one())
         
     async def get_instruction_requests_statistics(
         self, db: AsyncSession, *, manager_id: int
@@ -392,91 +600,38 @@ class CRUDChat(CRUDBase[Chat, ChatCreate, ChatUpdate]):
         """
         Получить статистику запросов инструкций по заселению для менеджера
         """
-        today = date.today()
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        
-        # Получаем чаты менеджера
-        chats_result = await db.execute(
-            select(Chat.id).where(Chat.manager_id == manager_id)
-        )
-        chat_ids = [row[0] for row in chats_result.fetchall()]
-        
-        if not chat_ids:
-            return {"today": 0, "week": 0, "month": 0, "all_time": 0}
-        
-        # Точный текст для поиска
-        instruction_text = "🤖 Пользователь запросил 🗒 Инструкция по заселению"
-        
-        # Статистика за сегодня
-        today_start = datetime.combine(today, datetime.min.time())
-        today_end = datetime.combine(today, datetime.max.time())
-        
-        today_result = await db.execute(
-            select(func.count(Message.id))
+        result = await db.execute(
+            select(*_period_counts(Message.created_at))
+            .select_from(Message)
+            .join(Chat, Chat.id == Message.chat_id)
             .where(
                 and_(
-                    Message.chat_id.in_(chat_ids),
+                    Chat.manager_id == manager_id,
                     Message.is_from_manager == True,  # Сообщения от менеджера
-                    Message.text == instruction_text,
-                    Message.created_at >= today_start,
-                    Message.created_at <= today_end
+                    Message.text == INSTRUCTION_REQUEST_TEXT
                 )
             )
         )
-        today_count = today_result.scalar() or 0
+        return _statistics_from_row(result.one())
         
-        # Статистика за неделю
-        week_start = datetime.combine(week_ago, datetime.min.time())
-        
-        week_result = await db.execute(
-            select(func.count(Message.id))
-            .where(
-                and_(
-                    Message.chat_id.in_(chat_ids),
-                    Message.is_from_manager == True,
-                    Message.text == instruction_text,
-                    Message.created_at >= week_start
-                )
-            )
-        )
-        week_count = week_result.scalar() or 0
-        
-        # Статистика за месяц
-        month_start = datetime.combine(month_ago, datetime.min.time())
-        
-        month_result = await db.execute(
-            select(func.count(Message.id))
-            .where(
-                and_(
-                    Message.chat_id.in_(chat_ids),
-                    Message.is_from_manager == True,
-                    Message.text == instruction_text,
-                    Message.created_at >= month_start
-                )
-            )
-        )
-        month_count = month_result.scalar() or 0
-        
-        # Статистика за все время
-        all_time_result = await db.execute(
-            select(func.count(Message.id))
-            .where(
-                and_(
-                    Message.chat_id.in_(chat_ids),
-                    Message.is_from_manager == True,
-                    Message.text == instruction_text
-                )
-            )
-        )
-        all_time_count = all_time_result.scalar() or 0
-        
-        return {
-            "today": today_count,
-            "week": week_count,
-            "month": month_count,
-            "all_time": all_time_count
+    async def get_dashboard_statistics(
+        self, db: AsyncSession, *, manager_id: int
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Получить всю статистику дашборда для менеджера.
+        Результат кешируется на STATS_CACHE_TTL секунд и сбрасывается
+        при новом сообщении или новом чате менеджера.
+        """
+        cached = statistics_cache.get(manager_id)
+        if cached is not None:
+            return cached
+        
+        statistics = {
+            "messages": await self.get_messages_statistics(db, manager_id=manager_id),
+            "chats": await self.get_chats_statistics(db, manager_id=manager_id),
+            "instruction_requests": await self.get_instruction_requests_statistics(db, manager_id=manager_id),
         }
-
+        statistics_cache.set(manager_id, statistics)
+        return statistics
 
 chat = CRUDChat(Chat) 
\ No newline at end of file
@@ -1,8 +1,8 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import or_
+from sqlalchemy import func, or_
 
 from app.models.event import Event
 from app.schemas.event import EventCreate, EventUpdate
@@ -44,6 +44,16 @@ class CRUDEvent(CRUDBase[Event, EventCreate, EventUpdate]):
         result = await db.execute(query)
         return result.scalars().all()
         
+    async def get_version(self, db: AsyncSession) -> Tuple[Any, ...]:
+        """
+        Версия набора событий: количество, максимальный ID и время последнего
+        изменения. Меняется при создании, изменении и удалении события
+        """
+        result = await db.execute(
+            select(func.count(Event.id), func.max(Event.id), func.max(Event.updated_at))
+        )
+        return tuple(result.one())
+        
     async def create_event(
         self, db: AsyncSession, *, obj_in: EventCreate
     ) -> Event:
@@ -0,0 +1,32 @@
+from typing import Any, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.fsm import FSMState
+from .base import CRUDBase, dialect_insert
+
+
+class CRUDFSMState(CRUDBase[FSMState, Any, Any]):
+    async def get_by_key(self, db: AsyncSession, *, key: str) -> Optional[FSMState]:
+        """
+        Получить состояние FSM по ключу хранилища
+        """
+        result = await db.execute(select(FSMState).where(FSMState.key == key))
+        return result.scalars().first()
+    
+    async def save(self, db: AsyncSession, *, key: str, values: Dict[str, Any]) -> None:
+        """
+        Сохранить поля состояния (state и/или data) одним
+        INSERT ... ON CONFLICT (key) DO UPDATE
+        """
+        stmt = dialect_insert(db, FSMState).values(key=key, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FSMState.key],
+            set_={field: stmt.excluded[field] for field in values},
+        )
+        await db.execute(stmt)
+        await db.commit()
+
+
+fsm_state = CRUDFSMState(FSMState)
@@ -1,44 +1,181 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
+from sqlalchemy import desc, or_, update, insert
 from sqlalchemy.orm import joinedload
 
 from app.models.message import Message
 from app.schemas.message import MessageCreate, MessageUpdate
 from .base import CRUDBase
+from .chat import chat as crud_chat
+from .outbox import outbox as crud_outbox
 
 
 class CRUDMessage(CRUDBase[Message, MessageCreate, MessageUpdate]):
     async def get_messages_by_chat(
-        self, db: AsyncSession, *, chat_id: int, skip: int = 0, limit: int = 100000
+        self,
+        db: AsyncSession,
+        *,
+        chat_id: int,
+        before_id: Optional[int] = None,
+        limit: int = 50,
+    ) -> Tuple[List[Message], Optional[int]]:
+        """
+        Получить страницу истории чата: последние limit сообщений (старше
+        before_id, если он указан) в хронологическом порядке.
+        Выборка идет по индексу (chat_id, id) без OFFSET
+        
+        Returns:
+            сообщения и курсор следующей (более старой) страницы -
+            значение before_id для нее; None если старых сообщений нет
+        """
+        query = select(Message).where(Message.chat_id == chat_id)
+        if before_id is not None:
+            query = query.where(Message.id < before_id)
+        
+        # Лишняя строка показывает, есть ли страница дальше
+        result = await db.execute(
+            query.order_by(desc(Message.id)).limit(limit + 1)
+        )
+        messages = result.scalars().all()
+        has_more = len(messages) > limit
+        messages = list(reversed(messages[:limit]))
+        next_before_id = messages[0].id if has_more else None
+        return messages, next_before_id
+        
+    async def get_messages_since(
+        self,
+        db: AsyncSession,
+        *,
+        chat_id: int,
+        after_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: int = 1000
     ) -> List[Message]:
         """
-        Получить сообщения по ID чата
+        Получить новые и измененные сообщения чата относительно курсора
+        
+        Args:
+            chat_id: ID чата
+            after_id: вернуть сообщения с ID больше указанного (новые)
+            since: вернуть сообщения, измененные позже указанного времени
+            limit: максимальное количество сообщений
         """
+        conditions = []
+        if after_id is not None:
+            conditions.append(Message.id > after_id)
+        if since is not None:
+            # В базе время хранится в UTC без часового пояса
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            conditions.append(Message.updated_at > since)
+        
+        query = select(Message).where(Message.chat_id == chat_id)
+        if conditions:
+            query = query.where(or_(*conditions))
+        
         result = await db.execute(
-            select(Message)
-            .where(Message.chat_id == chat_id)
-            .order_by(Message.created_at)
-            .offset(skip)
-            .limit(limit)
+            query.order_by(Message.id).limit(limit)
         )
         return result.scalars().all()
         
     async def create_message(
-        self, db: AsyncSession, *, obj_in: Dict[str, Any]
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: Dict[str, Any],
+        increment_unread: bool = False,
+        deliver_to: Optional[int] = None,
+        touch_chat: bool = True,
+        commit: bool = True,
     ) -> Message:
         """
         Создать сообщение
+        
+        Args:
+            obj_in: данные сообщения
+            increment_unread: увеличить счетчик непрочитанных чата в той же
+                транзакции, что и вставка сообщения (входящие сообщения клиента)
+            deliver_to: Telegram ID получателя - поставить сообщение в очередь
+                доставки (outbox) в той же транзакции (сообщения менеджера)
+            touch_chat: обновить время последнего сообщения чата; False - когда
+                его уже обновил upsert чата в той же транзакции
+            commit: зафиксировать транзакцию; False - сообщение только
+                отправляется в БД (flush) в составе общей транзакции
         """
         db_obj = Message(**obj_in)
+        if deliver_to is not None:
+            db_obj.delivery_status = "queued"
         db.add(db_obj)
-        await db.commit()
-        await db.refresh(db_obj)
+        if increment_unread or deliver_to is not None:
+            await db.flush()
+        if increment_unread:
+            await crud_chat.increment_unread_count(db, chat_id=db_obj.chat_id, commit=False)
+        elif touch_chat:
+            await crud_chat.touch_last_message(db, chat_ids=[db_obj.chat_id], commit=False)
+        if deliver_to is not None:
+            crud_outbox.add(
+                db, message_id=db_obj.id, telegram_id=deliver_to,
+                now=datetime.now(timezone.utc).replace(tzinfo=None),
+            )
+        # Значения по умолчанию заполняются при вставке, перечитывать строку не нужно
+        if commit:
+            await db.commit()
+        else:
+            await db.flush()
         return db_obj
         
+    async def create_messages(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: List[Dict[str, Any]],
+        deliver_to: Optional[List[int]] = None,
+        touch_chat: bool = True,
+        commit: bool = True,
+    ) -> List[Message]:
+        """
+        Создать несколько сообщений через INSERT ... RETURNING (в PostgreSQL -
+        пачками по несколько строк, в SQLite - построчно)
+        
+        Args:
+            objs_in: данные сообщений
+            deliver_to: Telegram ID получателей в порядке objs_in - поставить
+                сообщения в очередь доставки в той же транзакции
+            touch_chat: обновить время последнего сообщения чатов одним UPDATE
+            commit: зафиксировать транзакцию
+        
+        Returns:
+            созданные сообщения в порядке objs_in
+        """
+        if not objs_in:
+            return []
+        
+        if deliver_to is not None:
+            objs_in = [{**obj_in, "delivery_status": "queued"} for obj_in in objs_in]
+        
+        # Строки RETURNING возвращаются в порядке objs_in
+        result = await db.scalars(
+            insert(Message).returning(Message, sort_by_parameter_order=True), objs_in
+        )
+        messages = result.all()
+        
+        if touch_chat:
+            await crud_chat.touch_last_message(
+                db, chat_ids=[message.chat_id for message in messages], commit=False
+            )
+        if deliver_to is not None:
+            await crud_outbox.add_many(
+                db,
+                items=[(message.id, telegram_id) for message, telegram_id in zip(messages, deliver_to)],
+                now=datetime.now(timezone.utc).replace(tzinfo=None),
+            )
+        if commit:
+            await db.commit()
+        return messages
+        
     async def mark_as_read(
         self, db: AsyncSession, *, message_id: int
     ) -> Optional[Message]:
@@ -56,18 +193,30 @@ class CRUDMessage(CRUDBase[Message, MessageCreate, MessageUpdate]):
         
     async def mark_all_as_read(
         self, db: AsyncSession, *, chat_id: int
-    ) -> None:
+    ) -> List[int]:
         """
-        Отметить все сообщения в чате как прочитанные
+        Отметить все сообщения в чате как прочитанные одним запросом UPDATE
+        
+        Returns:
+            ID отмеченных сообщений клиента (для снятия уведомлений)
         """
-        messages = await self.get_messages_by_chat(db, chat_id=chat_id)
-        for message in messages:
-            if not message.is_read:
-                message.is_read = True
-                message.read_at = datetime.now(timezone.utc)
-                db.add(message)
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            update(Message)
+            .where(Message.chat_id == chat_id, Message.is_read == False)
+            # updated_at меняем явно: по нему веб-интерфейс получает изменения статуса
+            .values(is_read=True, read_at=now, updated_at=now)
+            .returning(Message.id, Message.is_from_manager)
+            # Уже загруженные в сессию сообщения обновляются в памяти без перечитывания
+            .execution_options(synchronize_session="evaluate")
+        )
+        rows = result.all()
+        if not rows:
+            # Непрочитанных нет - транзакцию не фиксируем
+            return []
         
         await db.commit()
+        return [row.id for row in rows if not row.is_from_manager]
         
     async def get_unread_count(
         self, db: AsyncSession, *, chat_id: int
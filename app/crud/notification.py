@@ -0,0 +1,209 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete, func, update, or_
+
+from app.models.message import Message
+from app.models.notification import PendingNotification
+from .base import CRUDBase, chunked, dialect_insert
+
+
+class CRUDNotification(CRUDBase[PendingNotification, Any, Any]):
+    async def schedule(
+        self,
+        db: AsyncSession,
+        *,
+        chat_id: int,
+        telegram_id: int,
+        message_id: int,
+        due_at: datetime,
+        commit: bool = True,
+    ) -> bool:
+        """
+        Запланировать уведомление по чату. Если по чату уже есть ожидающее
+        уведомление, новое не создается (срок первого сообщения серии сохраняется)
+        
+        Returns:
+            True если создана новая запись
+        """
+        result = await db.execute(
+            dialect_insert(db, PendingNotification)
+            .values(
+                chat_id=chat_id,
+                telegram_id=telegram_id,
+                message_id=message_id,
+                due_at=due_at,
+                attempts=0,
+            )
+            .on_conflict_do_nothing(index_elements=[PendingNotification.chat_id])
+            .returning(PendingNotification.id)
+        )
+        created = result.scalar_one_or_none() is not None
+        if commit:
+            await db.commit()
+        return created
+    
+    async def schedule_many(
+        self,
+        db: AsyncSession,
+        *,
+        items: List[Dict[str, int]],
+        due_at: datetime,
+        commit: bool = True,
+    ) -> int:
+        """
+        Запланировать уведомления по нескольким чатам запросами INSERT
+        по INSERT_CHUNK_SIZE строк.
+        Чаты, по которым уже есть ожидающее уведомление, пропускаются
+        
+        Args:
+            items: словари с ключами chat_id, telegram_id, message_id
+                (не более одного на чат)
+        
+        Returns:
+            количество созданных записей
+        """
+        if not items:
+            return 0
+        created = 0
+        for part in chunked(items):
+            result = await db.execute(
+                dialect_insert(db, PendingNotification)
+                .values([{**item, "due_at": due_at, "attempts": 0} for item in part])
+                .on_conflict_do_nothing(index_elements=[PendingNotification.chat_id])
+                .returning(PendingNotification.id)
+            )
+            created += len(result.all())
+        if commit:
+            await db.commit()
+        return created
+    
+    async def cancel_for_chat(
+        self, db: AsyncSession, *, chat_id: int, commit: bool = True
+    ) -> bool:
+        """
+        Отменить ожидающее уведомление по чату (чат прочитан)
+        """
+        result = await db.execute(
+            delete(PendingNotification)
+            .where(PendingNotification.chat_id == chat_id)
+            .returning(PendingNotification.id)
+        )
+        cancelled = result.scalar_one_or_none() is not None
+        if commit and cancelled:
+            await db.commit()
+        return cancelled
+    
+    async def get_next_due_at(self, db: AsyncSession) -> Optional[datetime]:
+        """
+        Получить ближайший срок отправки среди незанятых уведомлений
+        """
+        result = await db.execute(
+            select(PendingNotification.due_at)
+            .where(PendingNotification.locked_until == None)
+            .order_by(PendingNotification.due_at)
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+    
+    async def count_stored(self, db: AsyncSession) -> int:
+        """
+        Количество ожидающих и отправляемых уведомлений
+        """
+        result = await db.execute(select(func.count()).select_from(PendingNotification))
+        return result.scalar_one()
+    
+    async def claim_due(
+        self, db: AsyncSession, *, now: datetime, lease_seconds: float, limit: int = 500
+    ) -> List[Any]:
+        """
+        Забрать уведомления, срок которых наступил, взяв их в аренду.
+        Записи удаляются только после отправки (complete); если процесс
+        остановится раньше, по окончании аренды они снова станут доступны
+        
+        Returns:
+            строки (id, chat_id, telegram_id, message_id, attempts)
+        """
+        due_ids = (
+            select(PendingNotification.id)
+            .where(
+                PendingNotification.due_at <= now,
+                or_(PendingNotification.locked_until == None, PendingNotification.locked_until < now),
+            )
+            .order_by(PendingNotification.due_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(PendingNotification)
+            .where(PendingNotification.id.in_(due_ids))
+            .values(
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=PendingNotification.attempts + 1,
+            )
+            .returning(
+                PendingNotification.id,
+                PendingNotification.chat_id,
+                PendingNotification.telegram_id,
+                PendingNotification.message_id,
+                PendingNotification.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        await db.commit()
+        return rows
+    
+    async def complete(
+        self, db: AsyncSession, *, ids: List[int], commit: bool = True
+    ) -> None:
+        """
+        Удалить отправленные (или больше не нужные) уведомления
+        """
+        if not ids:
+            return
+        await db.execute(delete(PendingNotification).where(PendingNotification.id.in_(ids)))
+        if commit:
+            await db.commit()
+    
+    async def retry_later(
+        self, db: AsyncSession, *, ids: List[int], due_at: datetime, commit: bool = True
+    ) -> None:
+        """
+        Снять аренду и перенести отправку уведомлений на due_at
+        """
+        if not ids:
+            return
+        await db.execute(
+            update(PendingNotification)
+            .where(PendingNotification.id.in_(ids))
+            .values(locked_until=None, due_at=due_at)
+            .execution_options(synchronize_session=False)
+        )
+        if commit:
+            await db.commit()
+    
+    async def get_chats_with_unread(
+        self, db: AsyncSession, *, chat_ids: List[int]
+    ) -> set:
+        """
+        Получить ID чатов из списка, в которых есть непрочитанные сообщения клиента
+        """
+        if not chat_ids:
+            return set()
+        result = await db.execute(
+            select(Message.chat_id)
+            .where(
+                Message.chat_id.in_(chat_ids),
+                Message.is_read == False,
+                Message.is_from_manager == False,
+            )
+            .distinct()
+        )
+        return set(result.scalars().all())
+
+
+notification = CRUDNotification(PendingNotification)
@@ -0,0 +1,173 @@
+from typing import Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete, insert, update, or_, exists
+from sqlalchemy.orm import aliased
+
+from app.models.message import Message
+from app.models.outbox import OutboxMessage
+from .base import CRUDBase
+
+
+def _is_next_for_recipient() -> Any:
+    """
+    Условие: у получателя нет более ранних записей очереди. Следующее
+    сообщение чата доставляется только после доставки (или отказа)
+    предыдущего, в том числе ожидающего повтора
+    """
+    earlier = aliased(OutboxMessage)
+    return ~exists().where(
+        earlier.telegram_id == OutboxMessage.telegram_id,
+        earlier.id < OutboxMessage.id,
+    )
+
+
+class CRUDOutbox(CRUDBase[OutboxMessage, Any, Any]):
+    def add(
+        self, db: AsyncSession, *, message_id: int, telegram_id: int, now: datetime
+    ) -> OutboxMessage:
+        """
+        Добавить сообщение в очередь доставки в текущей транзакции (без коммита)
+        """
+        db_obj = OutboxMessage(
+            message_id=message_id,
+            telegram_id=telegram_id,
+            attempts=0,
+            next_attempt_at=now,
+        )
+        db.add(db_obj)
+        return db_obj
+    
+    async def add_many(
+        self, db: AsyncSession, *, items: List[Tuple[int, int]], now: datetime
+    ) -> None:
+        """
+        Добавить пачку сообщений в очередь доставки одним INSERT (без коммита)
+        
+        Args:
+            items: пары (ID сообщения, Telegram ID получателя)
+        """
+        if not items:
+            return
+        await db.execute(
+            insert(OutboxMessage),
+            [
+                {
+                    "message_id": message_id,
+                    "telegram_id": telegram_id,
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                }
+                for message_id, telegram_id in items
+            ],
+        )
+    
+    async def claim_batch(
+        self, db: AsyncSession, *, now: datetime, lease_seconds: float, limit: int = 50
+    ) -> List[Any]:
+        """
+        Забрать пачку сообщений, готовых к доставке, взяв их в аренду.
+        Если обработчик не завершит доставку до конца аренды (например, процесс
+        перезапущен), записи снова станут доступны. Забирается только самая
+        ранняя запись каждого получателя, поэтому в пачке не больше одного
+        сообщения на чат и порядок сообщений в чате сохраняется при повторах
+        
+        Returns:
+            строки (id, message_id, telegram_id, attempts) в порядке постановки
+        """
+        due_ids = (
+            select(OutboxMessage.id)
+            .where(
+                OutboxMessage.next_attempt_at <= now,
+                or_(OutboxMessage.locked_until == None, OutboxMessage.locked_until < now),
+                _is_next_for_recipient(),
+            )
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(due_ids))
+            .values(
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=OutboxMessage.attempts + 1,
+            )
+            .returning(
+                OutboxMessage.id,
+                OutboxMessage.message_id,
+                OutboxMessage.telegram_id,
+                OutboxMessage.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = sorted(result.all(), key=lambda row: row.id)
+        await db.commit()
+        return rows
+    
+    async def get_next_attempt_at(self, db: AsyncSession) -> Optional[datetime]:
+        """
+        Ближайшее время попытки доставки среди незанятых записей, которые
+        не ждут доставки более ранних сообщений получателя
+        """
+        result = await db.execute(
+            select(OutboxMessage.next_attempt_at)
+            .where(OutboxMessage.locked_until == None, _is_next_for_recipient())
+            .order_by(OutboxMessage.next_attempt_at)
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+    
+    async def complete(
+        self,
+        db: AsyncSession,
+        *,
+        outbox_id: int,
+        message_id: int,
+        delivery_status: str,
+        now: datetime,
+        telegram_message_id: Optional[int] = None,
+        commit: bool = True,
+    ) -> None:
+        """
+        Завершить доставку: удалить запись очереди и сохранить статус сообщения
+        """
+        await db.execute(delete(OutboxMessage).where(OutboxMessage.id == outbox_id))
+        values = {"delivery_status": delivery_status, "updated_at": now}
+        if telegram_message_id is not None:
+            values["telegram_message_id"] = telegram_message_id
+        await db.execute(
+            update(Message)
+            .where(Message.id == message_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if commit:
+            await db.commit()
+    
+    async def retry_later(
+        self,
+        db: AsyncSession,
+        *,
+        outbox_id: int,
+        next_attempt_at: datetime,
+        error: str,
+        commit: bool = True,
+    ) -> None:
+        """
+        Вернуть запись в очередь для повторной попытки
+        """
+        await db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == outbox_id)
+            .values(locked_until=None, next_attempt_at=next_attempt_at, last_error=error)
+            .execution_options(synchronize_session=False)
+        )
+        if commit:
+            await db.commit()
+
+
+outbox = CRUDOutbox(OutboxMessage)
@@ -1,12 +1,25 @@
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Union
+from datetime import datetime, timezone
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import or_
 
+from app.config import settings
+from app.core.bus import event_bus
 from app.core.security import get_password_hash, verify_password
 from app.models.user import User, TelegramUser
 from app.schemas.user import UserCreate, UserUpdate, TelegramUserCreate, TelegramUserUpdate
-from .base import CRUDBase
+from app.utils.cache import TTLCache
+from .base import CRUDBase, chunked, dialect_insert
+
+# Профили клиентов, совпадающие с сохраненными в БД: telegram_id ->
+# (ID пользователя, профиль из Telegram). Заполняется DatabaseMiddleware,
+# любая запись пользователя через CRUD сбрасывает запись кеша во всех процессах
+profile_cache = TTLCache(
+    ttl=settings.TELEGRAM_PROFILE_CACHE_TTL, maxsize=settings.TELEGRAM_PROFILE_CACHE_SIZE
+)
+event_bus.register_cache("telegram_profile", profile_cache)
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
@@ -94,6 +107,160 @@ class CRUDTelegramUser(CRUDBase[TelegramUser, TelegramUserCreate, TelegramUserUp
         )
         return result.scalars().first()
         
+    async def get_or_create_many(
+        self, db: AsyncSession, *, telegram_ids: List[int], commit: bool = True
+    ) -> Dict[int, TelegramUser]:
+        """
+        Получить пользователей Telegram по списку telegram_id, недостающих
+        создать с временными именами. Два запроса на весь список
+        
+        Returns:
+            словарь telegram_id -> пользователь
+        """
+        if not telegram_ids:
+            return {}
+        
+        for part in chunked(telegram_ids):
+            await db.execute(
+                dialect_insert(db, TelegramUser)
+                .values([
+                    {
+                        "telegram_id": telegram_id,
+                        "username": f"user_{telegram_id}",  # Временное имя пользователя
+                        "first_name": f"User {telegram_id}",  # Временное имя
+                        "last_name": None,
+                        "language_code": "ru",
+                    }
+                    for telegram_id in part
+                ])
+                .on_conflict_do_nothing(index_elements=[TelegramUser.telegram_id])
+            )
+        if commit:
+            await db.commit()
+        
+        result = await db.execute(
+            select(TelegramUser).where(TelegramUser.telegram_id.in_(telegram_ids))
+        )
+        return {user.telegram_id: user for user in result.scalars().all()}
+        
+    async def upsert(
+        self,
+        db: AsyncSession,
+        *,
+        values: Dict[str, Any],
+        update_fields: Optional[Iterable[str]] = None,
+        commit: bool = True,
+    ) -> TelegramUser:
+        """
+        Создать или обновить пользователя Telegram одним
+        INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING
+        
+        Args:
+            values: данные пользователя (для нового пользователя - все поля)
+            update_fields: поля, которые перезаписываются у существующего
+                пользователя; None - все переданные поля
+            commit: зафиксировать транзакцию
+        """
+        if update_fields is None:
+            update_fields = [field for field in values if field != "telegram_id"]
+        
+        stmt = dialect_insert(db, TelegramUser).values(**values)
+        set_ = {field: stmt.excluded[field] for field in update_fields}
+        # Пустой SET недопустим: "обновляем" ключ, чтобы RETURNING вернул строку
+        set_["telegram_id"] = stmt.excluded.telegram_id
+        if len(set_) > 1:
+            set_["updated_at"] = datetime.now(timezone.utc)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TelegramUser.telegram_id], set_=set_
+        ).returning(TelegramUser)
+        
+        result = await db.scalars(stmt, execution_options={"populate_existing": True})
+        db_user = result.one()
+        await event_bus.invalidate_cache("telegram_profile", [db_user.telegram_id])
+        if commit:
+            await db.commit()
+        return db_user
+        
+    async def save_profile(self, db: AsyncSession, *, profile: Dict[str, Any]) -> int:
+        """
+        Сохранить профиль клиента из обновления Telegram, только если он
+        отличается от сохраненного.
+        
+        Известный неизменившийся профиль (кеш) не трогает БД. При промахе кеша
+        выполняется один INSERT ... ON CONFLICT DO UPDATE ... WHERE <поле
+        изменилось>: строка без изменений не перезаписывается, и тогда ее ID
+        читается отдельным запросом
+        
+        Returns:
+            ID пользователя Telegram в БД
+        """
+        telegram_id = profile["telegram_id"]
+        cached = profile_cache.get(telegram_id)
+        if cached is not None and cached[1] == profile:
+            return cached[0]
+        
+        fields = [field for field in profile if field != "telegram_id"]
+        stmt = dialect_insert(db, TelegramUser).values(**profile)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TelegramUser.telegram_id],
+            set_={
+                **{field: stmt.excluded[field] for field in fields},
+                "updated_at": datetime.now(timezone.utc),
+            },
+            where=or_(*(
+                getattr(TelegramUser, field).is_distinct_from(stmt.excluded[field])
+                for field in fields
+            )),
+        ).returning(TelegramUser.id)
+        result = await db.execute(stmt)
+        user_id = result.scalar_one_or_none()
+        
+        if user_id is None:
+            # Профиль в БД уже совпадает - строка не изменялась
+            result = await db.execute(
+                select(TelegramUser.id).where(TelegramUser.telegram_id == telegram_id)
+            )
+            user_id = result.scalar_one()
+        await db.commit()
+        
+        profile_cache.set(telegram_id, (user_id, dict(profile)))
+        return user_id
+        
+    async def upsert_many(
+        self, db: AsyncSession, *, profiles: List[Dict[str, Any]], commit: bool = True
+    ) -> Dict[int, int]:
+        """
+        Создать или обновить пользователей Telegram запросами
+        INSERT ... ON CONFLICT (telegram_id) DO UPDATE по INSERT_CHUNK_SIZE строк
+        
+        Args:
+            profiles: данные пользователей с одинаковым набором полей,
+                не более одной записи на telegram_id
+        
+        Returns:
+            словарь telegram_id -> ID пользователя
+        """
+        if not profiles:
+            return {}
+        
+        ids: Dict[int, int] = {}
+        for part in chunked(profiles):
+            stmt = dialect_insert(db, TelegramUser).values(list(part))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[TelegramUser.telegram_id],
+                set_={
+                    field: stmt.excluded[field]
+                    for field in profiles[0]
+                    if field != "telegram_id"
+                },
+            ).returning(TelegramUser.id, TelegramUser.telegram_id)
+            result = await db.execute(stmt)
+            ids.update({row.telegram_id: row.id for row in result.all()})
+        await event_bus.invalidate_cache("telegram_profile", list(ids))
+        if commit:
+            await db.commit()
+        return ids
+        
     async def create_or_update(
         self, db: AsyncSession, *, telegram_user: Dict[str, Any]
     ) -> TelegramUser:
@@ -101,6 +268,7 @@ class CRUDTelegramUser(CRUDBase[TelegramUser, TelegramUserCreate, TelegramUserUp
         Создать или обновить пользователя Telegram
         """
         db_user = await self.get_by_telegram_id(db, telegram_id=telegram_user["telegram_id"])
+        await event_bus.invalidate_cache("telegram_profile", [telegram_user["telegram_id"]])
         
         if db_user:
             # Обновляем существующего пользователя
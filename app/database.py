@@ -1,3 +1,7 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import inspect
@@ -8,6 +12,9 @@ from .models.user import User
 from .core.security import get_password_hash
 from .models.base import Base
 
+# Настройки Alembic в корне проекта
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
 # Проверяем URL базы данных и преобразуем в асинхронный URL если нужно
 if settings.DATABASE_URL.startswith('sqlite'):
     SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL.replace('sqlite://', 'sqlite+aiosqlite://', 1)
@@ -28,14 +35,28 @@ SessionLocal = sessionmaker(
 )
 
 
-async def create_tables():
+def _upgrade_schema(connection) -> None:
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+async def run_migrations():
     """
-    Создание таблиц в базе данных если они не существуют и создание администратора
+    Применить миграции Alembic (migrations/versions) до последней версии.
+    Базы, созданные до перехода на Alembic, доводятся до текущей схемы
+    первой миграцией
     """
     async with engine.begin() as conn:
-        # Создаем таблицы напрямую, так как чаще всего они отсутствуют
-        await conn.run_sync(Base.metadata.create_all)
-        print("База данных инициализирована.")
+        await conn.run_sync(_upgrade_schema)
+
+
+async def create_tables():
+    """
+    Применение миграций схемы базы данных и создание администратора
+    """
+    await run_migrations()
+    print("База данных инициализирована.")
         
     # Добавление логики создания администратора
     async with SessionLocal() as db:
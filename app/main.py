@@ -17,6 +17,14 @@ from app.database import create_tables, get_db
 from app.api import api_router
 from app.bot import start_bot, stop_bot, process_webhook_update
 from app.core.auth import get_current_active_user
+from app.core.notifications import notification_scheduler
+from app.api.endpoints.workBitrix import bitrix_notifier
+from app.core.actions import action_executor
+from app.core.webhooks import webhook_client
+from app.bot.sender import telegram_sender
+from app.bot.intake import update_intake
+from app.core.bus import event_bus
+from app.core.outbox import outbox_worker
 
 
 # Настройка логирования
@@ -30,7 +38,7 @@ logger = logging.getLogger(__name__)
 # Контекстный менеджер для запуска и остановки бота
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Создаем таблицы в базе данных если их нет
+    # Применяем миграции схемы БД (alembic upgrade head) и создаем администратора
     await create_tables()
     
     # Создаем директорию для загрузки файлов, если её нет
@@ -38,6 +46,20 @@ async def lifespan(app: FastAPI):
     upload_dir.mkdir(exist_ok=True)
     logger.info("Директория для загрузки файлов готова")
     
+    # Подключаем шину событий между процессами
+    await event_bus.start()
+    
+    # Запускаем обработчик отложенных уведомлений и их отправку в Bitrix
+    notification_scheduler.start()
+    bitrix_notifier.start()
+    
+    # Запускаем доставку сообщений менеджеров в Telegram
+    outbox_worker.start()
+    
+    # Запускаем обработчики входящих обновлений Telegram (webhook)
+    update_intake.start()
+    
+    # Бот работает отдельным процессом: python -m app.bot (app/bot/runner.py)
     # # Запускаем бота если не используется webhook
     # if not settings.WEBHOOK_URL:
     #     asyncio.create_task(start_bot())
@@ -48,6 +70,16 @@ async def lifespan(app: FastAPI):
     
     yield
     
+    # Сначала дообрабатываем принятые обновления: они ставят уведомления и действия
+    await update_intake.stop()
+    await notification_scheduler.stop()
+    await outbox_worker.stop()
+    await action_executor.stop()
+    await webhook_client.close()
+    await telegram_sender.stop()
+    await bitrix_notifier.stop()
+    await event_bus.stop()
+    
     # # Останавливаем бота
     # await stop_bot()
     # logger.info("Бот остановлен")
@@ -185,7 +217,18 @@ async def telegram_webhook(request: Request):
             )
     
     update_data = await request.json()
-    await process_webhook_update(update_data)
+    if not settings.TELEGRAM_WEBHOOK_QUEUE:
+        await process_webhook_update(update_data)
+        return {"ok": True}
+    
+    # Отвечаем сразу, обновление обрабатывается в очереди пользователя.
+    # При переполнении очереди Telegram повторит доставку позже
+    if not update_intake.submit(update_data):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"ok": False, "detail": "Очередь обновлений переполнена"},
+            headers={"Retry-After": "5"},
+        )
     
     return {"ok": True}
 
@@ -1 +1 @@
-from . import base, user, message, chat, event 
\ No newline at end of file
+from . import base, user, message, chat, event, notification, outbox, fsm 
\ No newline at end of file
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, String, ForeignKey, Integer, Boolean
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, String, ForeignKey, Integer, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 
 from .base import BaseModel
@@ -8,9 +10,15 @@ class Chat(BaseModel):
     """
     Модель чата между менеджером и клиентом
     """
+    __table_args__ = (
+        # Постраничная загрузка списка чатов менеджера по курсору (ключ сортировки, id)
+        Index("ix_chat_manager_id_updated_at_id", "manager_id", "updated_at", "id"),
+        Index("ix_chat_manager_id_last_message_at_id", "manager_id", "last_message_at", "id"),
+    )
+    
     # Ключи
     manager_id = Column(Integer, ForeignKey('user.id'), nullable=True)
-    telegram_user_id = Column(Integer, ForeignKey('telegramuser.id'))
+    telegram_user_id = Column(Integer, ForeignKey('telegramuser.id'), unique=True, index=True)  # Один чат на клиента
     
     # Атрибуты
     title = Column(String(100), nullable=True)
@@ -18,6 +26,9 @@ class Chat(BaseModel):
     
     # Статус
     unread_count = Column(Integer, default=0)
+    # Время последнего сообщения (для чата без сообщений - время создания);
+    # хранится в чате, чтобы сортировка списка шла по индексу
+    last_message_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     
     # Отношения
     manager = relationship("User", back_populates="chats")
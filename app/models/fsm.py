@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, JSON
+
+from .base import BaseModel
+
+
+class FSMState(BaseModel):
+    """
+    Состояние FSM бота (aiogram) для пользователя в чате.
+    Хранится в БД, чтобы состояние было общим для всех процессов
+    """
+    key = Column(String(255), unique=True, index=True)  # Ключ хранилища aiogram
+    state = Column(String(255), nullable=True)
+    data = Column(JSON, nullable=True)
+    
+    def __repr__(self):
+        return f"<FSMState(key={self.key}, state={self.state})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Integer, Text, Boolean, DateTime
+from sqlalchemy import Column, String, ForeignKey, Integer, Text, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 
@@ -9,6 +9,17 @@ class Message(BaseModel):
     """
     Модель сообщения
     """
+    __table_args__ = (
+        # Постраничная загрузка истории чата по курсору (chat_id, id)
+        Index("ix_message_chat_id_id", "chat_id", "id"),
+        # Последнее сообщение чата и фильтр списка чатов по дате сообщений
+        Index("ix_message_chat_id_created_at", "chat_id", "created_at"),
+        # Непрочитанные сообщения чата
+        Index("ix_message_chat_id_is_read", "chat_id", "is_read"),
+        # Статистика дашборда по периодам
+        Index("ix_message_created_at_is_from_manager", "created_at", "is_from_manager"),
+    )
+    
     # Ключи
     chat_id = Column(Integer, ForeignKey('chat.id'))
     telegram_user_id = Column(Integer, ForeignKey('telegramuser.id'), nullable=True)
@@ -28,6 +39,12 @@ class Message(BaseModel):
     # Telegram-специфичная информация
     telegram_message_id = Column(Integer, nullable=True)
     
+    # Доставка сообщений менеджера в Telegram: queued, sent, failed
+    delivery_status = Column(String(20), nullable=True)
+    
+    # ID рассылки, в которой создано сообщение (прогресс рассылки)
+    broadcast_id = Column(String(32), nullable=True, index=True)
+    
     # Отношения
     chat = relationship("Chat", back_populates="messages")
     telegram_user = relationship("TelegramUser", back_populates="messages")
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, DateTime
+
+from .base import BaseModel
+
+
+class PendingNotification(BaseModel):
+    """
+    Отложенное уведомление менеджера в Bitrix о непрочитанном сообщении клиента.
+    Одна запись на чат: серия сообщений дает одно уведомление
+    """
+    # Ключи
+    chat_id = Column(Integer, ForeignKey('chat.id', ondelete='CASCADE'), unique=True)
+    
+    # Данные для отправки
+    telegram_id = Column(BigInteger)
+    message_id = Column(Integer)  # Первое непрочитанное сообщение серии
+    
+    # Время отправки (UTC без часового пояса)
+    due_at = Column(DateTime, index=True)
+    
+    # Состояние отправки
+    attempts = Column(Integer, default=0)
+    locked_until = Column(DateTime, nullable=True)  # Аренда записи обработчиком
+    
+    def __repr__(self):
+        return f"<PendingNotification(chat_id={self.chat_id}, due_at={self.due_at})>"
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, DateTime, Text, Index
+
+from .base import BaseModel
+
+
+class OutboxMessage(BaseModel):
+    """
+    Исходящее сообщение менеджера, ожидающее доставки в Telegram.
+    Создается в одной транзакции с сообщением и удаляется после доставки
+    """
+    __table_args__ = (
+        # Более ранние сообщения того же получателя (порядок доставки в чате)
+        Index("ix_outboxmessage_telegram_id_id", "telegram_id", "id"),
+    )
+    
+    # Ключи
+    message_id = Column(Integer, ForeignKey('message.id', ondelete='CASCADE'), unique=True)
+    
+    # Получатель
+    telegram_id = Column(BigInteger)
+    
+    # Состояние доставки
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, index=True)  # UTC без часового пояса
+    locked_until = Column(DateTime, nullable=True)  # Аренда записи обработчиком
+    last_error = Column(Text, nullable=True)
+    
+    def __repr__(self):
+        return f"<OutboxMessage(message_id={self.message_id}, attempts={self.attempts})>"
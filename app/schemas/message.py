@@ -34,6 +34,7 @@ class MessageInDB(MessageBase):
     is_read: bool = False
     read_at: Optional[datetime] = None
     telegram_message_id: Optional[int] = None
+    delivery_status: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
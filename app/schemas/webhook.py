@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, List, Union
+
+from app.config import settings
 
 
 class SendMessageRequest(BaseModel):
@@ -10,11 +12,23 @@ class SendMessageRequest(BaseModel):
     file: Optional[Dict[str, str]] = None  # {'name': 'filename.ext', 'data': 'base64string'}
 
 
-class ClientMessageRequest(BaseModel):
-    """Схема для запроса отправки сообщения от клиента через webhook"""
+class BroadcastRequest(BaseModel):
+    """Схема для запроса рассылки одного сообщения нескольким клиентам"""
+    telegram_ids: List[int] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.BROADCAST_MAX_RECIPIENTS,
+        description="Telegram ID получателей",
+    )
+    text: str = Field(..., description="Текст сообщения для отправки")
+    token: str = Field(..., description="Токен авторизации для защиты API")
+    file: Optional[Dict[str, str]] = None  # {'name': 'filename.ext', 'data': 'base64string'}
+
+
+class ClientMessageItem(BaseModel):
+    """Сообщение от клиента (без токена) - элемент пакетного запроса"""
     telegram_id: int = Field(..., description="Telegram ID пользователя")
     text: str = Field(..., description="Текст сообщения от клиента")
-    token: str = Field(..., description="Токен авторизации для защиты API")
     username: Optional[str] = Field(None, description="Имя пользователя в Telegram (необязательно)")
     first_name: Optional[str] = Field(None, description="Имя клиента (необязательно)")
     last_name: Optional[str] = Field(None, description="Фамилия клиента (необязательно)")
@@ -24,6 +38,22 @@ class ClientMessageRequest(BaseModel):
     file: Optional[Dict[str, str]] = None  # {'name': 'filename.ext', 'data': 'base64string'}
 
 
+class ClientMessageRequest(ClientMessageItem):
+    """Схема для запроса отправки сообщения от клиента через webhook"""
+    token: str = Field(..., description="Токен авторизации для защиты API")
+
+
+class ClientMessageBatchRequest(BaseModel):
+    """Схема для пакетной загрузки сообщений от клиентов"""
+    messages: List[ClientMessageItem] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.CLIENT_BATCH_MAX_ITEMS,
+        description="Сообщения в порядке поступления",
+    )
+    token: str = Field(..., description="Токен авторизации для защиты API")
+
+
 class WebhookResponse(BaseModel):
     """Ответ на webhook запрос"""
     success: bool = Field(..., description="Статус выполнения операции")
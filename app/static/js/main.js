@@ -131,6 +131,37 @@ async function apiRequest(url, options = {}) {
     }
 }
 
+// Функция для подписки на push-события сервера (Server-Sent Events).
+// Авторизация выполняется по куке token. Возвращает EventSource или null,
+// если браузер не поддерживает SSE (тогда страница работает на опросе).
+function subscribeToEvents({ onEvent, onOpen, onError } = {}) {
+    if (!window.EventSource) {
+        if (onError) onError();
+        return null;
+    }
+    
+    const source = new EventSource('/api/stream/', { withCredentials: true });
+    
+    source.addEventListener('open', function() {
+        console.log('Push-канал подключен');
+        if (onOpen) onOpen();
+    });
+    
+    // EventSource переподключается сам, страница на это время включает опрос
+    source.addEventListener('error', function() {
+        console.warn('Push-канал недоступен, используется опрос');
+        if (onError) onError();
+    });
+    
+    ['new_message', 'chat_read', 'message_status'].forEach(type => {
+        source.addEventListener(type, function(e) {
+            if (onEvent) onEvent(type, JSON.parse(e.data));
+        });
+    });
+    
+    return source;
+}
+
 // Функция для форматирования даты
 function formatDate(dateString) {
     const date = new Date(dateString);
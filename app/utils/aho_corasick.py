@@ -0,0 +1,69 @@
+"""
+Поиск множества подстрок за один проход по тексту (алгоритм Ахо-Корасик)
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасик для набора шаблонов
+
+    Args:
+        patterns: шаблоны; номер шаблона - его позиция в списке
+    """
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = list(patterns)
+        # Переходы, ссылки неудач и номера шаблонов, оканчивающихся в узле
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            if pattern:
+                self._add(pattern, index)
+        self._build()
+
+    def _add(self, pattern: str, index: int) -> None:
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(index)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                # Шаблоны-суффиксы тоже заканчиваются в этом узле
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text: str) -> Set[int]:
+        """
+        Номера шаблонов, входящих в текст
+        """
+        found: Set[int] = set()
+        node = 0
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
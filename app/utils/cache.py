@@ -0,0 +1,139 @@
+"""
+Утилиты кеширования в памяти процесса
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Кеш с ограничением времени жизни записей и вытеснением давно
+    использованных записей (LRU) при превышении размера
+
+    Args:
+        ttl: время жизни записи в секундах; 0 - кеш отключен
+        maxsize: максимальное количество записей
+    """
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Получить значение по ключу или default, если записи нет или она устарела
+        """
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохранить значение по ключу
+        """
+        if self.ttl <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable]) -> None:
+        """
+        Удалить запись по ключу
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Очистить кеш
+        """
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class AsyncTTLCache:
+    """
+    Асинхронный кеш с TTL и LRU для результатов удаленных вызовов.
+    Одновременные промахи по одному ключу объединяются: загрузка выполняется
+    один раз, остальные вызовы ждут ее результат. Ошибки загрузки не кешируются
+
+    Args:
+        ttl: время жизни записи в секундах; 0 - кеш отключен
+        maxsize: максимальное количество записей
+    """
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self._cache = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Поколения ключей: результат загрузки, начатой до сброса, не сохраняется
+        self._generations: Dict[Hashable, int] = {}
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Получить значение из кеша или загрузить его вызовом loader()
+        """
+        value = self._cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generations.get(key, 0)
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение получит вызывающий; помечаем его полученным и у future
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            if self._generations.get(key, 0) == generation:
+                self._cache.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+            self._generations.pop(key, None)
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Удалить запись по ключу (в том числе результат выполняющейся загрузки)
+        """
+        self._cache.invalidate(key)
+        if key in self._inflight:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self) -> None:
+        """
+        Очистить кеш
+        """
+        self._cache.clear()
+        for key in self._inflight:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+_MISSING = object()
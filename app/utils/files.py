@@ -0,0 +1,103 @@
+"""
+Сохранение загружаемых файлов в директорию uploads без блокировки event loop
+"""
+
+import base64
+import logging
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+from uuid import uuid4
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path("uploads")
+
+# Размер порции записи (байт)
+CHUNK_SIZE = 1024 * 1024
+# Размер порции base64 (символов): кратен 4, декодируется в CHUNK_SIZE байт
+BASE64_CHUNK_SIZE = CHUNK_SIZE // 3 * 4
+
+
+def _upload_path(filename: str) -> Path:
+    """
+    Уникальный путь для сохранения файла (от имени берется только базовая часть)
+    """
+    UPLOAD_DIR.mkdir(exist_ok=True)
+    name = Path(filename or "file").name or "file"
+    return UPLOAD_DIR / f"{uuid4()}_{name}"
+
+
+def _write_base64(data: str, file_path: Path) -> None:
+    """
+    Декодировать base64 порциями и записать в файл
+    """
+    # Любые пробельные символы (\r, \t, переносы строк) нарушают выравнивание
+    # порций по 4 символа
+    data = "".join(data.split())
+
+    with open(file_path, "wb") as f:
+        for start in range(0, len(data), BASE64_CHUNK_SIZE):
+            f.write(base64.b64decode(data[start:start + BASE64_CHUNK_SIZE]))
+
+
+def _copy_file(source: Any, file_path: Path) -> None:
+    """
+    Скопировать содержимое файлового объекта в файл порциями
+    """
+    source.seek(0)
+    with open(file_path, "wb") as f:
+        shutil.copyfileobj(source, f, CHUNK_SIZE)
+
+
+async def save_file_from_base64(file_data: Optional[Dict[str, str]]) -> Optional[str]:
+    """
+    Сохранить файл из base64 данных ({'name': ..., 'data': ...}).
+    Декодирование и запись выполняются в отдельном потоке
+
+    Returns:
+        путь к сохраненному файлу или None при ошибке
+    """
+    if not file_data or 'name' not in file_data or 'data' not in file_data:
+        return None
+
+    file_path = _upload_path(file_data['name'])
+    try:
+        await run_in_threadpool(_write_base64, file_data['data'], file_path)
+        return str(file_path)
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении файла: {e}")
+        file_path.unlink(missing_ok=True)
+        return None
+
+
+async def save_upload_file(upload: Any) -> Optional[str]:
+    """
+    Сохранить файл из multipart-загрузки (UploadFile). Starlette уже держит
+    содержимое во временном файле, копирование выполняется порциями
+    в отдельном потоке
+
+    Returns:
+        путь к сохраненному файлу или None при ошибке
+    """
+    file_path = _upload_path(upload.filename)
+    try:
+        await run_in_threadpool(_copy_file, upload.file, file_path)
+        return str(file_path)
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении файла: {e}")
+        file_path.unlink(missing_ok=True)
+        return None
+    finally:
+        await upload.close()
+
+
+def remove_files(paths: Iterable[Optional[str]]) -> None:
+    """
+    Удалить сохраненные файлы (например, если сообщения с ними не записаны в БД)
+    """
+    for path in paths:
+        if path:
+            Path(path).unlink(missing_ok=True)
@@ -0,0 +1,159 @@
+"""
+Проверка планов частых запросов: python -m app.utils.query_plans
+
+Схема базы DATABASE_URL приводится к последней миграции, затем для каждого
+запроса выполняется EXPLAIN. Проверка завершается с кодом 1, если хотя бы
+один запрос читает таблицу полным просмотром, а не по индексу.
+PostgreSQL проверяется с enable_seqscan = off: на маленькой таблице
+планировщик выбирает полный просмотр, даже когда подходящий индекс есть
+"""
+
+import asyncio
+import json
+import re
+import sys
+from datetime import datetime
+from typing import Any, List, Tuple
+
+from sqlalchemy import and_, desc, func, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Executable
+
+from app.crud.chat import _period_counts, chat as crud_chat
+from app.crud.outbox import _is_next_for_recipient
+from app.database import engine, run_migrations
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.notification import PendingNotification
+from app.models.outbox import OutboxMessage
+from app.models.user import TelegramUser
+
+# Полный просмотр таблицы в EXPLAIN QUERY PLAN SQLite: "SCAN message"
+# (в отличие от "SCAN message USING INDEX ...")
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def build_queries() -> List[Tuple[str, Executable]]:
+    """
+    Частые запросы приложения с типовыми параметрами
+    """
+    now = datetime(2026, 1, 1)
+    cursor = (now, 100)
+    return [
+        ("Список чатов по дате последнего сообщения", crud_chat.build_chats_query(
+            manager_id=1, cursor=cursor, sort_by="last_message_date",
+        )),
+        ("Список чатов по дате обновления", crud_chat.build_chats_query(
+            manager_id=1, cursor=cursor, sort_by="updated_at", sort_order="asc",
+        )),
+        ("Список чатов с фильтром по дате сообщений", crud_chat.build_chats_query(
+            manager_id=1, custom_date=now.date(), sort_by="last_message_date",
+        )),
+        ("Список чатов с фильтром по аппартаментам", crud_chat.build_chats_query(
+            manager_id=1, apartments_filter="A1", sort_by="last_message_date",
+        )),
+        ("Чат пользователя Telegram", select(Chat).where(Chat.telegram_user_id == 1)),
+        ("Пользователь Telegram", select(TelegramUser).where(TelegramUser.telegram_id == 1)),
+        ("Список аппартаментов", select(TelegramUser.apartments).where(
+            TelegramUser.apartments.isnot(None), TelegramUser.apartments != "",
+        ).distinct()),
+        ("Страница истории чата", select(Message).where(
+            Message.chat_id == 1, Message.id < 100,
+        ).order_by(desc(Message.id)).limit(51)),
+        ("Новые и измененные сообщения чата", select(Message).where(
+            Message.chat_id == 1, or_(Message.id > 100, Message.updated_at > now),
+        ).order_by(Message.id).limit(1000)),
+        ("Последнее сообщение чата", select(Message).where(
+            Message.chat_id == 1,
+        ).order_by(desc(Message.created_at)).limit(1)),
+        ("Непрочитанные сообщения чата", select(func.count()).select_from(Message).where(
+            Message.chat_id == 1, Message.is_read == False,
+        )),
+        ("Чаты с непрочитанными сообщениями клиента", select(Message.chat_id).where(
+            Message.chat_id.in_([1, 2, 3]), Message.is_read == False, Message.is_from_manager == False,
+        ).distinct()),
+        ("Статистика сообщений", select(*_period_counts(Message.created_at)).select_from(Message).join(
+            Chat, Chat.id == Message.chat_id,
+        ).where(and_(Chat.manager_id == 1, Message.is_from_manager == False))),
+        ("Статистика диалогов", select(*_period_counts(Chat.created_at)).where(Chat.manager_id == 1)),
+        ("Уведомления к отправке", select(PendingNotification.id).where(
+            PendingNotification.due_at <= now,
+            or_(PendingNotification.locked_until == None, PendingNotification.locked_until < now),
+        ).order_by(PendingNotification.due_at).limit(100)),
+        ("Ближайшее уведомление", select(PendingNotification.due_at).where(
+            PendingNotification.locked_until == None,
+        ).order_by(PendingNotification.due_at).limit(1)),
+        ("Прогресс рассылки", select(Message.id, Message.delivery_status).where(
+            Message.broadcast_id == "0" * 32,
+        ).order_by(Message.id)),
+        ("Сообщения к доставке", select(OutboxMessage.next_attempt_at).where(
+            OutboxMessage.locked_until == None, _is_next_for_recipient(),
+        ).order_by(OutboxMessage.next_attempt_at).limit(1)),
+    ]
+
+
+def _sqlite_full_scans(connection: Connection, sql: str) -> List[str]:
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return [
+        match.group(1)
+        for match in (SQLITE_FULL_SCAN.match(row[-1]) for row in rows)
+        if match
+    ]
+
+
+def _postgresql_full_scans(connection: Connection, sql: str) -> List[str]:
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = []
+    nodes: List[Any] = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan":
+            scans.append(node.get("Relation Name"))
+        nodes.extend(node.get("Plans", ()))
+    return scans
+
+
+def check_plans(connection: Connection) -> List[Tuple[str, List[str]]]:
+    """
+    Выполнить EXPLAIN для запросов build_queries
+
+    Returns:
+        пары (запрос, таблицы с полным просмотром); пустой список - все
+        запросы идут по индексам
+    """
+    full_scans = _postgresql_full_scans if connection.dialect.name == "postgresql" else _sqlite_full_scans
+    failed = []
+    for name, query in build_queries():
+        sql = str(query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        tables = full_scans(connection, sql)
+        print(f"{'FAIL' if tables else 'OK  '} {name}" + (f": полный просмотр {', '.join(tables)}" if tables else ""))
+        if tables:
+            failed.append((name, tables))
+    return failed
+
+
+async def run_check() -> int:
+    await run_migrations()
+    async with engine.begin() as conn:
+        failed = await conn.run_sync(check_plans)
+        # EXPLAIN ничего не меняет, SET LOCAL сбрасывается вместе с транзакцией
+        await conn.rollback()
+    await engine.dispose()
+
+    if failed:
+        print(f"Запросов с полным просмотром таблиц: {len(failed)}")
+        return 1
+    print("Все запросы используют индексы")
+    return 0
+
+
+def main() -> None:
+    sys.exit(asyncio.run(run_check()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Ограничение частоты исходящих запросов
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты по алгоритму token bucket
+
+    Args:
+        rate: скорость пополнения (токенов в секунду); 0 - без ограничения
+        capacity: размер корзины (допустимый всплеск)
+    """
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """
+        Забрать токены без ожидания; False если их недостаточно
+        """
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """
+        Время в секундах до появления нужного количества токенов
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Дождаться и забрать токены (ожидающие обслуживаются по очереди)
+        """
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep(self.delay(tokens))
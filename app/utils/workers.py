@@ -0,0 +1,182 @@
+"""
+Пул фоновых обработчиков с сохранением порядка задач по ключу
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+class KeyedWorkerPool:
+    """
+    Пул задач с упорядочиванием по ключу. Для каждого ключа с задачами в
+    очереди работает своя цепочка, которая выполняет их по порядку; задачи
+    разных ключей выполняются параллельно, но не более workers одновременно.
+    Медленная задача задерживает только следующие задачи своего ключа.
+    Для каждой метки задачи ведется статистика времени выполнения и ошибок
+
+    Args:
+        name: имя пула для логов
+        workers: максимальное количество одновременно выполняемых задач
+        queue_size: максимальное количество невыполненных задач в пуле
+    """
+    def __init__(self, name: str, workers: int = 8, queue_size: int = 1000):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self._pending: Dict[Hashable, Deque[Tuple[str, Job]]] = {}
+        self._chains: Dict[Hashable, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._changed: Optional[asyncio.Condition] = None
+        self._queued = 0
+        self._metrics: Dict[str, Dict[str, float]] = {}
+        self.dropped = 0
+
+    def start(self) -> None:
+        """
+        Запустить пул (повторный вызов ничего не делает)
+        """
+        if self._semaphore is not None:
+            return
+        self._semaphore = asyncio.Semaphore(self.workers)
+        self._changed = asyncio.Condition()
+        logger.info(f"Пул {self.name} запущен: до {self.workers} задач одновременно")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Дождаться выполнения поставленных задач (не дольше timeout) и остановить пул
+        """
+        if self._semaphore is None:
+            return
+        try:
+            async with self._changed:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self._queued == 0), timeout=timeout
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"Пул {self.name} остановлен с невыполненными задачами: {self.queued()}")
+        chains = list(self._chains.values())
+        for task in chains:
+            task.cancel()
+        await asyncio.gather(*chains, return_exceptions=True)
+        self._chains.clear()
+        self._pending.clear()
+        self._queued = 0
+        self._semaphore = None
+        self._changed = None
+        logger.info(f"Пул {self.name} остановлен")
+
+    def submit(self, key: Hashable, job: Job, label: str = "job") -> bool:
+        """
+        Поставить задачу в очередь ключа
+
+        Args:
+            key: ключ упорядочивания (например, ID чата)
+            job: функция без аргументов, возвращающая корутину
+            label: метка задачи для статистики
+
+        Returns:
+            False если очередь переполнена и задача отброшена
+        """
+        self.start()
+        if self._queued >= self.queue_size:
+            self.dropped += 1
+            logger.error(f"Очередь пула {self.name} переполнена, задача {label} для {key} отброшена")
+            return False
+        self._enqueue(key, job, label)
+        return True
+
+    async def put(self, key: Hashable, job: Job, label: str = "job") -> None:
+        """
+        Поставить задачу в очередь ключа; при переполненной очереди ждать
+        свободного места (обратное давление на источник)
+        """
+        self.start()
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._queued < self.queue_size)
+        self._enqueue(key, job, label)
+
+    def queued(self) -> int:
+        """
+        Количество невыполненных задач
+        """
+        return self._queued
+
+    def record(self, label: str, duration: float, failed: bool) -> None:
+        """
+        Учесть выполнение задачи в статистике
+        """
+        metrics = self._metrics.setdefault(
+            label, {"count": 0, "failed": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        )
+        metrics["count"] += 1
+        if failed:
+            metrics["failed"] += 1
+        metrics["total_seconds"] += duration
+        metrics["max_seconds"] = max(metrics["max_seconds"], duration)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Состояние очередей и статистика выполнения по меткам
+        """
+        return {
+            "queued": self.queued(),
+            "keys": len(self._chains),
+            "dropped": self.dropped,
+            "jobs": {
+                label: {
+                    "count": int(metrics["count"]),
+                    "failed": int(metrics["failed"]),
+                    "avg_ms": round(metrics["total_seconds"] / metrics["count"] * 1000, 1) if metrics["count"] else 0,
+                    "max_ms": round(metrics["max_seconds"] * 1000, 1),
+                }
+                for label, metrics in self._metrics.items()
+            },
+        }
+
+    def _enqueue(self, key: Hashable, job: Job, label: str) -> None:
+        """
+        Добавить задачу в очередь ключа и запустить цепочку ключа, если ее нет
+        """
+        self._pending.setdefault(key, deque()).append((label, job))
+        self._queued += 1
+        if key not in self._chains:
+            self._chains[key] = asyncio.create_task(self._run_chain(key))
+
+    async def _run_chain(self, key: Hashable) -> None:
+        """
+        Выполнить задачи ключа по порядку; цепочка завершается, когда очередь
+        ключа пуста
+        """
+        pending = self._pending[key]
+        try:
+            while pending:
+                label, job = pending.popleft()
+                async with self._semaphore:
+                    await self._run_job(label, job)
+                self._queued -= 1
+                async with self._changed:
+                    self._changed.notify_all()
+        finally:
+            if self._chains.get(key) is asyncio.current_task():
+                del self._chains[key]
+                self._pending.pop(key, None)
+
+    async def _run_job(self, label: str, job: Job) -> None:
+        started = time.monotonic()
+        failed = False
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failed = True
+            logger.error(f"Ошибка задачи {label} в пуле {self.name}: {str(e)}")
+        finally:
+            self.record(label, time.monotonic() - started, failed)
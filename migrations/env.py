@@ -0,0 +1,78 @@
+"""
+Окружение Alembic. Миграции применяются либо из командной строки
+(alembic upgrade head), либо при запуске приложения через
+app.database.run_migrations - тогда соединение передается в
+config.attributes["connection"]
+"""
+
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.database import SQLALCHEMY_DATABASE_URL, engine
+from app.models.base import Base
+# Модели регистрируют таблицы в Base.metadata (нужно для --autogenerate)
+from app.models import chat, event, fsm, message, notification, outbox, user  # noqa: F401
+
+config = context.config
+
+# Логирование настраиваем только при запуске из командной строки,
+# чтобы не перезаписать настройки приложения
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Ключ advisory-блокировки PostgreSQL: воркеры, запущенные одновременно,
+# применяют миграции по очереди
+MIGRATION_LOCK_ID = 7_240_001
+
+
+def run_migrations_offline() -> None:
+    """
+    Вывести SQL миграций без подключения к БД (alembic upgrade head --sql)
+    """
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite не умеет большинство ALTER TABLE - изменения через копию таблицы
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+    else:
+        asyncio.run(run_async_migrations())
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,233 @@
+"""Исходная схема
+
+Создает таблицы приложения. Базы, созданные до перехода на Alembic
+(create_all при запуске и скрипты migration_*.py), доводятся до этой же
+схемы: недостающие таблицы создаются, недостающие колонки добавляются,
+дубликаты чатов объединяются перед созданием уникального индекса.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _timestamps() -> list:
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    ]
+
+
+def _add_missing_columns(table: str, *columns: sa.Column) -> None:
+    """
+    Добавить колонки, которых нет в существующей таблице. Без подключения
+    к базе (--sql) она считается пустой: колонки уже есть в create_table
+    """
+    if context.is_offline_mode():
+        return
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(table, column)
+
+
+def _indexes(table: str) -> dict:
+    if context.is_offline_mode():
+        return {}
+    return {index['name']: index for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def _merge_duplicate_chats() -> None:
+    """
+    Объединить дубликаты чатов пользователя в самый старый чат: переносятся
+    сообщения, суммируются счетчики непрочитанных, ожидающие уведомления
+    дубликатов удаляются
+    """
+    if context.is_offline_mode():
+        return
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(
+        "SELECT telegram_user_id, MIN(id) FROM chat "
+        "WHERE telegram_user_id IS NOT NULL "
+        "GROUP BY telegram_user_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    for telegram_user_id, keep_id in duplicates:
+        params = {"telegram_user_id": telegram_user_id, "keep_id": keep_id}
+        others = "SELECT id FROM chat WHERE telegram_user_id = :telegram_user_id AND id <> :keep_id"
+        bind.execute(sa.text(
+            "UPDATE chat SET unread_count = ("
+            "SELECT COALESCE(SUM(unread_count), 0) FROM chat WHERE telegram_user_id = :telegram_user_id"
+            ") WHERE id = :keep_id"
+        ), params)
+        bind.execute(sa.text(f"UPDATE message SET chat_id = :keep_id WHERE chat_id IN ({others})"), params)
+        bind.execute(sa.text(f"DELETE FROM pendingnotification WHERE chat_id IN ({others})"), params)
+        bind.execute(sa.text(f"DELETE FROM chat WHERE id IN ({others})"), params)
+
+
+def upgrade() -> None:
+    op.create_table('user',
+        sa.Column('username', sa.String(length=50), nullable=True),
+        sa.Column('email', sa.String(length=100), nullable=True),
+        sa.Column('hashed_password', sa.String(length=100), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        *_timestamps(),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_user_id', 'user', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_user_username', 'user', ['username'], unique=True, if_not_exists=True)
+    op.create_index('ix_user_email', 'user', ['email'], unique=True, if_not_exists=True)
+
+    op.create_table('telegramuser',
+        sa.Column('telegram_id', sa.Integer(), nullable=True),
+        sa.Column('username', sa.String(length=50), nullable=True),
+        sa.Column('first_name', sa.String(length=50), nullable=True),
+        sa.Column('last_name', sa.String(length=50), nullable=True),
+        sa.Column('language_code', sa.String(length=10), nullable=True),
+        sa.Column('info', sa.Text(), nullable=True),
+        sa.Column('additional_info', sa.Text(), nullable=True),
+        sa.Column('deal_link', sa.String(length=500), nullable=True),
+        sa.Column('apartments', sa.String(length=200), nullable=True),
+        *_timestamps(),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    # Поля профиля, добавленные позже (migration_add_telegram_user_fields.py)
+    _add_missing_columns('telegramuser',
+        sa.Column('additional_info', sa.Text(), nullable=True),
+        sa.Column('deal_link', sa.String(length=500), nullable=True),
+        sa.Column('apartments', sa.String(length=200), nullable=True),
+    )
+    op.create_index('ix_telegramuser_id', 'telegramuser', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_telegramuser_telegram_id', 'telegramuser', ['telegram_id'], unique=True, if_not_exists=True)
+
+    op.create_table('chat',
+        sa.Column('manager_id', sa.Integer(), nullable=True),
+        sa.Column('telegram_user_id', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(length=100), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('unread_count', sa.Integer(), nullable=True),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['manager_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['telegram_user_id'], ['telegramuser.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_chat_id', 'chat', ['id'], unique=False, if_not_exists=True)
+
+    op.create_table('event',
+        sa.Column('name', sa.String(length=100), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('event_type', sa.String(length=50), nullable=True),
+        sa.Column('conditions', sa.JSON(), nullable=True),
+        sa.Column('action_type', sa.String(length=50), nullable=True),
+        sa.Column('action_data', sa.JSON(), nullable=True),
+        sa.Column('manager_id', sa.Integer(), nullable=True),
+        sa.Column('telegram_user_id', sa.Integer(), nullable=True),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['manager_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['telegram_user_id'], ['telegramuser.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_event_id', 'event', ['id'], unique=False, if_not_exists=True)
+
+    op.create_table('message',
+        sa.Column('chat_id', sa.Integer(), nullable=True),
+        sa.Column('telegram_user_id', sa.Integer(), nullable=True),
+        sa.Column('manager_id', sa.Integer(), nullable=True),
+        sa.Column('text', sa.Text(), nullable=True),
+        sa.Column('message_type', sa.String(length=20), nullable=True),
+        sa.Column('file_id', sa.String(length=255), nullable=True),
+        sa.Column('file_path', sa.String(length=255), nullable=True),
+        sa.Column('is_read', sa.Boolean(), nullable=True),
+        sa.Column('is_from_manager', sa.Boolean(), nullable=True),
+        sa.Column('read_at', sa.DateTime(), nullable=True),
+        sa.Column('telegram_message_id', sa.Integer(), nullable=True),
+        sa.Column('delivery_status', sa.String(length=20), nullable=True),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['chat_id'], ['chat.id']),
+        sa.ForeignKeyConstraint(['manager_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['telegram_user_id'], ['telegramuser.id']),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    # Статус доставки (migration_add_message_delivery_status.py)
+    _add_missing_columns('message', sa.Column('delivery_status', sa.String(length=20), nullable=True))
+    op.create_index('ix_message_id', 'message', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_message_chat_id_id', 'message', ['chat_id', 'id'], unique=False, if_not_exists=True)
+
+    op.create_table('pendingnotification',
+        sa.Column('chat_id', sa.Integer(), nullable=True),
+        sa.Column('telegram_id', sa.BigInteger(), nullable=True),
+        sa.Column('message_id', sa.Integer(), nullable=True),
+        sa.Column('due_at', sa.DateTime(), nullable=True),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['chat_id'], ['chat.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('chat_id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_pendingnotification_id', 'pendingnotification', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_pendingnotification_due_at', 'pendingnotification', ['due_at'], unique=False, if_not_exists=True)
+
+    op.create_table('outboxmessage',
+        sa.Column('message_id', sa.Integer(), nullable=True),
+        sa.Column('telegram_id', sa.BigInteger(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        *_timestamps(),
+        sa.ForeignKeyConstraint(['message_id'], ['message.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('message_id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_outboxmessage_id', 'outboxmessage', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_outboxmessage_next_attempt_at', 'outboxmessage', ['next_attempt_at'], unique=False, if_not_exists=True)
+
+    op.create_table('fsmstate',
+        sa.Column('key', sa.String(length=255), nullable=True),
+        sa.Column('state', sa.String(length=255), nullable=True),
+        sa.Column('data', sa.JSON(), nullable=True),
+        *_timestamps(),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_fsmstate_id', 'fsmstate', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_fsmstate_key', 'fsmstate', ['key'], unique=True, if_not_exists=True)
+
+    # Один чат на пользователя Telegram (migration_unique_chat_per_user.py):
+    # INSERT ... ON CONFLICT при приеме сообщений опирается на этот индекс
+    index = _indexes('chat').get('ix_chat_telegram_user_id')
+    if index is None or not index['unique']:
+        _merge_duplicate_chats()
+        if index is not None:
+            op.drop_index('ix_chat_telegram_user_id', table_name='chat')
+        op.create_index('ix_chat_telegram_user_id', 'chat', ['telegram_user_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table('fsmstate')
+    op.drop_table('outboxmessage')
+    op.drop_table('pendingnotification')
+    op.drop_table('message')
+    op.drop_table('event')
+    op.drop_table('chat')
+    op.drop_table('telegramuser')
+    op.drop_table('user')
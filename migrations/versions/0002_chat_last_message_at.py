@@ -0,0 +1,61 @@
+"""Время последнего сообщения чата
+
+Колонка chat.last_message_at - ключ сортировки списка чатов по дате
+последнего сообщения - и индексы постраничной загрузки списка чатов
+по курсору (ключ сортировки, id).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Колонка могла быть добавлена скриптом migration_add_chat_last_message_at.py
+    columns = set() if context.is_offline_mode() else {
+        column['name'] for column in sa.inspect(op.get_bind()).get_columns('chat')
+    }
+    if 'last_message_at' not in columns:
+        op.add_column('chat', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+
+    # Время последнего сообщения по истории; чат без сообщений - время создания
+    op.execute(
+        "UPDATE chat SET last_message_at = COALESCE("
+        "(SELECT MAX(message.created_at) FROM message WHERE message.chat_id = chat.id), "
+        "chat.created_at, CURRENT_TIMESTAMP) "
+        "WHERE last_message_at IS NULL"
+    )
+    # Ключ сортировки не должен быть NULL: курсор сравнивает его как значение
+    op.execute(
+        "UPDATE chat SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) "
+        "WHERE updated_at IS NULL"
+    )
+    with op.batch_alter_table('chat') as batch_op:
+        batch_op.alter_column('last_message_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_index(
+        'ix_chat_manager_id_updated_at_id', 'chat', ['manager_id', 'updated_at', 'id'],
+        unique=False, if_not_exists=True,
+    )
+    op.create_index(
+        'ix_chat_manager_id_last_message_at_id', 'chat', ['manager_id', 'last_message_at', 'id'],
+        unique=False, if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_manager_id_last_message_at_id', table_name='chat')
+    op.drop_index('ix_chat_manager_id_updated_at_id', table_name='chat')
+    with op.batch_alter_table('chat') as batch_op:
+        batch_op.drop_column('last_message_at')
@@ -0,0 +1,40 @@
+"""Индексы частых запросов
+
+- message (chat_id, created_at): последнее сообщение чата, фильтр списка
+  чатов по дате сообщений
+- message (chat_id, is_read): непрочитанные сообщения чата
+- message (created_at, is_from_manager): статистика дашборда по периодам
+- telegramuser (apartments): список и фильтр аппартаментов
+
+chat (manager_id, updated_at) покрывается индексом
+ix_chat_manager_id_updated_at_id, chat (telegram_user_id) - уникальным
+индексом ix_chat_telegram_user_id.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_message_chat_id_created_at', 'message', ['chat_id', 'created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_message_chat_id_is_read', 'message', ['chat_id', 'is_read'], unique=False, if_not_exists=True)
+    op.create_index('ix_message_created_at_is_from_manager', 'message', ['created_at', 'is_from_manager'], unique=False, if_not_exists=True)
+    op.create_index('ix_telegramuser_apartments', 'telegramuser', ['apartments'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_telegramuser_apartments', table_name='telegramuser')
+    op.drop_index('ix_message_created_at_is_from_manager', table_name='message')
+    op.drop_index('ix_message_chat_id_is_read', table_name='message')
+    op.drop_index('ix_message_chat_id_created_at', table_name='message')
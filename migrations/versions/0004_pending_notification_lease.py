@@ -0,0 +1,34 @@
+"""Аренда отложенных уведомлений
+
+Колонки pendingnotification.attempts и locked_until: планировщик берет
+наступившие уведомления в аренду и удаляет их только после отправки в
+Bitrix, при ошибке переносит отправку.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('pendingnotification') as batch_op:
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('locked_until', sa.DateTime(), nullable=True))
+    op.execute("UPDATE pendingnotification SET attempts = 0 WHERE attempts IS NULL")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('pendingnotification') as batch_op:
+        batch_op.drop_column('locked_until')
+        batch_op.drop_column('attempts')
@@ -0,0 +1,33 @@
+"""ID рассылки сообщения
+
+Колонка message.broadcast_id: сообщения рассылки помечаются ее ID, и
+прогресс рассылки считается по статусам доставки этих сообщений в любом
+процессе и после перезапуска.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('message') as batch_op:
+        batch_op.add_column(sa.Column('broadcast_id', sa.String(length=32), nullable=True))
+    op.create_index('ix_message_broadcast_id', 'message', ['broadcast_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_message_broadcast_id', table_name='message')
+    with op.batch_alter_table('message') as batch_op:
+        batch_op.drop_column('broadcast_id')
@@ -0,0 +1,27 @@
+"""Порядок доставки сообщений получателю
+
+Индекс outboxmessage (telegram_id, id): очередь доставки забирает запись,
+только если у получателя нет более ранних записей.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_outboxmessage_telegram_id_id', 'outboxmessage', ['telegram_id', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outboxmessage_telegram_id_id', table_name='outboxmessage')